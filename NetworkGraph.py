@@ -1,83 +1,100 @@
-from copy import deepcopy
-from queue import Queue
+from collections import deque
 
 
 class NetworkGraph:
     '''
     description: defines a directed graph in which the nodes are the networks in the service area and the an edge between
     nodes x and y represent that possibility of a user moving from network x to network y in one 'hop' (i.e. without passing
-    via an intermediary node
+    via an intermediary node. Edges are indexed by (source, destination) and by source, and the shortest paths from a vertex are
+    computed once (BFS to all vertices) and kept until an edge or a vertex is added or removed
     '''
 
     def __init__(self, vertexList=[], edgeList=[]):
         self.vertices = vertexList
         self.edges = edgeList
         self.adjacentVertexList = []  # to store set of vertices that can be reached from each vertex
+        self.vertexIndex = {}  # index of each vertex in the list of vertices, {vertex: index}
+        self.edgeIndex = {}  # first edge between 2 vertices in the list of edges, {(source, destination): edge}
+        self.outgoingEdge = {}  # edges from each vertex, in the order of the list of edges, {source: list of edges}
+        self.shortestPathCache = {}  # shortest paths from the vertices already searched, {source: ({vertex: path length}, {vertex: path})}
         NetworkGraph.computeAdjacentVertices(self)
         # end __init__
 
     def addVertex(self, vertex):
         self.vertices.append(vertex)
         self.adjacentVertexList.append(set())
+        self.vertexIndex.update({vertex: len(self.vertices) - 1})
+        self.shortestPathCache = {}
         # end addVertex
 
     def removeVertex(self, vertex):
         # remove all edges with the vertex...
-        if vertex in self.vertices:
+        if vertex in self.vertexIndex:
             for edge in self.edges[::-1]:  # in reverse order; because items are being deleting from the list
                 if edge.sourceVertex == vertex or edge.destinationVertex == vertex: self.edges.remove(edge)
             # delete its set of adjacent vertices
-            vertexIndex = self.vertices.index(vertex)
+            vertexIndex = self.vertexIndex[vertex]
             self.adjacentVertexList.pop(vertexIndex)
             self.vertices.remove(vertex)  # remove the vertex from vertex list
+            NetworkGraph.indexEdges(self)
             return True  # for success
         return False  # for failure
         # end removeVertex
 
     def addEdge(self, sourceVertex, destinationVertex, userList=[]):
-        self.edges.append(Edge(sourceVertex, destinationVertex, userList))
+        edge = Edge(sourceVertex, destinationVertex, userList)
+        self.edges.append(edge)
+        self.edgeIndex.setdefault((sourceVertex, destinationVertex), edge)
+        self.outgoingEdge.setdefault(sourceVertex, []).append(edge)
 
         # update the adjacency list
-        vertexIndex = self.vertices.index(
-            sourceVertex)  # get index of the source vertex; its adjacency list to be updated will be at the same index
+        vertexIndex = self.vertexIndex[sourceVertex]  # get index of the source vertex; its adjacency list to be updated will be at the same index
         self.adjacentVertexList[vertexIndex].add(destinationVertex)
+        self.shortestPathCache = {}
         # end addEdge
 
     def removeEdge(self, sourceVertex, destinationVertex):
-        for edge in self.edges:
-            if edge.sourceVertex == sourceVertex and edge.destinationVertex == destinationVertex:
-                self.edges.remove(edge)
+        edge = self.edgeIndex.get((sourceVertex, destinationVertex))
+        if edge is None: return False  # for failure
+        self.edges.remove(edge)
+        self.outgoingEdge[sourceVertex].remove(edge)
+        del self.edgeIndex[(sourceVertex, destinationVertex)]
+        for otherEdge in self.outgoingEdge[sourceVertex]:  # another edge between the 2 vertices, if any, becomes the first one
+            if otherEdge.destinationVertex == destinationVertex: self.edgeIndex.update({(sourceVertex, destinationVertex): otherEdge}); break
 
-                # update the adjacency list
-                vertexIndex = self.vertices.index(sourceVertex)
-                self.adjacentVertexList[vertexIndex].remove(destinationVertex)
-                return True  # for success
-        return False  # for failure
+        # update the adjacency list
+        vertexIndex = self.vertexIndex[sourceVertex]
+        self.adjacentVertexList[vertexIndex].remove(destinationVertex)
+        self.shortestPathCache = {}
+        return True  # for success
         # end removeEdge
 
+    def getEdge(self, sourceVertex, destinationVertex):
+        '''
+        desc: returns the (first) edge between sourceVertex and destinationVertex, or None if there is none
+        '''
+        return self.edgeIndex.get((sourceVertex, destinationVertex))
+        # end getEdge
+
     def edgeExist(self, sourceVertex, destinationVertex):
         '''
         desc: checks if an edge exists between sourceVertex and destinationVertex
         '''
-        for edge in self.edges:
-            if edge.sourceVertex == sourceVertex and edge.destinationVertex == destinationVertex:
-                return True
-        return False
+        return (sourceVertex, destinationVertex) in self.edgeIndex
         # end edgeExist
 
     def addUserToEdge(self, sourceVertex, destinationVertex, userID):
-        for edge in self.edges:
-            if edge.sourceVertex == sourceVertex and edge.destinationVertex == destinationVertex:
-                edge.addUser(userID)
-                return True  # for success
-        return False  # for failure
+        edge = self.edgeIndex.get((sourceVertex, destinationVertex))
+        if edge is None: return False  # for failure
+        edge.addUser(userID)
+        return True  # for success
         # end addUserToEdge
 
     def removeUserFromEdge(self, sourceVertex, destinationVertex, userID):
         userFoundRemoved = False
 
-        for edge in self.edges[::-1]:
-            if edge.sourceVertex == sourceVertex and userID in edge.userList:  # must actually remove the user from other edges too
+        for edge in self.outgoingEdge.get(sourceVertex, [])[::-1]:
+            if userID in edge.userList:  # must actually remove the user from other edges too
                 edge.removeUser(userID)
                 if len(edge.userList) == 0:
                     NetworkGraph.removeEdge(self, edge.sourceVertex,
@@ -92,51 +109,62 @@ class NetworkGraph:
             adjacentVerticesSet = set()
             self.adjacentVertexList.append(adjacentVerticesSet)
 
+        NetworkGraph.indexEdges(self)
         for edge in self.edges:
-            vertexIndex = self.vertices.index(edge.sourceVertex)
+            vertexIndex = self.vertexIndex[edge.sourceVertex]
             self.adjacentVertexList[vertexIndex].add(edge.destinationVertex)
             # end computeAdjacentVertices
 
+    def indexEdges(self):
+        ''' desc: (re)builds the index of the vertices and the indexes of the edges, and empties the cache of shortest paths '''
+        self.vertexIndex = {vertex: index for index, vertex in enumerate(self.vertices)}
+        self.edgeIndex = {}; self.outgoingEdge = {}
+        for edge in self.edges:
+            self.edgeIndex.setdefault((edge.sourceVertex, edge.destinationVertex), edge)
+            self.outgoingEdge.setdefault(edge.sourceVertex, []).append(edge)
+        self.shortestPathCache = {}
+        # end indexEdges
+
     def shortestPath(self, sourceVertex, destinationVertex):
         '''
-        desc: runs BFS to get the path with the least no of edges connecting the 2 networks
+        desc: gets the path with the least no of edges connecting the 2 networks, from the shortest paths from sourceVertex (see
+        computeShortestPath)
         param: ID of 2 networks
-        returns: least no of edges to be traversed to get from one network to the other
+        returns: least no of edges to be traversed to get from one network to the other (-1 if there is no path), vertices along the path
+        (empty if there is no path or if both networks are the same, as with the BFS stopping at the destination network)
         '''
-        queue = Queue();
-        unvisitedVertices = set(self.vertices)  # set of vertices not visited yet
-        pathLength = [-1] * len(self.vertices)  # parent vertex of current vertex
-        path = [[]] * len(self.vertices)  # path to current vertex
-
-        queue.put(sourceVertex)
-        unvisitedVertices.remove(sourceVertex)
-
-        sourceVertexIndex = self.vertices.index(sourceVertex)
-        pathLength[sourceVertexIndex] = 0  # distance to source vertex set to 0
-        neighbour = -1
-        while (queue.empty() == False and neighbour != destinationVertex):  # while the queue is not empty
-            # remove the head of queue
-            head = queue.get()
-            headVertexIndex = self.vertices.index(head)
-
-            # mark and enqueue all unvisited neighbours of u
-            neighbourList = self.adjacentVertexList[headVertexIndex]  # get neighbours of head
-            for neighbour in neighbourList:
-                if neighbour in unvisitedVertices:
-                    unvisitedVertices.remove(neighbour)
-                    queue.put(neighbour)
-                    neighbourVertexIndex = self.vertices.index(neighbour)
-                    pathLength[neighbourVertexIndex] = pathLength[headVertexIndex] + 1
-                    path[neighbourVertexIndex] = deepcopy(path[headVertexIndex])
-                    path[neighbourVertexIndex].append(head)
-                if neighbour == destinationVertex:
-                    path[neighbourVertexIndex].append(neighbour)
-                    break
-
-        destinationVertexIndex = self.vertices.index(destinationVertex)
-        return pathLength[destinationVertexIndex], path[destinationVertexIndex]
+        if sourceVertex not in self.shortestPathCache:
+            self.shortestPathCache.update({sourceVertex: NetworkGraph.computeShortestPath(self, sourceVertex)})
+        pathLength, path = self.shortestPathCache[sourceVertex]
+        if destinationVertex not in pathLength: return -1, []
+        if destinationVertex == sourceVertex: return 0, []
+        return pathLength[destinationVertex], path[destinationVertex] + [destinationVertex]
         # end shortestPath
 
+    def computeShortestPath(self, sourceVertex):
+        '''
+        desc: runs BFS from a network to all the others; the neighbours of each vertex are visited in the order of its adjacency set,
+        so that the path to each vertex is the one the search stopping at that vertex would find
+        param: ID of the network
+        returns: least no of edges to be traversed to get to each network reachable, {vertex: path length}, and the vertices along
+        the path before it, {vertex: list of vertices}
+        '''
+        queue = deque([sourceVertex])
+        pathLength = {sourceVertex: 0}  # visited vertices
+        path = {sourceVertex: []}  # path to current vertex
+        while queue:  # while the queue is not empty
+            # remove the head of queue
+            head = queue.popleft()
+
+            # mark and enqueue all unvisited neighbours of head
+            for neighbour in self.adjacentVertexList[self.vertexIndex[head]]:
+                if neighbour not in pathLength and neighbour in self.vertexIndex:
+                    pathLength.update({neighbour: pathLength[head] + 1})
+                    path.update({neighbour: path[head] + [head]})
+                    queue.append(neighbour)
+        return pathLength, path
+        # end computeShortestPath
+
     def __str__(self):
         edgeList = ""
         for edge in self.edges:
@@ -0,0 +1,96 @@
+'''
+@description:   Defines the result cube of a campaign (all runs of a simulation, saved in run1/ ... runN/ of a root directory): one memory-mapped array per quantity in
+                <root directory>/campaign/, of shape (#runs, #time slots, #networks) for the number of devices associated to each network and (#runs, #time slots, #devices)
+                for the network selected by each device and the gain it observed. Each run fills its own slice while it goes on, so that statistics across runs are
+                vectorized reductions over the arrays (e.g. loadCampaignCube(rootDir)['load'].mean(axis=0)) instead of reading the files of every run. Entries of runs
+                not simulated (yet), and of time slots in which a device is not in any service area, are -1 (NaN for gains)
+'''
+
+import os
+import numpy as np
+
+''' ______________________________________________________________________________ constants ______________________________________________________________________________ '''
+CAMPAIGN_DIR = "campaign/"                          # sub-directory of the root directory of the campaign holding the arrays
+CUBE_COLUMN = {'load': (np.int32, "network"), 'network': (np.int16, "device"), 'gain': (np.float64, "device")}   # {name: (type, last axis)}
+
+''' ____________________________________________________________________ CampaignCube class definition ____________________________________________________________________ '''
+class CampaignCube(object):
+    ''' slice of the campaign arrays filled by a run; the arrays are created by the first run that needs them and shared by the runs simulated in parallel '''
+
+    def __init__(self, rootDir, numRun, numTimeSlot, numDevice, numNetwork, runIndex):
+        if runIndex < 1 or runIndex > numRun: raise ValueError("run " + str(runIndex) + " is not in the campaign of " + str(numRun) + " runs (runs are numbered from 1)")
+        self.directory = rootDir + CAMPAIGN_DIR
+        self.runIndex = runIndex - 1                # index of the run in the arrays (runs are numbered from 1)
+        os.makedirs(self.directory, exist_ok=True)                  # runs simulated in parallel may create it at the same time
+        self.column = {}                            # memory-mapped arrays, {name: array}
+        for name, (columnType, axis) in CUBE_COLUMN.items():
+            shape = (numRun, numTimeSlot, numNetwork if axis == "network" else numDevice)
+            self.column.update({name: CampaignCube.openArray(self, name, columnType, shape)})
+            self.column[name][self.runIndex] = np.nan if name == "gain" else -1   # a run simulated again overwrites its previous results
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def openArray(self, name, columnType, shape):
+        '''
+        description: opens an array of the campaign, creating it if no run did yet; the array is created under a temporary name and linked to its final name, so that,
+                     of runs started at the same time, only one creates it and the others open it
+        args:        self, name of the array, type, shape
+        returns:     memory-mapped array
+        '''
+        path = self.directory + name + ".npy"
+        if not os.path.exists(path):
+            temporaryPath = self.directory + name + "." + str(os.getpid()) + ".tmp.npy"
+            array = np.lib.format.open_memmap(temporaryPath, mode="w+", dtype=columnType, shape=shape)
+            array[:] = np.nan if name == "gain" else -1; array.flush(); del array
+            try: os.link(temporaryPath, path)
+            except FileExistsError: pass                                        # created by another run in the meantime
+            os.remove(temporaryPath)
+        array = np.load(path, mmap_mode="r+")
+        if array.shape != shape or array.dtype != columnType:
+            raise ValueError("campaign array " + path + " has shape " + str(array.shape) + ", expected " + str(shape) + " (different campaign parameters?)")
+        return array
+        # end openArray
+
+    ''' ################################################################################################################################################################### '''
+    def saveDeviceDetail(self, t, deviceID, currentNetwork, gain):
+        '''
+        description: saves the network selected by a device and the gain it observed in a time slot
+        args:        self, time slot, ID of the device, network selected, bit rate observed (Mbps)
+        returns:     None
+        '''
+        self.column['network'][self.runIndex, t - 1, deviceID - 1] = currentNetwork
+        self.column['gain'][self.runIndex, t - 1, deviceID - 1] = gain
+        # end saveDeviceDetail
+
+    ''' ################################################################################################################################################################### '''
+    def saveNetworkDetail(self, t, load):
+        '''
+        description: saves the number of devices associated to each network in a time slot
+        args:        self, time slot, list of counts in the order of the networks
+        returns:     None
+        '''
+        self.column['load'][self.runIndex, t - 1] = load
+        # end saveNetworkDetail
+
+    ''' ################################################################################################################################################################### '''
+    def flush(self):
+        '''
+        description: writes the slice of the run to the files
+        args:        self
+        returns:     None
+        '''
+        for array in self.column.values(): array.flush()
+        # end flush
+# end class CampaignCube
+
+''' ____________________________________________________________________________ read the cube ____________________________________________________________________________ '''
+def loadCampaignCube(rootDir):
+    '''
+    description: memory-maps the arrays of a campaign (read only)
+    args:        root directory of the campaign
+    returns:     {name: array}, see CUBE_COLUMN; empty if the campaign has no cube
+    '''
+    directory = rootDir + CAMPAIGN_DIR
+    return {name: np.load(directory + name + ".npy", mmap_mode="r") for name in CUBE_COLUMN if os.path.exists(directory + name + ".npy")}
+    # end loadCampaignCube
+''' _____________________________________________________________________________ end of file _____________________________________________________________________________ '''
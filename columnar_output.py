@@ -0,0 +1,136 @@
+'''
+@description:   Defines a columnar output format for the details of the devices and networks of a run: one array per quantity, indexed by time slot, device and network
+                (shape (#time slots, #devices, #networks), (#time slots, #devices) or (#time slots, #networks)), saved as .npy files or as Parquet tables when pyarrow is
+                installed. The arrays are filled in place in memory-mapped .npy files while the run goes on, so that processes forked by the run (see
+                sharded_simulation.py) write to the same arrays; readers memory-map (or read from the Parquet table) only the columns they need instead of parsing csv
+                files. A device not in any service area in a time slot has network -1 and NaN values in that time slot
+'''
+
+import os
+import numpy as np
+
+''' ______________________________________________________________________________ constants ______________________________________________________________________________ '''
+COLUMNAR_DIR = "columnar/"                          # sub-directory of the run directory holding the arrays
+DEVICE_COLUMN = {'weight': (np.float64, True), 'probability': (np.float64, True), 'network': (np.int16, False), 'delay': (np.float64, False),
+                 'download': (np.float64, False), 'gain': (np.float64, False)}     # per device, {name: (type, whether there is one value per network)}
+NETWORK_COLUMN = {'load': np.int32}                 # per network, number of devices associated to each network
+FILE_FORMAT = ["npy", "parquet"]
+
+''' ___________________________________________________________________ ColumnarWriter class definition ___________________________________________________________________ '''
+class ColumnarWriter(object):
+    ''' arrays holding the details of the devices and networks of a run, one row per time slot; weights and probabilities are indexed by networkID - 1, NaN for a
+        network not available to the device '''
+
+    def __init__(self, outputDir, numTimeSlot, numDevice, numNetwork, fileFormat="npy"):
+        self.directory = outputDir + COLUMNAR_DIR
+        self.fileFormat = fileFormat                # "npy", or "parquet" (the .npy files are then converted when the writer is closed)
+        if not os.path.exists(self.directory): os.makedirs(self.directory)
+        self.column = {}                            # memory-mapped arrays, {name: array}
+        for name, (columnType, perNetwork) in DEVICE_COLUMN.items():
+            shape = (numTimeSlot, numDevice, numNetwork) if perNetwork else (numTimeSlot, numDevice)
+            self.column.update({name: np.lib.format.open_memmap(self.directory + name + ".npy", mode="w+", dtype=columnType, shape=shape)})
+            self.column[name][:] = -1 if name == "network" else np.nan
+        for name, columnType in NETWORK_COLUMN.items():
+            self.column.update({name: np.lib.format.open_memmap(self.directory + name + ".npy", mode="w+", dtype=columnType, shape=(numTimeSlot, numNetwork))})
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def saveDeviceDetail(self, t, deviceID, availableNetwork, weight, probability, currentNetwork, delay, download, gain):
+        '''
+        description: saves the details of a device in a time slot
+        args:        self, time slot, ID of the device, networkIDs of the networks available to the device, weight and probability of each available network, network
+                     selected, delay incurred while switching network (s), data downloaded (MB), bit rate observed (Mbps)
+        returns:     None
+        '''
+        networkIndex = [networkID - 1 for networkID in availableNetwork]
+        self.column['weight'][t - 1, deviceID - 1, networkIndex] = weight
+        self.column['probability'][t - 1, deviceID - 1, networkIndex] = probability
+        self.column['network'][t - 1, deviceID - 1] = currentNetwork
+        self.column['delay'][t - 1, deviceID - 1] = delay
+        self.column['download'][t - 1, deviceID - 1] = download
+        self.column['gain'][t - 1, deviceID - 1] = gain
+        # end saveDeviceDetail
+
+    ''' ################################################################################################################################################################### '''
+    def saveNetworkDetail(self, t, load):
+        '''
+        description: saves the number of devices associated to each network in a time slot
+        args:        self, time slot, list of counts in the order of the networks
+        returns:     None
+        '''
+        self.column['load'][t - 1] = load
+        # end saveNetworkDetail
+
+    ''' ################################################################################################################################################################### '''
+    def flush(self):
+        '''
+        description: writes the arrays to their files
+        args:        self
+        returns:     None
+        '''
+        for array in self.column.values(): array.flush()
+        # end flush
+
+    ''' ################################################################################################################################################################### '''
+    def close(self):
+        '''
+        description: writes the arrays to their files and, for the Parquet format, converts them to a device table (one row per time slot and device) and a network
+                     table (one row per time slot), and removes the .npy files
+        args:        self
+        returns:     None
+        '''
+        ColumnarWriter.flush(self)
+        if self.fileFormat != "parquet": return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        numTimeSlot, numDevice, numNetwork = self.column['weight'].shape
+        deviceTable = {'time_slot': np.repeat(np.arange(1, numTimeSlot + 1, dtype=np.int32), numDevice), 'device': np.tile(np.arange(1, numDevice + 1, dtype=np.int32), numTimeSlot)}
+        for name, (_, perNetwork) in DEVICE_COLUMN.items():
+            if perNetwork:
+                for i in range(numNetwork): deviceTable.update({name + "_" + str(i + 1): np.asarray(self.column[name][:, :, i]).reshape(-1)})
+            else: deviceTable.update({name: np.asarray(self.column[name]).reshape(-1)})
+        pq.write_table(pa.table(deviceTable), self.directory + "device.parquet")
+        networkTable = {'time_slot': np.arange(1, numTimeSlot + 1, dtype=np.int32)}
+        for i in range(numNetwork): networkTable.update({"load_" + str(i + 1): np.asarray(self.column['load'][:, i])})
+        pq.write_table(pa.table(networkTable), self.directory + "network.parquet")
+
+        names = list(self.column); self.column = {}
+        for name in names: os.remove(self.directory + name + ".npy")
+        # end close
+# end class ColumnarWriter
+
+''' ______________________________________________________________________ read the columnar output _______________________________________________________________________ '''
+def hasColumnarOutput(runDir):
+    '''
+    description: checks whether the details of a run were saved in the columnar format
+    args:        directory of the run
+    returns:     True or False
+    '''
+    return os.path.exists(runDir + COLUMNAR_DIR + "load.npy") or os.path.exists(runDir + COLUMNAR_DIR + "network.parquet")
+    # end hasColumnarOutput
+
+''' ################################################################################################################################################################### '''
+def loadColumn(runDir, name):
+    '''
+    description: reads one array of the columnar output of a run; a .npy file is memory-mapped, so that only the parts used are read, and only the columns of the array
+                 are read from a Parquet table
+    args:        directory of the run, name of the array (see DEVICE_COLUMN and NETWORK_COLUMN)
+    returns:     array of shape (#time slots, #devices, #networks), (#time slots, #devices) or (#time slots, #networks)
+    '''
+    directory = runDir + COLUMNAR_DIR
+    if os.path.exists(directory + name + ".npy"): return np.load(directory + name + ".npy", mmap_mode="r")
+    import pyarrow.parquet as pq
+
+    if name in NETWORK_COLUMN:
+        table = pq.read_table(directory + "network.parquet", memory_map=True)
+        return np.column_stack([table.column(columnName).to_numpy() for columnName in table.column_names if columnName.startswith(name + "_")])
+    schema = pq.read_schema(directory + "device.parquet")
+    numNetwork = sum(1 for columnName in schema.names if columnName.startswith("weight_"))
+    columnNameList = [name + "_" + str(i + 1) for i in range(numNetwork)] if DEVICE_COLUMN[name][1] else [name]
+    table = pq.read_table(directory + "device.parquet", columns=["time_slot"] + columnNameList, memory_map=True)
+    numTimeSlot = int(table.column("time_slot").to_numpy().max())
+    array = np.stack([table.column(columnName).to_numpy() for columnName in columnNameList], axis=-1).reshape(numTimeSlot, -1, len(columnNameList))
+    return array if DEVICE_COLUMN[name][1] else array[:, :, 0]
+    # end loadColumn
+''' _____________________________________________________________________________ end of file _____________________________________________________________________________ '''
@@ -4,44 +4,77 @@ combines the distance to Nash equilibrium per time slot for all the runs
 
 import csv
 import argparse
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from numpy import median
 from utility_method import saveToCSV, saveToTxt, computeMovingAverage
+from output_writer import openRunFile
+from running_statistic import RunningStatistic, CONFIDENCE_LEVEL
 
 parser = argparse.ArgumentParser(description='Combines the distance to Nash equilibrium per time slot for all the runs.')
 parser.add_argument('-d', dest="root_dir", required=True, help='root directory where data of all runs are stored')
 parser.add_argument('-r', dest="num_run", required=True, help='number of simulation runs')
 parser.add_argument('-t', dest="num_time_slot", required=True, help='number of time slots in each simulation run')
 parser.add_argument('-w', dest="rolling_avg_window", required=True, help='window for rolling average')
+parser.add_argument('-p', dest="num_process", required=False, default=os.cpu_count(), help='number of processes reading the runs (1 to read them in this process)')
+parser.add_argument('-ci', dest="confidence_level", required=False, default=CONFIDENCE_LEVEL, help='level of the confidence interval of the average distance per time slot')
 args = parser.parse_args()
 rootDir = args.root_dir
 numRun = int(args.num_run)
 numTimeSlot = int(args.num_time_slot)
 window = int(args.rolling_avg_window)
+numProcess = int(args.num_process)
+confidenceLevel = float(args.confidence_level)
+RUN_PER_CHUNK = 8   # runs read by a process at a time; fixed, so that the sums (added chunk by chunk) do not depend on the number of processes
 
-def combineDistanceToNashEquilibrium(rootDir, numRun, numTimeSlot):
-    distanceToNashEquilibriumPerTimeSlot = [0] * numTimeSlot
+def readRunChunk(rootDir, runIndexList, numTimeSlot):
+    '''
+    reads the distance to Nash equilibrium per time slot of some runs, one run at a time
+    returns: statistic (sum, mean and squared deviations) of the distance per time slot over the runs, number of time slots at Nash equilibrium in each run
+    '''
+    distanceStatistic = RunningStatistic(numTimeSlot)
     numTimeSlotAtNashEquilibriumPerRun = []
-    for runIndex in range(1, numRun + 1):
-        numTimeSlotAtNashEquilibrium = 0
+    for runIndex in runIndexList:
+        distanceToNashEquilibriumPerTimeSlot = np.zeros(numTimeSlot)   # time slots missing from the file count as 0
+        numRow = 0
         filename = rootDir + "run" + str(runIndex) + "/distanceToNashEquilibrium.csv"
-        with open(filename, newline='') as filename:
-            fileReader = csv.reader(filename)
-            count = 0
-            for row in fileReader:  # compute total gain of user and that of each expert
-                if count != 0:
-                    distance = float(row[0])
-                    distanceToNashEquilibriumPerTimeSlot[count - 1] += distance
-                    if distance == 0: numTimeSlotAtNashEquilibrium += 1
-                count += 1
-        filename.close()
-        numTimeSlotAtNashEquilibriumPerRun.append(numTimeSlotAtNashEquilibrium)
-    for i in range(len(distanceToNashEquilibriumPerTimeSlot)):
-        distanceToNashEquilibriumPerTimeSlot[i] = distanceToNashEquilibriumPerTimeSlot[i]/numRun
-    return distanceToNashEquilibriumPerTimeSlot, numTimeSlotAtNashEquilibriumPerRun
+        with openRunFile(filename) as distanceFile:                 # plain or compressed
+            fileReader = csv.reader(distanceFile)
+            next(fileReader, None)  # header
+            for row in fileReader:
+                distanceToNashEquilibriumPerTimeSlot[numRow] = float(row[0])
+                numRow += 1
+        distanceStatistic.update(distanceToNashEquilibriumPerTimeSlot)
+        numTimeSlotAtNashEquilibriumPerRun.append(int(np.count_nonzero(distanceToNashEquilibriumPerTimeSlot[:numRow] == 0)))
+    return distanceStatistic, numTimeSlotAtNashEquilibriumPerRun
+
+def combineDistanceToNashEquilibrium(rootDir, numRun, numTimeSlot, numProcess=1):
+    '''
+    reads the runs in chunks, on a pool of processes if numProcess > 1, and merges the statistics of the chunks in the order of the runs, so that only one statistic
+    per chunk is held in memory and sent back by the processes
+    returns: statistic of the distance per time slot over all runs, number of time slots at Nash equilibrium in each run
+    '''
+    runIndexList = list(range(1, numRun + 1))
+    chunkList = [runIndexList[i:i + RUN_PER_CHUNK] for i in range(0, numRun, RUN_PER_CHUNK)]
+    distanceStatistic = RunningStatistic(numTimeSlot)
+    numTimeSlotAtNashEquilibriumPerRun = []
+    with ProcessPoolExecutor(max_workers=numProcess) if numProcess > 1 else nullcontext() as executor:     # pool shut down even if a chunk fails
+        mapChunk = executor.map if executor is not None else map
+        for chunkStatistic, numTimeSlotAtNashEquilibriumPerChunk in mapChunk(readRunChunk, [rootDir] * len(chunkList), chunkList, [numTimeSlot] * len(chunkList)):
+            distanceStatistic.merge(chunkStatistic)
+            numTimeSlotAtNashEquilibriumPerRun += numTimeSlotAtNashEquilibriumPerChunk
+    return distanceStatistic, numTimeSlotAtNashEquilibriumPerRun
 
 def main():
-    global rootDir, numRun, numTimeSlot, window
-    avgDistanceToNashEquilibriumPerTimeSlot, numTimeSlotAtNashEquilibriumPerRun = combineDistanceToNashEquilibrium(rootDir, numRun, numTimeSlot)
+    global rootDir, numRun, numTimeSlot, window, numProcess, confidenceLevel
+    distanceStatistic, numTimeSlotAtNashEquilibriumPerRun = combineDistanceToNashEquilibrium(rootDir, numRun, numTimeSlot, numProcess)
+    avgDistanceToNashEquilibriumPerTimeSlot = distanceStatistic.sum / numRun
+    halfWidth = distanceStatistic.confidenceHalfWidth(confidenceLevel)
+    saveToCSV(rootDir + "distanceToNashEquilibrium_confidence.csv", ["average_distance", "standard_deviation", "lower_bound_" + str(confidenceLevel), "upper_bound_" + str(confidenceLevel)],
+              zip(avgDistanceToNashEquilibriumPerTimeSlot.tolist(), np.sqrt(distanceStatistic.variance()).tolist(), (avgDistanceToNashEquilibriumPerTimeSlot - halfWidth).tolist(),
+                  (avgDistanceToNashEquilibriumPerTimeSlot + halfWidth).tolist()))   # per time slot, not smoothed
     avgDistanceToNashEquilibriumPerTimeSlot = computeMovingAverage(avgDistanceToNashEquilibriumPerTimeSlot, window)
     print("avgDistanceToNashEquilibriumPerTimeSlot:", avgDistanceToNashEquilibriumPerTimeSlot)
     avgDistanceToNashEquilibriumPerTimeSlot = [[x] for x in avgDistanceToNashEquilibriumPerTimeSlot]
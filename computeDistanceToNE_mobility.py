@@ -12,6 +12,13 @@ import csv
 from sys import argv
 from copy import deepcopy
 from NetworkGraph import NetworkGraph
+from utility_method import decodeDeviceSet
+from columnar_output import hasColumnarOutput, loadColumn
+from distance_table import DistanceTable, DISTANCE_TABLE_DIR
+from output_writer import openRunFile, runFileExists
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+import numpy as np
 import os
 import argparse
 
@@ -21,11 +28,13 @@ parser.add_argument('-k', dest="num_network", required=True, help='number of wir
 parser.add_argument('-dir', dest="directory", required=True, help='root directory containing the simulation files')
 parser.add_argument('-t', dest="num_time_slot", required=True, help='number of time slots in the simulation run')
 parser.add_argument('-r', dest="number_of_run", required=True, help='number of runs')
-parser.add_argument('-pr', dest="number_of_parallel_run", required=True, help='number of parallel runs')
-parser.add_argument('-p', dest="current_phase", required=True, help='current phase')
-parser.add_argument('-ne', dest="nash_equilibrium_state_list", required=True, help='list of Nash equilibrium states')
-parser.add_argument('-u', dest="device_list", required=True, help='list of devices being considered')
+parser.add_argument('-pr', dest="number_of_parallel_run", required=True, help='number of runs processed in parallel (1 to process them in this process)')
+parser.add_argument('-p', dest="current_phase", required=True, help='phase(s) processed, separated by ","')
+parser.add_argument('-ne', dest="nash_equilibrium_state_list", required=True, help='Nash equilibrium state of each phase processed, separated by ";"')
+parser.add_argument('-u', dest="device_list", required=True, help='list(s) of devices being considered, separated by ";"; each file is read once for all lists')
 parser.add_argument('-b', dest="network_bandwidth", required=True, help='total bandwidth of each network as a string separated with "_".')
+parser.add_argument('-table', dest="distance_table_dir", required=False, default="none",
+                    help='directory of the tables of distance to NE per state (see distance_table.py), e.g. <dir>/' + DISTANCE_TABLE_DIR + '; default: none, every state computed')
 args = parser.parse_args()
 
 numUser = int(args.num_device)
@@ -34,10 +43,12 @@ dir = args.directory
 MAX_NUM_ITERATION = int(args.num_time_slot)
 numRun = int(args.number_of_run)
 numParallelRun = int(args.number_of_parallel_run)
-currentPhase = int(args.current_phase)
-NE = args.nash_equilibrium_state_list.split(","); NE = [int(x) for x in NE]
-userBeingConsideredList = args.device_list.split(","); userBeingConsideredList = [int(x) for x in userBeingConsideredList]
+phaseList = [int(x) for x in args.current_phase.split(",")]
+NElist = [[int(x) for x in NE.split(",")] for NE in args.nash_equilibrium_state_list.split(";")]      # NE state of each phase, in the order of phaseList
+userGroupList = [[int(x) for x in userBeingConsideredList.split(",")] for userBeingConsideredList in args.device_list.split(";")]
+if len(NElist) != len(phaseList): parser.error("one Nash equilibrium state is needed per phase (-ne)")
 NETWORK_BANDWIDTH = args.network_bandwidth.split("_"); NETWORK_BANDWIDTH = [int(x) for x in NETWORK_BANDWIDTH]
+tableDir = args.distance_table_dir if args.distance_table_dir != "none" else None
 
 NETWORK_ID = [2, 3, 4, 5, 1] # network ID in ascending order of accessibility (users from how many networks can have access to it)
 numMobileUser = 8   # number of users moving
@@ -47,82 +58,138 @@ outputDir = dir # + "extractedData/"
 if os.path.exists(outputDir) == False: os.makedirs(outputDir)
 # outputCSVfile_allRuns = outputDir + "distanceToNE_allRuns.csv"
 
-CURRENT_PHASE = "PHASE_" + str(currentPhase)
-iterationNumOffset = (MAX_NUM_ITERATION) * (currentPhase - 1)
-# print("currentPhase:", currentPhase, ", iterationNumOffset", iterationNumOffset)
-outputCSVfile_allRuns = outputDir + "distanceToNE_avgAllRuns_phase_" + str(currentPhase) + "_users" + str(userBeingConsideredList[0]) + "_" + str(userBeingConsideredList[-1]) + ".csv"
-
 epsilon = 7.5
+distanceTable = {}  # tables of distance to NE read by this process, {(phase, index of the list of users being considered): table}
 
 DEBUG = 0
 
 ''' ------------------------------------------------------------------------------------------------------------------------------------------------------------------------ '''
 def computeDistanceToNE():
     '''
-    @desc:      at each iteration of every run, computes the distance of the current state to Nash equilibrium
+    @desc:      at each iteration of every run, computes the distance of the current state to Nash equilibrium, for each phase and each list of users being considered;
+                the runs are processed by numParallelRun processes
     @param:     none
-    @returns:   list of distances to Nash equilibrium for each iteration (averaged over all runs), string containing all epsilon equilibrium points
+    @returns:   {(phase, index of the list of users): (list of distances to Nash equilibrium for each iteration (averaged over all runs), string containing all epsilon
+                equilibrium points)}
     '''
 
-    distanceToNE_avgAllRuns = [0] * MAX_NUM_ITERATION               # to store distance to NE per time steps (averaged over all runs)
-    epsilonEquilibriumPoints = ""                                   # stores list of epsilon equilibrium points; may be used if plot is required
-    availableNetworkPerUser = buildAvailableNetworkPerUserList()
-    sortedUserList = sortUserListAscNumAvailableNetwork(availableNetworkPerUser)
-
-    for j in range(numRun):
-        # create list to store distance to NE per time steps (for individual runs)
-        distanceToNE_perRun = [0] * MAX_NUM_ITERATION
-
-        networkCSVfile = dir + "run" + str(j + 1) + "/" + CURRENT_PHASE + "/network.csv"
-        with open(networkCSVfile, newline='') as networkCSVfile:
-            networkReader = csv.reader(networkCSVfile)
-            count = 0
-
-            for rowNetwork in networkReader:  # compute total gain of user and that of each expert
-                if count != 0:
-                    #print("rowNetwork:", rowNetwork)
-                    runNum = int(rowNetwork[0])
-                    iterationNum = int(rowNetwork[1])
-                    numUserPerNet = []
-
-                    for i in range(numNetwork): numUserPerNet.append(int(rowNetwork[3 + i])) # construct list with number of users per network
+    distanceToNE_avgAllRuns = {(currentPhase, groupIndex): [0] * MAX_NUM_ITERATION for currentPhase in phaseList for groupIndex in range(len(userGroupList))}
+    with ProcessPoolExecutor(max_workers=numParallelRun) if numParallelRun > 1 else nullcontext() as executor:   # runs processed in parallel; results in the order of the runs
+        mapRun = executor.map if executor is not None else map
+        for j, distanceToNE_perRun in enumerate(mapRun(computeRunDistanceToNE, range(1, numRun + 1))):
+            for currentPhase in phaseList:
+                for groupIndex in range(len(userGroupList)):
+                    for i in range(MAX_NUM_ITERATION): distanceToNE_avgAllRuns[(currentPhase, groupIndex)][i] += distanceToNE_perRun[(currentPhase, groupIndex)][i]
+                print("done for run" + str(j + 1) + " - phase " + str(currentPhase))
+
+    result = {}
+    for key in distanceToNE_avgAllRuns:
+        epsilonEquilibriumPoints = ""                               # stores list of epsilon equilibrium points; may be used if plot is required
+        distanceToNE_avgAllRuns[key] = [distance/numRun for distance in distanceToNE_avgAllRuns[key]]  # compute the average
+        for i in range(len(distanceToNE_avgAllRuns[key])):
+            if distanceToNE_avgAllRuns[key][i] <= epsilon:
+                if epsilonEquilibriumPoints == "": epsilonEquilibriumPoints += str(i + 1)
+                else: epsilonEquilibriumPoints += "," + str(i + 1)
+        result.update({key: (distanceToNE_avgAllRuns[key], epsilonEquilibriumPoints)})
+    return result
 
-                    # construct list of users per network
-                    userListPerNet = []
-                    for i in range(numNetwork):
-                        userListCurrentNet = []
-                        userListCurrentNetStr = rowNetwork[3 + numNetwork + i]
-                        if userListCurrentNetStr != "set()":
-                            userListCurrentNetStrSplit = userListCurrentNetStr[1:-1].split(", ")
-                            for ID in userListCurrentNetStrSplit: userListCurrentNet.append(int(ID))
-
-                        userListCurrentNetSorted = sortUserListAscNumAvailableNetwork(availableNetworkPerUser, userListCurrentNet)
-                        userListPerNet.append(userListCurrentNetSorted)
-
-                    # construct graph of networks and users
-                    networkGraph = buildNetworkGraph(numNetwork, numUser, availableNetworkPerUser, userListPerNet)
+''' ------------------------------------------------------------------------------------------------------------------------------------------------------------------------ '''
+def computeRunDistanceToNE(runIndex):
+    '''
+    @desc:      computes the distance to Nash equilibrium at each iteration of a run, for each phase and each list of users being considered, and saves it in the
+                directory of the phase; the network file of each phase is read once, and the distance of each distinct state is computed once for all lists of users (the
+                moves to NE do not depend on the users considered) or looked up in the tables of distance
+    @param:     index of the run
+    @returns:   {(phase, index of the list of users): list of distances to Nash equilibrium for each iteration}
+    '''
+    distanceToNE_perRun = {}
+    for currentPhase, NE in zip(phaseList, NElist):
+        iterationNumOffset = MAX_NUM_ITERATION * (currentPhase - 1)
+        iterationList = []; stateList = []
+        for iterationNum, numUserPerNet, userListPerNet in readNetworkDetail(dir + "run" + str(runIndex) + "/", currentPhase):
+            # number of users per network, then network of each user (0 if none), then position of each user in the list of its network (the users of a network are
+            # listed in the order read, which the distance depends on: ascending IDs for bitsets, the order written for the set text of older files)
+            state = numUserPerNet + [0] * (2 * numUser)
+            for netIndex in range(len(userListPerNet)):
+                for position, userID in enumerate(userListPerNet[netIndex]):
+                    state[numNetwork + userID - 1] = netIndex + 1; state[numNetwork + numUser + userID - 1] = position
+            iterationList.append(iterationNum); stateList.append(state)
+
+        stateDistance = {}                                          # distance of each state computed, for each list of users, {state: list of distances}
+        def getStateDistance(iterationNum, state):
+            if tuple(state) not in stateDistance: stateDistance.update({tuple(state): computeStateDistance(iterationNum, state, currentPhase, NE)})
+            return stateDistance[tuple(state)]
+
+        for groupIndex, userBeingConsideredList in enumerate(userGroupList):
+            if tableDir is not None:
+                if (currentPhase, groupIndex) not in distanceTable:
+                    # distance of each state (number of users per network and network of each user) already computed, for the configuration of the phase and the users considered
+                    distanceTable.update({(currentPhase, groupIndex): DistanceTable(tableDir, ("user association", currentPhase, NE, NETWORK_BANDWIDTH, NETWORK_ID,
+                                                                                                buildAvailableNetworkPerUserList(currentPhase), userBeingConsideredList))})
+                distanceList = distanceTable[(currentPhase, groupIndex)].lookup(stateList, lambda stateArray, firstIndex: [getStateDistance(iterationList[i], state)[groupIndex]
+                                                                                for i, state in zip(firstIndex.tolist(), stateArray.tolist())]).tolist()
+                distanceTable[(currentPhase, groupIndex)].save()
+            else: distanceList = [getStateDistance(iterationNum, state)[groupIndex] for iterationNum, state in zip(iterationList, stateList)]
+
+            # create list to store distance to NE per time steps (for individual runs)
+            distanceToNE_perRun.update({(currentPhase, groupIndex): [0] * MAX_NUM_ITERATION})
+            for iterationNum, distance in zip(iterationList, distanceList):
+                if distance <= 0: distance = 0                      # as computed (an int), when no user can gain
+                distanceToNE_perRun[(currentPhase, groupIndex)][iterationNum - iterationNumOffset - 1] = distance
+            savePerRunCSVfile(runIndex, currentPhase, userBeingConsideredList, distanceToNE_perRun[(currentPhase, groupIndex)])
+    return distanceToNE_perRun
 
-                    distance = computeDistance(iterationNum, numUserPerNet, userListPerNet, availableNetworkPerUser, networkGraph)
+''' ------------------------------------------------------------------------------------------------------------------------------------------------------------------------ '''
+def readNetworkDetail(runDir, currentPhase):
+    '''
+    @desc:      reads the number of users and the list of users associated to each network at each iteration of a phase of a run, from the network csv file of the phase
+                (plain or compressed) or, if the run was saved in the columnar format (see columnar_output.py), from the arrays of the run
+    @param:     directory of the run, phase
+    @returns:   generator of (iteration number, list of number of users per network, list of users per network)
+    '''
+    networkCSVfile = runDir + "PHASE_" + str(currentPhase) + "/network.csv"
+    iterationNumOffset = MAX_NUM_ITERATION * (currentPhase - 1)
+    if not runFileExists(networkCSVfile) and hasColumnarOutput(runDir):
+        load = loadColumn(runDir, "load"); network = loadColumn(runDir, "network")
+        for iterationNum in range(iterationNumOffset + 1, iterationNumOffset + MAX_NUM_ITERATION + 1):
+            numUserPerNet = [int(numUser) for numUser in load[iterationNum - 1]]
+            userListPerNet = [[int(user) + 1 for user in np.flatnonzero(network[iterationNum - 1] == networkID)] for networkID in range(1, numNetwork + 1)]
+            yield iterationNum, numUserPerNet, userListPerNet
+        return
+    with openRunFile(networkCSVfile) as networkCSVfile:        # plain or compressed
+        networkReader = csv.reader(networkCSVfile)
+        next(networkReader)     # header
+        for rowNetwork in networkReader:
+            numUserPerNet = [int(rowNetwork[3 + i]) for i in range(numNetwork)]                             # number of users per network
+            userListPerNet = [decodeDeviceSet(rowNetwork[3 + numNetwork + i]) for i in range(numNetwork)]    # hex bitset (or set text in older files)
+            yield int(rowNetwork[1]), numUserPerNet, userListPerNet
 
-                    distanceToNE_perRun[iterationNum - iterationNumOffset- 1] = distance
-                    distanceToNE_avgAllRuns[iterationNum - iterationNumOffset - 1] += distance
-                count += 1
-        print("done for run" + str(j + 1) + " - phase " + str(currentPhase))
-        savePerRunCSVfile((j + 1), distanceToNE_perRun)
+''' ------------------------------------------------------------------------------------------------------------------------------------------------------------------------ '''
+def computeStateDistance(iterationNum, state, currentPhase, NE):
+    '''
+    @desc:      computes the distance to Nash equilibrium of a state, for each list of users being considered
+    @param:     iteration number (for error messages), state (number of users per network, then network of each user, 0 if none, then position of each user in the
+                list of its network), phase, NE state of the phase
+    @returns:   list of distances of the state from Nash equilibrium, one per list of users being considered
+    '''
+    availableNetworkPerUser = buildAvailableNetworkPerUserList(currentPhase)
+    numUserPerNet = state[:numNetwork]
+    userListPerNet = [sorted((userID for userID in range(1, numUser + 1) if state[numNetwork + userID - 1] == netIndex + 1),
+                             key=lambda userID: state[numNetwork + numUser + userID - 1]) for netIndex in range(numNetwork)]    # in the order read
+    # construct list of users per network
+    userListPerNet = [sortUserListAscNumAvailableNetwork(availableNetworkPerUser, userListCurrentNet) for userListCurrentNet in userListPerNet]
 
-    distanceToNE_avgAllRuns = [distance/(numParallelRun * numRun) for distance in distanceToNE_avgAllRuns]  # compute the average
-    for i in range(len(distanceToNE_avgAllRuns)):
-        if distanceToNE_avgAllRuns[i] <= epsilon:
-            if epsilonEquilibriumPoints == "": epsilonEquilibriumPoints += str(i + 1)
-            else: epsilonEquilibriumPoints += "," + str(i + 1)
+    # construct graph of networks and users
+    networkGraph = buildNetworkGraph(numNetwork, numUser, availableNetworkPerUser, userListPerNet)
 
-    return distanceToNE_avgAllRuns, epsilonEquilibriumPoints
+    return computeDistance(iterationNum, numUserPerNet, userListPerNet, availableNetworkPerUser, networkGraph, NE)
+    # end computeStateDistance
 
 ''' ------------------------------------------------------------------------------------------------------------------------------------------------------------------------ '''
-def buildAvailableNetworkPerUserList():
+def buildAvailableNetworkPerUserList(currentPhase):
     '''
     @desc:      constructs the list of networks available to each user
-    @param:     none
+    @param:     phase
     @returns:   list consisting of sub-lists representing list of networks available to each user
     '''
 
@@ -196,25 +263,24 @@ def findNetToMoveTo(currentNetIndex, numUserDiff):
     return -1
 
 ''' ------------------------------------------------------------------------------------------------------------------------------------------------------------------------ '''
-def transferUser(fromNetID, toNetID, verticesAlongPath, networkGraph, maxNumUserToBeMoved, numUserPerNet, userListPerNet):
+def transferUser(fromNetID, toNetID, verticesAlongPath, networkGraph, maxNumUserToBeMoved, numUserPerNet, userListPerNet, NE):
 
-    distance = 0
+    distance = [0] * len(userGroupList)     # per list of users being considered
 
     # find the minimum number of users who can be moved along the edges
     fromVertex = fromNetID
     toVertex = verticesAlongPath[1]
-    for edge in networkGraph.edges:   # get number of users along edge(   fromVertex, toVertex)
-        if edge.sourceVertex == fromVertex and edge.destinationVertex == toVertex:
-            numUsersOnEdge = len(edge.userList)
-            break
+    edge = networkGraph.getEdge(fromVertex, toVertex)
+    if edge is None: raise ValueError("no edge from network " + str(fromVertex) + " to network " + str(toVertex) + " along the path " + str(verticesAlongPath))
+    numUsersOnEdge = len(edge.userList)   # get number of users along edge(   fromVertex, toVertex)
     numUserMoved = min(maxNumUserToBeMoved, numUsersOnEdge)
 
     if DEBUG >= 1: print("-----> in transferUser; fromNetID:", fromNetID, ", toNetID:", toNetID, ", totalNumUserToBeMoved: ", maxNumUserToBeMoved, ", number of users who can be moved: ", numUserMoved, "; pathLength: ", verticesAlongPath, "---", len(verticesAlongPath))
     prevVertex = fromNetID
     for vertex in verticesAlongPath[1:]:  # ignore the start vertex
         if DEBUG >= 1: print("considering edge ", prevVertex, "to", vertex)
-        for edge in networkGraph.edges[::-1]:  # get number of users along edge(prevVertex, vertex)
-            if edge.sourceVertex == prevVertex and edge.destinationVertex == vertex: # edge along which user will be moved
+        for edge in networkGraph.outgoingEdge.get(prevVertex, [])[::-1]:  # get number of users along edge(prevVertex, vertex)
+            if edge.destinationVertex == vertex: # edge along which user will be moved
                 if DEBUG >= 1: print("going to move", numUserMoved, "from edge (", prevVertex,",", vertex,") with user list", edge.userList)
                 for i in range(numUserMoved): # move 'numUserMoved' users
                     userBeingMoved = edge.userList[0]
@@ -227,8 +293,8 @@ def transferUser(fromNetID, toNetID, verticesAlongPath, networkGraph, maxNumUser
 
                     # path length > 1, add the users moved to the set of outgoing edges of the intermediary network
                     if (len(verticesAlongPath) - 1) > 1:
-                        for edgeIntermediaryNet in networkGraph.edges[::-1]:
-                            if edgeIntermediaryNet.sourceVertex == vertex: networkGraph.addUserToEdge(edgeIntermediaryNet.sourceVertex, edgeIntermediaryNet.destinationVertex, userBeingMoved)
+                        for edgeIntermediaryNet in networkGraph.outgoingEdge.get(vertex, [])[::-1]:
+                            networkGraph.addUserToEdge(edgeIntermediaryNet.sourceVertex, edgeIntermediaryNet.destinationVertex, userBeingMoved)
 
                     #print("@@@ moving user", userBeingMoved, "from network", prevVertex, "to network", vertex)
 
@@ -240,9 +306,10 @@ def transferUser(fromNetID, toNetID, verticesAlongPath, networkGraph, maxNumUser
                 ##### include distance only if the user is being considered
                 tmpDistance = (newGain - oldGain) * 100 / oldGain
                 #print("tmpDistance: ", tmpDistance, ", moving user", userBeingMoved, "from network", prevVertex, "to network", vertex)
-                if isUserBeingConsidered([userBeingMoved]):
-                    if tmpDistance > distance: distance = tmpDistance
-                    #print("tmpDistance is taken into consideration, distance = ", distance)
+                for groupIndex in range(len(userGroupList)):
+                    if isUserBeingConsidered([userBeingMoved], userGroupList[groupIndex]):
+                        if tmpDistance > distance[groupIndex]: distance[groupIndex] = tmpDistance
+                        #print("tmpDistance is taken into consideration, distance = ", distance)
                 #else:
                     #print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~Will not consider distance...; user being moved is ", userBeingMoved)#; input()
         prevVertex = vertex
@@ -252,26 +319,25 @@ def transferUser(fromNetID, toNetID, verticesAlongPath, networkGraph, maxNumUser
     # end transferUser
 
 ''' ------------------------------------------------------------------------------------------------------------------------------------------------------------------------ '''
-def isUserBeingConsidered(uList):
+def isUserBeingConsidered(uList, userBeingConsideredList):
     for user in uList:
         if user in userBeingConsideredList: return True
     return False
     # end isUserBeingConsidered
 
 ''' ------------------------------------------------------------------------------------------------------------------------------------------------------------------------ '''
-def computeDistance(iterationNum, numUserPerNet, userListPerNet, availableNetworkPerUser, networkGraph):
+def computeDistance(iterationNum, numUserPerNet, userListPerNet, availableNetworkPerUser, networkGraph, NE):
     '''
-    @desc:       computes the distance of a particular state from Nash equilibrium
+    @desc:       computes the distance of a particular state from Nash equilibrium, for each list of users being considered (the users are moved once for all lists)
     @param:    the iteration number in the run being processed, list of users in ascending  order of number of networks available, number
-                      of users per network, list of users per network (user ID), networks available to each user
-    returns:     distance of the particular state from Nash equilibrium
+                      of users per network, list of users per network (user ID), networks available to each user, NE state
+    returns:     list of distances of the particular state from Nash equilibrium, one per list of users being considered
     '''
     # compute the distance from the current state to NE as sum of all additional bandwidth obtainable by the users by moving to NE state
-    distance = 0
+    distance = [0] * len(userGroupList)
     numUserDiff = [] # only for the print statement at end of the function...
 
     if numUserPerNet != NE:  # current state is not NE
-        distance = 0
 
         numUserDiff = list(numUserAtNE - numUserAtPresent for numUserAtNE, numUserAtPresent in zip(NE, numUserPerNet))
 
@@ -304,24 +370,25 @@ def computeDistance(iterationNum, numUserPerNet, userListPerNet, availableNetwor
                         if DEBUG >= 1: print("trying to move users from network ", fromNetID, "to network", toNetID, ", currentPathLength: ", currentPathLength, ", path length: ", pathLength, ", vertices along path:", verticesAlongPath)
                         if pathLength == currentPathLength: # number of 'hops' along the path is same as the path length being considered in this iteration
                             maxNumUserToBeMoved = min(totalNumUserToBeMoved, numUserDiff[toNetIndex])
-                            numUserMoved, tmpDistance = transferUser(fromNetID, toNetID, verticesAlongPath, networkGraph, maxNumUserToBeMoved, numUserPerNet, userListPerNet)
-                            if tmpDistance > distance: distance = tmpDistance ##### just added this line
+                            numUserMoved, tmpDistance = transferUser(fromNetID, toNetID, verticesAlongPath, networkGraph, maxNumUserToBeMoved, numUserPerNet, userListPerNet, NE)
+                            distance = [max(distanceCurrentList, tmpDistanceCurrentList) for distanceCurrentList, tmpDistanceCurrentList in zip(distance, tmpDistance)] ##### just added this line
                             numUserDiff[fromNetIndex] += numUserMoved # it's initially a negative value
                             numUserDiff[toNetIndex] -= numUserMoved  # it's initially a positive value
                             #print("tmpDistance before second condition: ", tmpDistance)
                             if numUserDiff[fromNetIndex] == 0: # all users moved from the network, compute the % higher gain users in that network can get
                                 oldGain = NETWORK_BANDWIDTH[fromNetIndex]/numUserPerNet[fromNetIndex]
                                 newGain = NETWORK_BANDWIDTH[fromNetIndex]/NE[fromNetIndex]
-                                tmpDistance = max( tmpDistance, (newGain - oldGain) * 100 / oldGain)
+                                tmpDistance = [max(tmpDistanceCurrentList, (newGain - oldGain) * 100 / oldGain) for tmpDistanceCurrentList in tmpDistance]
                                 #print("oldGain: ", oldGain, ", newGain:", newGain, ", tmpDistance: ", tmpDistance)
                                 #print("tmpDistance after second condition: ", tmpDistance)
 
                             #print("successfully transferred", numUserMoved, "from network", fromNetID, "to network", toNetID, "; numUserDiff:", numUserDiff, ",tmpDistance:", tmpDistance)
 
                             ##### include distance only if the user is being considered
-                            if isUserBeingConsidered(userListPerNet[fromNetIndex]):
-                                if tmpDistance > distance: distance = tmpDistance
-                                #print("tmpDistance is taken into consideration, distance = ", distance)
+                            for groupIndex in range(len(userGroupList)):
+                                if isUserBeingConsidered(userListPerNet[fromNetIndex], userGroupList[groupIndex]):
+                                    if tmpDistance[groupIndex] > distance[groupIndex]: distance[groupIndex] = tmpDistance[groupIndex]
+                                    #print("tmpDistance is taken into consideration, distance = ", distance)
                             #else:
                                 #print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~Will not consider distance..., user(s) left in the network is/are ", userListPerNet[fromNetIndex]); #input()
                                 #if tmpDistance > 45: print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~Will not consider distance..., user(s) left in the network is/are ", userListPerNet[fromNetIndex])
@@ -340,8 +407,9 @@ def computeDistance(iterationNum, numUserPerNet, userListPerNet, availableNetwor
     return distance
 
 ''' ------------------------------------------------------------------------------------------------------------------------------------------------------------------------ '''
-def savePerRunCSVfile(j, distanceToNE_perRun):
+def savePerRunCSVfile(j, currentPhase, userBeingConsideredList, distanceToNE_perRun):
     outputCSVfile_singleRun = dir + "run" + str(j) + "/PHASE_" + str(currentPhase) + "/distanceToNE_device" + str(userBeingConsideredList[0]) + "_" + str(userBeingConsideredList[-1]) + ".csv"
+    if os.path.exists(os.path.dirname(outputCSVfile_singleRun)) == False: os.makedirs(os.path.dirname(outputCSVfile_singleRun))  # no phase directory in the columnar format
     outfile = open(outputCSVfile_singleRun, "w")
     out = csv.writer(outfile, delimiter=',', quoting=csv.QUOTE_ALL)
     out.writerow(["Time step", "Total higher gain observable by a user"])
@@ -351,10 +419,16 @@ def savePerRunCSVfile(j, distanceToNE_perRun):
 ''' ------------------------------------------------------------------------------------------------------------------------------------------------------------------------ '''
 # main program
 
-distanceToNE_avgAllRuns, epsilonEquilibriumPoints = computeDistanceToNE()
-
-outfile = open(outputCSVfile_allRuns, "w")
-out = csv.writer(outfile, delimiter=',', quoting=csv.QUOTE_ALL)
-out.writerow(["Time step", "Total higher gain observable by a user (average over all runs)"])
-for i in range(len(distanceToNE_avgAllRuns)): out.writerow([(i + 1) + iterationNumOffset, distanceToNE_avgAllRuns[i]])
-outfile.close()
\ No newline at end of file
+if __name__ == "__main__":
+    distanceToNE = computeDistanceToNE()
+
+    for currentPhase in phaseList:
+        iterationNumOffset = MAX_NUM_ITERATION * (currentPhase - 1)
+        for groupIndex, userBeingConsideredList in enumerate(userGroupList):
+            distanceToNE_avgAllRuns, epsilonEquilibriumPoints = distanceToNE[(currentPhase, groupIndex)]
+            outputCSVfile_allRuns = outputDir + "distanceToNE_avgAllRuns_phase_" + str(currentPhase) + "_users" + str(userBeingConsideredList[0]) + "_" + str(userBeingConsideredList[-1]) + ".csv"
+            outfile = open(outputCSVfile_allRuns, "w")
+            out = csv.writer(outfile, delimiter=',', quoting=csv.QUOTE_ALL)
+            out.writerow(["Time step", "Total higher gain observable by a user (average over all runs)"])
+            for i in range(len(distanceToNE_avgAllRuns)): out.writerow([(i + 1) + iterationNumOffset, distanceToNE_avgAllRuns[i]])
+            outfile.close()
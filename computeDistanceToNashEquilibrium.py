@@ -3,6 +3,7 @@
 '''
 
 from utility_method import computeDistanceToNashEquilibrium, saveToCSV
+from distance_table import DISTANCE_TABLE_DIR
 
 NUM_NETWORK = 3
 DIR = "/media/anuja/myDrive/FullInformation_eta_20/"
@@ -13,7 +14,7 @@ numRun = 500
 
 for i in range(1, numRun + 1):
     runDir = DIR + "run" + str(i) + "/"
-    distanceToNE = computeDistanceToNashEquilibrium(NUM_NETWORK, runDir + "network.csv", NETWORK_BANDWIDTH, nashEquilibriumStateList)
+    distanceToNE = computeDistanceToNashEquilibrium(NUM_NETWORK, runDir + "network.csv", NETWORK_BANDWIDTH, nashEquilibriumStateList, 1, NUM_TIME_SLOT, DIR + DISTANCE_TABLE_DIR)
     outputfile = runDir + "distanceToNashEquilibrium.csv"
     saveToCSV(outputfile, ["Distance_to_Nash_equilibrium"], distanceToNE)
     print(distanceToNE.count([0])*100/NUM_TIME_SLOT, "% time spent at NE")
@@ -0,0 +1,78 @@
+'''
+@description:   Defines a table of the distance to Nash equilibrium of each association state, for one configuration (bandwidth of each network, NE states, ...), filled
+                lazily and saved on disk, so that the distance of a state is computed once for all time slots, runs and campaigns with the same configuration; the time
+                slots of a run are then looked up by state. A state is a vector of integers (e.g. the number of devices per network); the file of a configuration is
+                named after a hash of the configuration, in the directory of the tables
+'''
+
+import hashlib
+import os
+import numpy as np
+
+''' ______________________________________________________________________________ constants ______________________________________________________________________________ '''
+DISTANCE_TABLE_DIR = "distanceTable/"               # default directory of the tables, in the root directory of the campaign
+TABLE_VERSION = 2                                   # version of the distance computations and of the states; part of the name of each table, so that the tables
+                                                    # filled by an earlier version are not used (to be incremented whenever a distance or a state changes)
+
+''' ___________________________________________________________________ DistanceTable class definition ____________________________________________________________________ '''
+class DistanceTable(object):
+    ''' distance of each state already computed, {state (bytes of the int32 vector): distance} '''
+
+    def __init__(self, tableDir, configuration):
+        self.path = os.path.join(tableDir, "distance_" + hashlib.sha1(repr((TABLE_VERSION, configuration)).encode()).hexdigest()[:16] + ".npz")
+        self.configuration = repr((TABLE_VERSION, configuration))   # saved with the table, to tell the tables apart when reading the directory
+        self.distance = {}
+        self.numNewState = 0                        # states computed since the table was read
+        if os.path.exists(self.path): DistanceTable.read(self)
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def read(self):
+        '''
+        description: reads the states saved in the file of the table (which another process may have extended since this one read it)
+        args:        self
+        returns:     None
+        '''
+        with np.load(self.path) as table:
+            for state, distance in zip(table['state'], table['distance'].tolist()): self.distance.setdefault(state.tobytes(), distance)
+        # end read
+
+    ''' ################################################################################################################################################################### '''
+    def lookup(self, stateArray, computeDistance):
+        '''
+        description: returns the distance of the state in each row; the distance of each state not in the table yet is computed once and added to the table
+        args:        self, array of states (one per row), function computing the distance of an array of distinct states given the index of the row in which each
+                     state first appears, and returning a sequence of distances
+        returns:     array of distances, one per row
+        '''
+        stateArray = np.asarray(stateArray, dtype=np.int32)
+        if len(stateArray) == 0: return np.zeros(0)
+        uniqueState, firstIndex, inverse = np.unique(stateArray, axis=0, return_index=True, return_inverse=True)
+        key = [state.tobytes() for state in uniqueState]
+        missing = [i for i in range(len(key)) if key[i] not in self.distance]
+        if missing != []:
+            for i, distance in zip(missing, computeDistance(uniqueState[missing], firstIndex[missing])): self.distance.update({key[i]: float(distance)})
+            self.numNewState += len(missing)
+        return np.array([self.distance[stateKey] for stateKey in key])[inverse.reshape(-1)]
+        # end lookup
+
+    ''' ################################################################################################################################################################### '''
+    def save(self):
+        '''
+        description: saves the table if states were added, merged with the states saved by other processes in the meantime; the file is replaced at once, so that
+                     readers never see a partial table (states added by a process saving at the same time may be lost, and are then computed again)
+        args:        self
+        returns:     None
+        '''
+        if self.numNewState == 0: return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path): DistanceTable.read(self)
+        stateList = list(self.distance)
+        state = np.array([np.frombuffer(stateKey, dtype=np.int32) for stateKey in stateList])
+        temporaryPath = self.path[:-len(".npz")] + "." + str(os.getpid()) + ".tmp.npz"
+        np.savez(temporaryPath, state=state, distance=np.array([self.distance[stateKey] for stateKey in stateList]), configuration=self.configuration)
+        os.replace(temporaryPath, self.path)
+        self.numNewState = 0
+        # end save
+# end class DistanceTable
+''' _____________________________________________________________________________ end of file _____________________________________________________________________________ '''
@@ -0,0 +1,94 @@
+'''
+@description:   Defines a fixed-size circular buffer holding the gain a device observed (or could have observed) from a network over the most recent time slots; the
+                known gains (-1 denotes an unknown gain) are also kept in sorted order so that their median is available without sorting the whole window again; the time
+                slot each network was last heard is kept incrementally by TimeLastHeard (see time_last_heard.py), not here
+'''
+
+from bisect import bisect_left, insort
+
+''' _____________________________________________________________________ GainHistory class definition ____________________________________________________________________ '''
+class GainHistory(object):
+    ''' gain of a network over the past few time slots (oldest first), bounded to a given number of time slots '''
+
+    def __init__(self, capacity, gainList=None):
+        self.capacity = capacity                    # maximum number of time slots kept (MAX_TIME_UNHEARD_ACCEPTABLE)
+        self.gain = [-1] * capacity                 # circular buffer of gains; -1 if unknown
+        self.start = 0                              # position of the oldest gain in the buffer
+        self.length = 0                             # number of time slots in the history
+        self.sortedGain = []                        # known gains (>= 0) in the history, in ascending order
+        if gainList is None: gainList = []
+        for gain in gainList[-capacity:]: GainHistory.append(self, gain)
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def append(self, gain=-1):
+        '''
+        description: adds the gain of a new time slot; the oldest one is discarded if the history is full
+        args:        self, gain (-1 if unknown yet)
+        returns:     None
+        '''
+        if self.length == self.capacity:
+            oldestGain = self.gain[self.start]
+            if oldestGain >= 0: del self.sortedGain[bisect_left(self.sortedGain, oldestGain)]
+            self.start = (self.start + 1) % self.capacity
+            self.length -= 1
+        self.gain[(self.start + self.length) % self.capacity] = gain
+        self.length += 1
+        if gain >= 0: insort(self.sortedGain, gain)
+        # end append
+
+    ''' ################################################################################################################################################################### '''
+    def set(self, age, gain):
+        '''
+        description: updates the gain of a time slot in the history
+        args:        self, age of the time slot (0 for the most recent one), gain
+        returns:     None
+        '''
+        if age < 0 or age >= self.length: return
+        position = (self.start + self.length - 1 - age) % self.capacity
+        prevGain = self.gain[position]
+        if prevGain == gain: return
+        if prevGain >= 0: del self.sortedGain[bisect_left(self.sortedGain, prevGain)]
+        self.gain[position] = gain
+        if gain >= 0: insort(self.sortedGain, gain)
+        # end set
+
+    ''' ################################################################################################################################################################### '''
+    def get(self, age):
+        '''
+        description: returns the gain of a time slot in the history
+        args:        self, age of the time slot (0 for the most recent one)
+        returns:     gain; -1 if unknown
+        '''
+        return self.gain[(self.start + self.length - 1 - age) % self.capacity]
+        # end get
+
+    ''' ################################################################################################################################################################### '''
+    def median(self):
+        '''
+        description: computes the median of the known gains in the history (mean of the two middle values if their number is even)
+        args:        self
+        returns:     median gain; -1 if no gain is known
+        '''
+        numKnown = len(self.sortedGain)
+        if numKnown == 0: return -1
+        if numKnown % 2 == 1: return self.sortedGain[numKnown // 2]
+        return (self.sortedGain[numKnown // 2 - 1] + self.sortedGain[numKnown // 2]) / 2
+        # end median
+
+    ''' ################################################################################################################################################################### '''
+    def toList(self):
+        '''
+        description: builds a list of the gains in the history, e.g. for logging
+        args:        self
+        returns:     list of gains (oldest first)
+        '''
+        return [self.gain[(self.start + i) % self.capacity] for i in range(self.length)]
+        # end toList
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return str(GainHistory.toList(self))
+# end class GainHistory
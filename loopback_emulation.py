@@ -0,0 +1,252 @@
+'''
+@description:   Emulates the cooperative protocol on the local host: the collaborative EWA loop of each device runs as an asyncio task driven by a wall-clock slot timer,
+                and devices exchange their messages as real datagrams (over UDP multicast on the loopback interface or over Unix datagram sockets) instead of through the
+                in-memory MobileDevice.sharedObservation; per-slot processing latency, message loss and CPU time of each device are reported, to check that the per-slot
+                processing fits within the time slot duration
+@assumptions:   (1) all devices run in the same process, hence the set of devices that transmitted during a sub-time slot (used to count lost messages) is known exactly,
+                (2) a message fits in one datagram
+'''
+
+import asyncio
+import os
+import socket
+import struct
+import tempfile
+import time
+import global_setting
+from mobile_device import MobileDevice
+from utility_method import saveToCSV
+
+''' ______________________________________________________________________________ constants ______________________________________________________________________________ '''
+TIME_UNIT_PER_SUB_TIME_SLOT = 60                    # simulated time units a device spends in each iteration (sub-time slot) of its collaborative EWA loop
+MULTICAST_GROUP = "239.255.42.99"
+MULTICAST_PORT = 42099
+HEADER_FORMAT = "!iii"                              # sub-time slot, service area, ID of sender
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+''' _________________________________________________________________ WallClockEnvironment class definition ________________________________________________________________ '''
+class WallClockEnvironment(object):
+    ''' stands in for the simpy environment of a device; timeouts are returned to the emulator, which waits for the corresponding wall-clock time '''
+
+    def __init__(self):
+        self.now = 0                                # simulated time reached by the device
+        # end __init__
+
+    def timeout(self, delay):
+        return delay
+        # end timeout
+# end class WallClockEnvironment
+
+''' __________________________________________________________________ DatagramReceiver class definition __________________________________________________________________ '''
+class DatagramReceiver(asyncio.DatagramProtocol):
+    ''' stores every datagram received by a device in the inbox of the device, keyed by the sub-time slot in which it was sent '''
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        # end __init__
+
+    def datagram_received(self, data, address):
+        subTimeSlot, serviceArea, senderID = struct.unpack(HEADER_FORMAT, data[:HEADER_SIZE])
+        if senderID == self.endpoint.deviceID: return   # own datagram looped back
+        if subTimeSlot not in self.endpoint.inbox: self.endpoint.inbox.update({subTimeSlot: {}})
+        self.endpoint.inbox[subTimeSlot].update({senderID: (serviceArea, data[HEADER_SIZE:].decode())})
+        # end datagram_received
+# end class DatagramReceiver
+
+''' ___________________________________________________________________ DeviceEndpoint class definition ___________________________________________________________________ '''
+class DeviceEndpoint(object):
+    ''' socket of a device, with the datagrams it received and the statistics collected per time slot '''
+
+    def __init__(self, device):
+        self.deviceID = device.deviceID
+        self.environment = WallClockEnvironment()
+        self.socket = None
+        self.address = None                         # address to which peers send datagrams (Unix transport only)
+        self.transport = None
+        self.inbox = {}                             # datagrams received per sub-time slot, {subTimeSlot: {senderID: (serviceArea, message)}}
+        self.statistics = {}                        # {timeSlot: [processing time (s), CPU time (s), #message expected, #message received, lateness (s)]}
+        # end __init__
+
+    def getSubTimeSlot(self):
+        return self.environment.now // TIME_UNIT_PER_SUB_TIME_SLOT
+        # end getSubTimeSlot
+
+    def getTimeSlot(self):
+        return self.environment.now // (TIME_UNIT_PER_SUB_TIME_SLOT * global_setting.constants['num_sub_time_slot']) + 1
+        # end getTimeSlot
+
+    def getStatistics(self):
+        timeSlot = DeviceEndpoint.getTimeSlot(self)
+        if timeSlot not in self.statistics: self.statistics.update({timeSlot: [0, 0, 0, 0, 0]})
+        return self.statistics[timeSlot]
+        # end getStatistics
+# end class DeviceEndpoint
+
+''' ______________________________________________________________________ LoopbackChannel class definition _____________________________________________________________________ '''
+class LoopbackChannel(object):
+    ''' replaces the in-memory shared observation: MobileDevice.transmit sends a datagram and MobileDevice.listen reads the datagrams received in the current sub-time slot '''
+
+    def __init__(self, mobileDeviceList, transportType, wallClockTimeSlotDuration):
+        self.mobileDeviceList = mobileDeviceList
+        self.transportType = transportType          # "udp" (multicast on the loopback interface) or "unix" (Unix datagram sockets)
+        self.secondsPerTimeUnit = wallClockTimeSlotDuration / (TIME_UNIT_PER_SUB_TIME_SLOT * global_setting.constants['num_sub_time_slot'])
+        self.endpoint = {device.deviceID: DeviceEndpoint(device) for device in mobileDeviceList}
+        self.senderPerSubTimeSlot = {}              # devices that transmitted during each sub-time slot, {(subTimeSlot, serviceArea): set of deviceID}
+        self.prunedSubTimeSlot = -1                 # sub-time slot in which the senders of the sub-time slots no device is in any longer were last dropped
+        self.socketDir = None
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def openSocket(self, endpoint):
+        '''
+        description: creates and binds the socket through which a device sends and receives datagrams
+        args:        self, endpoint of the device
+        returns:     the socket
+        '''
+        if self.transportType == "udp":
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if hasattr(socket, "SO_REUSEPORT"): sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sock.bind(("", MULTICAST_PORT))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, socket.inet_aton(MULTICAST_GROUP) + socket.inet_aton("127.0.0.1"))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton("127.0.0.1"))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 0)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            endpoint.address = os.path.join(self.socketDir, "device" + str(endpoint.deviceID) + ".sock")
+            sock.bind(endpoint.address)
+        sock.setblocking(False)
+        return sock
+        # end openSocket
+
+    ''' ################################################################################################################################################################### '''
+    def send(self, device, message):
+        '''
+        description: broadcasts a message of a device, i.e. sends it to the multicast group, or to the socket of every other device in the service area of the device
+        args:        self, device transmitting, message (as a string of observations separated by ";")
+        returns:     None
+        '''
+        endpoint = self.endpoint[device.deviceID]
+        subTimeSlot = DeviceEndpoint.getSubTimeSlot(endpoint)
+        data = struct.pack(HEADER_FORMAT, subTimeSlot, device.serviceArea, device.deviceID) + message.encode()
+
+        key = (subTimeSlot, device.serviceArea)
+        if key not in self.senderPerSubTimeSlot: self.senderPerSubTimeSlot.update({key: set()})
+        self.senderPerSubTimeSlot[key].add(device.deviceID)
+
+        if self.transportType == "udp": endpoint.transport.sendto(data, (MULTICAST_GROUP, MULTICAST_PORT))
+        else:
+            for peer in self.mobileDeviceList:
+                if peer.deviceID != device.deviceID and peer.serviceArea == device.serviceArea: endpoint.transport.sendto(data, self.endpoint[peer.deviceID].address)
+        # end send
+
+    ''' ################################################################################################################################################################### '''
+    def receive(self, device):
+        '''
+        description: retrieves the messages received by a device during the current sub-time slot from devices in its service area (and within radio range if limited),
+                     and counts the messages it should have received
+        args:        self, device listening
+        returns:     observations received (as a string of observations separated by ";")
+        '''
+        endpoint = self.endpoint[device.deviceID]
+        subTimeSlot = DeviceEndpoint.getSubTimeSlot(endpoint)
+        expectedSender = set(self.senderPerSubTimeSlot.get((subTimeSlot, device.serviceArea), ())) - {device.deviceID}
+        if MobileDevice.neighborIndex is not None: expectedSender &= set(MobileDevice.neighborIndex.neighbors(device.deviceID))
+
+        feedbackReceived = []
+        for senderID, (serviceArea, message) in endpoint.inbox.get(subTimeSlot, {}).items():
+            if senderID in expectedSender: feedbackReceived.append(message)
+        for oldSubTimeSlot in [x for x in endpoint.inbox if x <= subTimeSlot]: del endpoint.inbox[oldSubTimeSlot]  # drop datagrams no longer relevant
+        if subTimeSlot > self.prunedSubTimeSlot:   # first check of a sub-time slot: drop the senders of the sub-time slots every device has left (never checked again)
+            self.prunedSubTimeSlot = subTimeSlot
+            oldestSubTimeSlot = min(DeviceEndpoint.getSubTimeSlot(otherEndpoint) for otherEndpoint in self.endpoint.values())
+            for key in [key for key in self.senderPerSubTimeSlot if key[0] < oldestSubTimeSlot]: del self.senderPerSubTimeSlot[key]
+
+        statistics = DeviceEndpoint.getStatistics(endpoint)
+        statistics[2] += len(expectedSender); statistics[3] += len(feedbackReceived)
+        return ';'.join(message for message in feedbackReceived if message != "")
+        # end receive
+
+    ''' ################################################################################################################################################################### '''
+    async def runDevice(self, device, startTime):
+        '''
+        description: runs the collaborative EWA loop of a device; each timeout requested by the device is waited for in wall-clock time, measured from the start time
+        args:        self, device, wall-clock start time of the emulation (loop time)
+        returns:     None
+        '''
+        loop = asyncio.get_running_loop()
+        endpoint = self.endpoint[device.deviceID]
+        process = device.collaborativeEWA(endpoint.environment)
+        while True:
+            wallStart = time.perf_counter(); cpuStart = time.thread_time()
+            try: delay = next(process)              # processing done by the device until its next timeout
+            except StopIteration: break
+            statistics = DeviceEndpoint.getStatistics(endpoint)
+            statistics[0] += time.perf_counter() - wallStart; statistics[1] += time.thread_time() - cpuStart
+
+            endpoint.environment.now += delay
+            deadline = startTime + endpoint.environment.now * self.secondsPerTimeUnit
+            if loop.time() > deadline: DeviceEndpoint.getStatistics(endpoint)[4] += loop.time() - deadline   # the device is late on the slot timer
+            await asyncio.sleep(max(0, deadline - loop.time()))
+        # end runDevice
+
+    ''' ################################################################################################################################################################### '''
+    async def run(self):
+        '''
+        description: opens the socket of each device, runs all devices concurrently and closes the sockets once all devices are done
+        args:        self
+        returns:     None
+        '''
+        loop = asyncio.get_running_loop()
+        with tempfile.TemporaryDirectory() as self.socketDir:
+            for endpoint in self.endpoint.values():
+                endpoint.socket = LoopbackChannel.openSocket(self, endpoint)
+                endpoint.transport, _ = await loop.create_datagram_endpoint(lambda endpoint=endpoint: DatagramReceiver(endpoint), sock=endpoint.socket)
+            startTime = loop.time()
+            try: await asyncio.gather(*(LoopbackChannel.runDevice(self, device, startTime) for device in self.mobileDeviceList))
+            finally:
+                for endpoint in self.endpoint.values(): endpoint.transport.close()
+        # end run
+
+    ''' ################################################################################################################################################################### '''
+    def saveReport(self, outputDir, wallClockTimeSlotDuration):
+        '''
+        description: saves the per-slot latency, CPU time and message loss of each device to a csv file and prints a summary
+        args:        self, output directory, wall-clock duration of a time slot (in seconds)
+        returns:     None
+        '''
+        header = ["Device ID", "Time slot", "Processing time (s)", "CPU time (s)", "#messages expected", "#messages received", "Message loss (%)", "Lateness (s)"]
+        data = []
+        for deviceID, endpoint in self.endpoint.items():
+            for timeSlot in sorted(endpoint.statistics):
+                processingTime, cpuTime, numExpected, numReceived, lateness = endpoint.statistics[timeSlot]
+                loss = (numExpected - numReceived) * 100 / numExpected if numExpected > 0 else 0
+                data.append([deviceID, timeSlot, processingTime, cpuTime, numExpected, numReceived, loss, lateness])
+        saveToCSV(outputDir + "emulation.csv", header, data)
+
+        totalExpected = sum(row[4] for row in data); totalReceived = sum(row[5] for row in data)
+        print("----- emulation over " + self.transportType + " sockets, time slot of " + str(wallClockTimeSlotDuration) + " s -----")
+        print("per-slot processing time: max " + str(max(row[2] for row in data)) + " s, average " + str(sum(row[2] for row in data) / len(data)) + " s")
+        print("time slots exceeding the time slot duration: " + str(sum(1 for row in data if row[2] > wallClockTimeSlotDuration)) + "/" + str(len(data)))
+        print("message loss: " + str((totalExpected - totalReceived) * 100 / totalExpected if totalExpected > 0 else 0) + "% (" + str(totalExpected - totalReceived)
+              + "/" + str(totalExpected) + ")")
+        for deviceID, endpoint in self.endpoint.items():
+            print("device " + str(deviceID) + ": CPU time " + str(sum(statistics[1] for statistics in endpoint.statistics.values())) + " s")
+        # end saveReport
+# end class LoopbackChannel
+
+''' ______________________________________________________________________ run the emulation of all devices ______________________________________________________________________ '''
+def runEmulation(mobileDeviceList, transportType, wallClockTimeSlotDuration, outputDir):
+    '''
+    description: runs the collaborative EWA loop of all devices over real sockets, with a wall-clock slot timer, and reports per-slot latency, message loss and CPU time
+    args:        list of mobile devices, transport ("udp" or "unix"), wall-clock duration of a time slot in seconds, output directory
+    returns:     None
+    '''
+    channel = LoopbackChannel(mobileDeviceList, transportType, wallClockTimeSlotDuration)
+    MobileDevice.channel = channel
+    try: asyncio.run(channel.run())
+    finally: MobileDevice.channel = None
+    channel.saveReport(outputDir, wallClockTimeSlotDuration)
+    # end runEmulation
+''' _____________________________________________________________________________ end of file _____________________________________________________________________________ '''
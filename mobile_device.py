@@ -13,9 +13,12 @@ from copy import deepcopy
 import csv                          # to save output to file
 from sys import argv, float_info    # to read command line argument; float_info to get the smallest float value
 from time import time, sleep
-from statistics import median
 from network import Network
-from utility_method import computeMovingAverage, getListIndex, percentageElemGreaterOrEqual, combineObservation, decrementTTL
+from neighbor_index import NeighborIndex
+from network_detail_history import NetworkDetailHistory
+from gain_history import GainHistory
+from time_last_heard import TimeLastHeard
+from utility_method import computeMovingAverage, percentageElemGreaterOrEqual, combineObservation, decrementTTL, encodeBitset
 import global_setting
 from multiprocessing import Lock
 from termcolor import colored
@@ -78,19 +81,35 @@ ORIGINAL_OUTPUT_DIR = OUTPUT_DIR = global_setting.constants['output_dir']
 SETTING = global_setting.constants['setting']
 SAVE_MINIMAL_DETAIL = global_setting.constants['save_minimal_detail']
 networkList = global_setting.constants['network_list']
+networkRegistry = global_setting.constants['network_registry']
+SCENARIO = global_setting.constants['scenario']
+RUN_WRITER = global_setting.constants['run_writer']                         # buffers the rows saved to the device and network csv files
+COLUMNAR_WRITER = global_setting.constants['columnar_writer']               # arrays the details are saved to instead of csv files; None if saved to csv files
+CAMPAIGN_CUBE = global_setting.constants['campaign_cube']                   # arrays of the whole campaign the run fills its slice of (see campaign_cube.py); None if not
+OUTPUT_TIER = global_setting.constants['output_tier']                       # "summary" (no detail per time slot), "core" (metrics per time slot) or "debug" (and traces)
+TRACE_EVERY = global_setting.constants['trace_every']                       # debug tier: the traces are saved every TRACE_EVERY time slots (from t = 1)...
+TRACE_DEVICE = global_setting.constants['trace_device']                     # ... for the devices in TRACE_DEVICE (None for all devices)
 MAX_TIME_UNHEARD_ACCEPTABLE = global_setting.constants['max_time_unheard_acceptable']
+RADIO_RANGE = global_setting.constants['radio_range']                       # BLE radio range in metres; 0 if the whole service area is one broadcast domain
+SERVICE_AREA_SIZE = global_setting.constants['service_area_size']           # length of the side of a service area in metres
+MAX_STEP_PER_TIME_SLOT = global_setting.constants['max_step_per_time_slot'] # maximum distance moved per time slot along each axis, in metres
 
 lock = Lock()
 ''' ____________________________________________________________________ MobileDevice class definition ____________________________________________________________________ '''
 class MobileDevice(object):
     numMobileDevice = 0                                     # keeps track of number of mobile devices to automatically assign an ID to device upon creation
     sharedObservation = {}                                  # observations about networks shared among devices; there may be more than one service area
+    transmittedObservation = {}                             # message broadcasted by each device during the current sub-time slot; used when the radio range is limited
+    neighborIndex = NeighborIndex(RADIO_RANGE) if RADIO_RANGE > 0 else None  # index of device positions to find the devices within radio range
+    channel = None                                          # when set (loopback emulation), messages are exchanged as datagrams instead of through sharedObservation
+    networkDetailByDevice = True                            # whether device 1 saves the network details; in a sharded run, the coordinating process does (see sharded_simulation.py)
     resetTimeSlotPerDevice = {}
 
     def __init__(self, networks):
         MobileDevice.numMobileDevice = MobileDevice.numMobileDevice + 1
         self.deviceID = MobileDevice.numMobileDevice              # ID of device
         self.availableNetwork = [networks[i].networkID for i in range(len(networks))]  # networkIDs of set of available networks
+        self.networkIndex = {networkID: i for i, networkID in enumerate(self.availableNetwork)}   # index of each available network in lists kept per network
         self.weight = [1.0] * len(self.availableNetwork)    # weight assigned to each network based on gains observed from it
         self.probability = [0] * len(self.availableNetwork) # probability distribution over available networks
         self.currentNetwork = -1                            # network to which the device is currently associated
@@ -101,12 +120,17 @@ class MobileDevice(object):
         self.exploration = 0                                # whether the algorithm has unexplored network(s)
 
         # for collaboration
-        self.networkDetailHistory = []                      # observation made/received for the past DELAY time slots; used for weight update
-        self.timeLastHeard = [-1] * len(self.availableNetwork)          # time slot each network was last heard
+        self.networkDetailHistory = NetworkDetailHistory(self.availableNetwork, DELAY, NUM_MOBILE_DEVICE)   # observation made/received for the past DELAY time slots; used for weight update
+        self.timeLastHeard = TimeLastHeard([-1] * len(self.availableNetwork))   # time slot each network was last heard (min-heap, indexed by network index)
         self.recentGainHistoryPerNetwork = {}               # gain that was (or could be) observed from each network over the past few time slots
         self.numDevicePerNetwork = [-1] * len(self.availableNetwork)    # last value I know of
         self.serviceArea = 1
-        self.numDevicePerServiceArea = {1:NUM_MOBILE_DEVICE}
+        self.settingTimeSlot = 0                            # time slot whose events (see updateSetting) were applied last
+        self.message = ""                                   # message to be shared during current time slot; includes feedback being forwarded
+        self.resetTimeSlot = []                             # time slots in which the weights were reset
+        self.handedOver = False                             # whether the device was handed over to another process (sharded run, see sharded_simulation.py)
+        self.position = None                                # (x, y) position in the service area, in metres; used only when the radio range is limited
+        self.positionServiceArea = -1                       # service area in which the position was drawn
 
         # attribute for log
         self.log = []                                         # something to log to csv file, e.g. whether it's NE, why a type of strategy is chosen, ...
@@ -114,31 +138,38 @@ class MobileDevice(object):
         # to log stabilization; for scalability test
         self.stabilizedNetwork = -1
         self.stabilizationTime = -1
+
+        # for the summary of the run, kept whatever the output tier
+        self.numNetworkSwitch = 0                           # number of times the network selected differs from the one selected in the previous time slot saved
+        self.totalDownload = 0                              # data downloaded over the run, in MB
+        self.lastNetworkSaved = -1                          # network selected in the previous time slot saved
         # end __init__
 
     ''' ################################################################################################################################################################### '''
-    def collaborativeEWA(self, env):
+    def collaborativeEWA(self, env, t=1):
         '''
         description: repeatedly performs a wireless network selection, following a collaborative version of Exponentially Weighted Average algorithm
-        args:        self, env
+        args:        self, env, time slot to start from (later than 1 when the device is handed over from another process in a sharded run)
         returns:     None
         '''
-        global NUM_TIME_SLOT, NUM_SUB_TIME_SLOT, DELAY, SETTING, ETA, GAMMA, TRANSMIT_PROBABILITY, LISTEN_PROBABILITY, MAX_TIME_UNHEARD_ACCEPTABLE
+        global NUM_TIME_SLOT, NUM_SUB_TIME_SLOT, DELAY, SETTING, ETA, GAMMA, TRANSMIT_PROBABILITY, LISTEN_PROBABILITY, MAX_TIME_UNHEARD_ACCEPTABLE, networkRegistry
 
         # initialization
-        subTimeSlot = t = 1                                 # current time slot and sub-time slot (keeps increasing across time slots)
-        message = ""                                        # message to be shared during current time slot; includes feedback being forwarded
+        subTimeSlot = (t - 1) * NUM_SUB_TIME_SLOT + 1       # current time slot and sub-time slot (keeps increasing across time slots)
         feedbackReceived = ""                               # feedback received during current time slot
         prevWeight = []                                     # a copy of the previous weight of all available networks - for logging purpose
-        resetTimeSlot = []
 
         while subTimeSlot <= NUM_TIME_SLOT * NUM_SUB_TIME_SLOT:
+            if self.handedOver: return                      # the device carries on in another process
             if MobileDevice.updateSetting(self, t):
                 MobileDevice.sharedObservation = {}            # reset the shared observation
+                MobileDevice.transmittedObservation = {}
                 yield env.timeout(10)
 
                 if subTimeSlot % NUM_SUB_TIME_SLOT == 1 or NUM_SUB_TIME_SLOT == 1:        # first sub-time slot of current time slot
                     if self.deviceID == 1: logging.debug("t = " + str(t));
+                    networkRegistry.advanceTimeSlot(t)          # capacity of each network in this time slot, if replayed from a trace
+                    if RADIO_RANGE > 0: MobileDevice.updatePosition(self)
                     feedbackReceived = ""                       # clear feedback; it stores feedback received during one time slot
                     self.log = []; actionList = []              # both are for logging
                     prevWeight = deepcopy(self.weight)          # make a copy of the weights since it will be required to save in cvs file later in the current iteration
@@ -147,11 +178,7 @@ class MobileDevice(object):
                     self.probability = list((1 - GAMMA) * (weight / sum(self.weight)) + (GAMMA / len(self.availableNetwork)) for weight in self.weight)
                     if 0 in self.probability: print("device", self.deviceID, ", zero prob detected! weight:", self.weight, ", prob:", self.probability)
 
-                    # to log stabilization - for scalability test
-                    if max(self.probability) >= CONVERGED_PROBABILITY and t <= NUM_TIME_SLOT - 10:
-                        networkWithHighestProb = self.availableNetwork[self.probability.index(max(self.probability))]
-                        if self.stabilizedNetwork != networkWithHighestProb: self.stabilizedNetwork = networkWithHighestProb; self.stabilizationTime = t
-                    elif max(self.probability) < CONVERGED_PROBABILITY and self.stabilizedNetwork != -1: self.stabilizedNetwork = -1; self.stabilizationTime = -1
+                    MobileDevice.updateStabilization(self, t)   # to log stabilization - for scalability test
 
                     # select a network
                     prevNetworkSelected = self.currentNetwork
@@ -184,15 +211,15 @@ class MobileDevice(object):
                 # build message for transmission; combination of my current observation and all observations made and feedback received
                 # message format: [timeslot, deviceID, networkselected, bitrate, numAssociatedDevice, availableNetwork,  probabilityDistribution, ttl]
                 myObservation = str(t) + "," + str(self.deviceID) + "," + str(self.currentNetwork) + "," + str(self.gain) + "," \
-                                + str(networkList[getListIndex(networkList, self.currentNetwork)].getNumAssociatedDevice()) + "," \
+                                + str(networkRegistry.getNumAssociatedDevice(self.currentNetwork)) + "," \
                                 + '_'.join(str(network) for network in self.availableNetwork) + "," \
                                 + '_'.join(str(prob) for prob in currentProbability) + "," + str(DELAY + 1)
                 # combine my observation with all previous valid observation and feedback received; 'message' will be broadcasted
-                message = combineObservation(message, myObservation)
+                self.message = combineObservation(self.message, myObservation)
 
                 # broadcast feedback and received messages being transmitted
                 if transmit == True:
-                    MobileDevice.transmit(self, message); actionList.append("TRANSMIT");
+                    MobileDevice.transmit(self, self.message); actionList.append("TRANSMIT");
                     yield env.timeout(10)                           # transmit
                 else: yield env.timeout(10)
 
@@ -203,7 +230,7 @@ class MobileDevice(object):
 
                 if self.deviceID == 1:
                     # logging.debug("global msg:" + MobileDevice.sharedObservation)
-                    if self.deviceID == 1: logging.debug("feedback received:" + str(feedbackReceived) + "; message:" + str(message) + "; bit rate:" + str(self.gain))
+                    if self.deviceID == 1: logging.debug("feedback received:" + str(feedbackReceived) + "; message:" + str(self.message) + "; bit rate:" + str(self.gain))
                 if subTimeSlot % NUM_SUB_TIME_SLOT == 0 or NUM_SUB_TIME_SLOT == 1:         # last sub-time slot of current time slot
                     self.log.append(actionList)
                     newObservation = combineObservation(feedbackReceived, myObservation)
@@ -221,31 +248,46 @@ class MobileDevice(object):
                     # update weight; reset the weight of a network that might be better to 1; and rescale the weights to [0, 1]
                     # reset, networkToReset = MobileDevice.mustReset_collaborativeEWA(self, explore, t) # networkToReset is the index of the network whose weight must be reset
                     # if reset == True:
-                    #     MobileDevice.reset_CollaborativeEWA(self, networkToReset); resetTimeSlot.append(t)
+                    #     MobileDevice.reset_CollaborativeEWA(self, networkToReset); self.resetTimeSlot.append(t)
                     #     logging.debug("device " + str(self.deviceID) + ", resets its weight (b4 update) " + str(self.weight))
                     self.weight = list(w * exp(-1 * ETA * loss) for w, loss in zip(self.weight, estimatedLoss))
                     maxWeight = max(self.weight); self.weight = [(w / maxWeight) if w / max(self.weight) > 0 else (float_info.min * float_info.epsilon) for w in self.weight]
                     if self.deviceID == 1: logging.debug("weight:" + str(self.weight))
 
-                    message = combineObservation(message, feedbackReceived) # combine the new feedback received to my message to be forwarded in the next time slot
-                    message = decrementTTL(message)  # decrement the ttl value of each observation before forwarding them
+                    self.message = combineObservation(self.message, feedbackReceived) # combine the new feedback received to my message to be forwarded in the next time slot
+                    self.message = decrementTTL(self.message)  # decrement the ttl value of each observation before forwarding them
                     MobileDevice.saveDeviceDetail(self, t, prevWeight, GAMMA, estimatedLoss)  # save device details to csv file
-                    if self.deviceID == 1: MobileDevice.saveNetworkDetail(self, t)  # save network details to csv file
+                    if self.deviceID == 1 and MobileDevice.networkDetailByDevice: MobileDevice.saveNetworkDetail(self, t)  # save network details to csv file
                     t += 1
                 else: yield env.timeout(10)
                 yield env.timeout(10)
                 subTimeSlot += 1
                 if LOG_LEVEL == 10 and self.deviceID == 1: input()  # if DEBUG level
             else:
+                if RADIO_RANGE > 0: MobileDevice.neighborIndex.remove(self.deviceID)   # device not in any service area
                 subTimeSlot += 1;
                 if subTimeSlot % NUM_SUB_TIME_SLOT == 0 or NUM_SUB_TIME_SLOT == 1: t += 1
                 yield env.timeout(60)
             # print("device ", self.deviceID, "done t = ", t)
         logging.info("device" + str(self.deviceID) + " done")
-        # logging.info("device " + str(self.deviceID)  + ", reset time slots: " + str(resetTimeSlot))
-        MobileDevice.resetTimeSlotPerDevice.update({self.deviceID:resetTimeSlot})
+        # logging.info("device " + str(self.deviceID)  + ", reset time slots: " + str(self.resetTimeSlot))
+        MobileDevice.resetTimeSlotPerDevice.update({self.deviceID:self.resetTimeSlot})
         # end collaborativeEWA
 
+    ''' ################################################################################################################################################################### '''
+    def updateStabilization(self, t):
+        '''
+        description: records the network the device stabilized to (favored with a probability of at least CONVERGED_PROBABILITY) and the time slot since when, for
+                     the summary of the run; called by every algorithm once the probability of the time slot is updated
+        args:        self, time slot
+        return:      None
+        '''
+        if max(self.probability) >= CONVERGED_PROBABILITY and t <= NUM_TIME_SLOT - 10:
+            networkWithHighestProb = self.availableNetwork[self.probability.index(max(self.probability))]
+            if self.stabilizedNetwork != networkWithHighestProb: self.stabilizedNetwork = networkWithHighestProb; self.stabilizationTime = t
+        elif max(self.probability) < CONVERGED_PROBABILITY and self.stabilizedNetwork != -1: self.stabilizedNetwork = -1; self.stabilizationTime = -1
+        # end updateStabilization
+
     ''' ################################################################################################################################################################### '''
     def reset_CollaborativeEWA(self, networkToReset):
         '''
@@ -254,15 +296,7 @@ class MobileDevice(object):
         return:      None
         '''
         for networkIndex in networkToReset: self.weight[networkIndex] = 1
-        for j in range(len(self.networkDetailHistory)):
-            newElement = {}
-            for networkID in self.availableNetwork:
-                newElement.update({networkID: {}})
-                newElement[networkID].update({'aggregate_bit_rate': 0})
-                newElement[networkID].update({'associated_device_list': set()})
-                newElement[networkID].update({'probability_list': []})
-                newElement[networkID].update({'num_associated_device': 0})
-            self.networkDetailHistory[j] = newElement
+        self.networkDetailHistory.clear()
         # end reset_CollaborativeEWA
 
     ''' ################################################################################################################################################################### '''
@@ -330,16 +364,15 @@ class MobileDevice(object):
 
         explore = False; unheardOfNetworkList = []; unheardOfNetworkProbability = []; exploreProbability = 0
 
-        if (min(self.timeLastHeard) == -1 and t > MAX_TIME_UNHEARD_ACCEPTABLE) or (min(self.timeLastHeard) != -1 and (t - min(self.timeLastHeard)) > MAX_TIME_UNHEARD_ACCEPTABLE):
-            # build a list of network(s) unheard of for more than MAX_TIME_UNHEARD_ACCEPTABLE time slots
-            for networkID in self.availableNetwork:
-                # if t - self.timeLastHeard[getListIndex(networkList, networkID)] > MAX_TIME_UNHEARD_ACCEPTABLE: unheardOfNetworkList.append(networkID)
-                if t - self.timeLastHeard[self.availableNetwork.index(networkID)] > MAX_TIME_UNHEARD_ACCEPTABLE: unheardOfNetworkList.append(networkID)
+        minTimeLastHeard = self.timeLastHeard.min()
+        if (minTimeLastHeard == -1 and t > MAX_TIME_UNHEARD_ACCEPTABLE) or (minTimeLastHeard != -1 and (t - minTimeLastHeard) > MAX_TIME_UNHEARD_ACCEPTABLE):
+            # build a list of network(s) unheard of for more than MAX_TIME_UNHEARD_ACCEPTABLE time slots (in the order of the available networks)
+            unheardOfNetworkList = [self.availableNetwork[networkIndex] for networkIndex in self.timeLastHeard.getUnheard(t - MAX_TIME_UNHEARD_ACCEPTABLE)]
             # any one of the unheard of network will be selected with equal probability
             unheardOfNetworkProbability = [1 / len(unheardOfNetworkList)] * len(unheardOfNetworkList)
             possibleAction = [False, True]  # transmit or not
             # exploreProbability = len(unheardOfNetworkList)/NUM_MOBILE_DEVICE
-            exploreProbability = len(unheardOfNetworkList)/self.numDevicePerServiceArea[self.serviceArea]
+            exploreProbability = len(unheardOfNetworkList)/SCENARIO.getNumDevice(self.serviceArea)
             actionSelectionProbability = [1 - exploreProbability, exploreProbability]
             # exploreProbability = actionSelectionProbability[-1] * (1/len(unheardOfNetworkList))
             explore = np.random.choice(possibleAction, p=actionSelectionProbability)
@@ -368,10 +401,10 @@ class MobileDevice(object):
         if self.probability[preferredNetworkIndex] >= CONVERGED_PROBABILITY:
             # reset as the device observes higher gain from a network being explored while it has converged to another one
             if explore == True:
-                gainList = self.recentGainHistoryPerNetwork[preferredNetworkID]; gainList = [x for x in gainList if x >= 0]
-                if self.deviceID == 1: logging.debug("current gain: " + str(self.gain) + ", recentGainHistory:" + str(self.recentGainHistoryPerNetwork[preferredNetworkID])
-                                                     + ", excl unknown: " + str(gainList) + ", median:" + str(median(gainList)))
-                if self.gain > median(gainList):
+                recentGainHistory = self.recentGainHistoryPerNetwork[preferredNetworkID]
+                if self.deviceID == 1: logging.debug("current gain: " + str(self.gain) + ", recentGainHistory:" + str(recentGainHistory)
+                                                     + ", excl unknown: " + str(recentGainHistory.sortedGain) + ", median:" + str(recentGainHistory.median()))
+                if self.gain > recentGainHistory.median():
                     # coinFlip = np.random.choice([True, False], p=[0.5, 0.5])
                     # if coinFlip == True:
                     print(colored("@t = " + str(currentTimeSlot) + ", device " + str(self.deviceID) + " resets when exploring unheard network " + str(self.currentNetwork), "magenta"));
@@ -383,11 +416,7 @@ class MobileDevice(object):
             # I reset with prob 1/(#device in my network) - all need not reset; also if all reset, it may cause major disruption to the setting?
             elif len(self.recentGainHistoryPerNetwork[1]) == MAX_TIME_UNHEARD_ACCEPTABLE and currentTimeSlot % (MAX_TIME_UNHEARD_ACCEPTABLE//2) == 0:
                 # find median gain of all networks
-                medianGainPerNetwork = []
-                for networkID in self.availableNetwork:
-                    gainList = self.recentGainHistoryPerNetwork[networkID]; gainList = [x for x in gainList if x >= 0];
-                    if gainList != []: medianGainPerNetwork.append(median(gainList))
-                    else: medianGainPerNetwork.append(-1)
+                medianGainPerNetwork = [self.recentGainHistoryPerNetwork[networkID].median() for networkID in self.availableNetwork]   # -1 if no gain is known
                 maxMedianGain = max(medianGainPerNetwork)
                 if medianGainPerNetwork[preferredNetworkIndex] != maxMedianGain \
                         and ((maxMedianGain - medianGainPerNetwork[preferredNetworkIndex])*100/medianGainPerNetwork[preferredNetworkIndex]) > 0:
@@ -411,110 +440,66 @@ class MobileDevice(object):
         return False, []
 
     ''' ################################################################################################################################################################### '''
-    def updateRecentHistory(self, currentTimeSlot, networkID, gain, count):
+    def updateRecentHistory(self, currentTimeSlot, networkID, gain, timeSlot):
         '''
         description: updates the list of recent gain observed and number of devices per network (stored to known when to explore/reset)
-        args:        self, current time slot, ID of a network whose details is being updated, gain I (could) observe from the network at the specific time slot, average
-                     bit rate observed by devices associated to the network in that time slot, number of devices associated to that device during that time slot, count -
-                     i.e. whether it's the first element of self.networkDetailHistory - it's used to identify the index at which the data is to be stored in the list
-                     being updated
+        args:        self, current time slot, ID of a network whose details is being updated, gain I (could) observe from the network at the specific time slot, time slot
+                     to which the gain relates - it's used to identify the index at which the data is to be stored in the list being updated (an entry is appended
+                     for the current time slot)
         return:      None
         '''
-        global DELAY
-
-        if networkID not in self.recentGainHistoryPerNetwork: self.recentGainHistoryPerNetwork.update({networkID: [gain]})
+        if networkID not in self.recentGainHistoryPerNetwork: self.recentGainHistoryPerNetwork.update({networkID: GainHistory(MAX_TIME_UNHEARD_ACCEPTABLE, [gain])})
         else:
-            if count == 1: self.recentGainHistoryPerNetwork[networkID].append(-1);
-            index = count - 1 if currentTimeSlot <= DELAY + 1 else len(self.recentGainHistoryPerNetwork[networkID]) - len(self.networkDetailHistory) + count - 1
-            self.recentGainHistoryPerNetwork[networkID][index] = gain
-            if len(self.recentGainHistoryPerNetwork[networkID]) > MAX_TIME_UNHEARD_ACCEPTABLE:
-                self.recentGainHistoryPerNetwork[networkID] = self.recentGainHistoryPerNetwork[networkID][1:]
+            if timeSlot == currentTimeSlot: self.recentGainHistoryPerNetwork[networkID].append()
+            self.recentGainHistoryPerNetwork[networkID].set(currentTimeSlot - timeSlot, gain)
         # end updateRecentHistory
 
     ''' ################################################################################################################################################################### '''
     def estimateLoss(self, currentTimeSlot):
         '''
-        decsription: estimates the loss of each network based on that has been learnt about them; also build a list of recent gain (could be) observed from each network
+        decsription: estimates the loss of each network based on that has been learnt about them; also build a list of recent gain (could be) observed from each network.
+                     Only the time slots about which something was learnt since the previous time slot are evaluated again; their contributions to the estimated loss
+                     are kept as running sums in self.networkDetailHistory
         args:        self, current time slot
         returns:     estimated loss of each network
         '''
-        global DELAY, MAX_TIME_UNHEARD_ACCEPTABLE
-
-        gainHistory = []; lossHistory = []; probabilityHistory = []; estimatedLoss = []; D = [];
-
-        # compute the gain of each network and probability of hearing about each of them over the past DELAY time slots, based on one's own knowledge and feedback received
-        gainListOverDelay = []
-        count = 1
-        for networkDetail in self.networkDetailHistory: # networkDetail refers to details of all networks in one particular time slot
-            gainList = []
-            gainHistory.append({}); lossHistory.append({}); probabilityHistory.append({}); D.append({})
-            for networkID in self.availableNetwork:
-                singleNetworkDetail = networkDetail[networkID]
-                if singleNetworkDetail['associated_device_list'] == set(): gain = -1
-                elif self.deviceID in singleNetworkDetail['associated_device_list']: gain = singleNetworkDetail['aggregate_bit_rate']
-                else:
-                    avgPerUserBitRate = singleNetworkDetail['aggregate_bit_rate']/len(singleNetworkDetail['associated_device_list'])
-                    gain = (avgPerUserBitRate * singleNetworkDetail['num_associated_device'])/(singleNetworkDetail['num_associated_device'] + 1)
-                gainList.append(gain)
-
-                MobileDevice.updateRecentHistory(self, currentTimeSlot, networkID, gain, count)
-
-                # compute probability
-                if len(singleNetworkDetail['probability_list']) == 1: prob = singleNetworkDetail['probability_list'][0]
-                else: prob = 1 - np.prod([(1 - x) for x in singleNetworkDetail['probability_list']])
-                probabilityHistory[-1].update({networkID:prob})
-            if self.maxGain < max(gainList): self.maxGain = max(gainList)
-            count += 1
-            gainListOverDelay.append(gainList)
-
-        # compute the scaled gain, loss of each network and build list D
-        countKnownGain = [0] * len(self.availableNetwork)
-        for i in range(len(gainListOverDelay)):
-            gainList = gainListOverDelay[i]
-            for networkIndex in range(len(self.availableNetwork)):
-                if gainList[networkIndex] > 0: gainList[networkIndex] /= self.maxGain
-                gainHistory[i].update({self.availableNetwork[networkIndex]: gainList[networkIndex]})
-            # compute loss of each network
-            for networkIndex in range(len(self.availableNetwork)):
-                if gainList[networkIndex] == -1: loss = 0
-                else: loss = max(gainList) - gainList[networkIndex]
-                lossHistory[i].update({self.availableNetwork[networkIndex]: loss})
-            # when gain/loss is present or can be used, indicate it with a one in list D
+        # re-evaluate the gain of each network and probability of hearing about each of them in the time slots that changed (most recent first)
+        for timeSlot, gain in self.networkDetailHistory.updateLossEstimate(self.deviceID):
             for networkIndex in range(len(self.availableNetwork)):
-                if gainList[networkIndex] == -1 or gainList.count(-1) == len(self.availableNetwork) - 1: D[i].update({self.availableNetwork[networkIndex]: 0})
-                else: D[i].update({self.availableNetwork[networkIndex]: 1}); countKnownGain[networkIndex] += 1
-
-        # value = [0] * len(self.availableNetwork)
-        for i in range(len(D)):
-            for networkID in self.availableNetwork:
-                # method 1: D[i] = 0 if gain/loss is unknown
-                # if D[i][networkID] != 0: D[i].update({networkID:1/countKnownGain[networkID - 1]})
-                # method 2: D[i] = 1/len(D)
-                if D[i][networkID] != 0: D[i].update({networkID:1/len(D)})
-                # method 3: D[i] = (i + 1)/sum[1..len(D)]; build from method 1
-                # if D[i][networkID] != 0: value[getListIndex(networkList, networkID)] += 1; D[i].update({networkID: value[getListIndex(networkList, networkID)] / sum(range(1,countKnownGain[networkID - 1] + 1))})
-                # method 4: D[i] = (i + 1)/sum[1..len(D)]; build from method 2
-                # if D[i][networkID] != 0: D[i].update({networkID: (i + 1) / sum(range(1,len(D)+1))})
-        self.log.append(str(D))
-        self.log.append(str(gainHistory)); self.log.append(str(lossHistory)); self.log.append(str(probabilityHistory));
-        # if self.deviceID == 1: logging.debug("gainHistory:" + str(gainHistory) + "; lossHistory:" + str(lossHistory) + ", probabilityHistory: " + str(probabilityHistory))
+                MobileDevice.updateRecentHistory(self, currentTimeSlot, self.availableNetwork[networkIndex], float(gain[networkIndex]), timeSlot)
+            if self.maxGain < gain.max(): self.maxGain = float(gain.max())
+
+        if MobileDevice.isTraced(self, currentTimeSlot): MobileDevice.logLossEstimate(self)
 
         # estimate the loss of each network
-        for i in range(len(self.availableNetwork)): # for each network
-            loss = 0
-            networkID = self.availableNetwork[i]
-            for j in range(len(lossHistory)):
-                # if self.deviceID == 1: logging.debug("lossHistory[j][networkID]:" + str(lossHistory[j][networkID]))
-                if D[j][networkID] > 0:
-                    if probabilityHistory[j][networkID] == 0: print(colored("ERROR!!!!! Zero probability!" + ", networkID " + str(networkID) + ", net details " + str(self.networkDetailHistory), "red")); input()
-                    loss += D[j][networkID] * lossHistory[j][networkID] / probabilityHistory[j][networkID]
-            estimatedLoss.append(loss)
-        self.log.append(str(estimatedLoss)); self.log.append(str(self.maxGain))
+        if np.any(self.networkDetailHistory.getLossKnown() & (self.networkDetailHistory.getHearingProbability() == 0)):
+            print(colored("ERROR!!!!! Zero probability!" + ", net details " + str(self.networkDetailHistory), "red")); input()
+        estimatedLoss = self.networkDetailHistory.getEstimatedLoss(self.maxGain).tolist()
+        if MobileDevice.isTraced(self, currentTimeSlot): self.log.append(str(estimatedLoss)); self.log.append(str(self.maxGain))
         # if self.deviceID == 1: logging.debug("estimatedLoss:" + str(estimatedLoss))
 
         return estimatedLoss
         # end estimateLoss
 
+    ''' ################################################################################################################################################################### '''
+    def logLossEstimate(self):
+        '''
+        description: logs, for each time slot in the history, list D (weight of each network's loss), the scaled gain and loss of each network, and the probability of
+                     hearing about each network
+        args:        self
+        returns:     None
+        '''
+        gain = self.networkDetailHistory.getGain(); known = self.networkDetailHistory.getLossKnown()
+        gain = np.where(gain > 0, gain / self.maxGain, gain)
+        loss = np.where(gain == -1, 0, gain.max(axis=1, keepdims=True) - gain)
+        # method 2: D[i] = 1/len(D)
+        D = np.where(known, 1 / len(gain), 0)
+
+        self.log.append(str([dict(zip(self.availableNetwork, row)) for row in D.tolist()]))
+        self.log.append(str([dict(zip(self.availableNetwork, row)) for row in gain.tolist()])); self.log.append(str([dict(zip(self.availableNetwork, row)) for row in loss.tolist()]))
+        self.log.append(str([dict(zip(self.availableNetwork, row)) for row in self.networkDetailHistory.getHearingProbability().tolist()]))
+        # end logLossEstimate
+
     ''' ################################################################################################################################################################### '''
     def mustCollaborate(self, transmitProb, listenProb):
         '''
@@ -539,7 +524,12 @@ class MobileDevice(object):
 
         # OLD message format: timeslot, deviceID, networkselected, bitrate, probabilitydistribution, ttl
         # message format: [timeslot, deviceID, networkselected, bitrate, numAssociatedDevice, probabilityDistribution, ttl]
+        if MobileDevice.channel is not None: MobileDevice.channel.send(self, message); return
+
         with lock:
+            if RADIO_RANGE > 0:     # only the devices within radio range will hear the message; keep it apart from messages of other devices
+                MobileDevice.transmittedObservation.update({self.deviceID: message})
+                return
             if self.serviceArea not in MobileDevice.sharedObservation: MobileDevice.sharedObservation.update({self.serviceArea: ""})
             MobileDevice.sharedObservation.update({self.serviceArea:combineObservation(MobileDevice.sharedObservation[self.serviceArea], message)})
             # MobileDevice.sharedObservation = combineObservation(MobileDevice.sharedObservation, message)
@@ -552,12 +542,37 @@ class MobileDevice(object):
         args:        self
         returns:     observations shared during the current sub-time slot (as a string seperated by ";")
         '''
+        if MobileDevice.channel is not None: return MobileDevice.channel.receive(self)
+
+        if RADIO_RANGE > 0:         # hear only the devices within radio range that transmitted
+            feedbackReceived = ""
+            for deviceID in MobileDevice.neighborIndex.neighbors(self.deviceID):
+                if deviceID in MobileDevice.transmittedObservation:
+                    feedbackReceived = combineObservation(feedbackReceived, MobileDevice.transmittedObservation[deviceID])
+            return feedbackReceived
 
         if self.serviceArea in MobileDevice.sharedObservation:
             return MobileDevice.sharedObservation[self.serviceArea]
         else: return ""
         # end listen
 
+    ''' ################################################################################################################################################################### '''
+    def updatePosition(self):
+        '''
+        description: moves the device within its service area (random walk of at most MAX_STEP_PER_TIME_SLOT metres along each axis) and updates the neighbor index; a new
+                     position is drawn at random when the device is in a service area for the first time
+        args:        self
+        returns:     None
+        '''
+        global SERVICE_AREA_SIZE, MAX_STEP_PER_TIME_SLOT
+
+        if self.position is None or self.positionServiceArea != self.serviceArea:
+            self.position = (uniform(0, SERVICE_AREA_SIZE), uniform(0, SERVICE_AREA_SIZE)); self.positionServiceArea = self.serviceArea
+        elif MAX_STEP_PER_TIME_SLOT > 0:
+            self.position = tuple(min(max(coordinate + uniform(-MAX_STEP_PER_TIME_SLOT, MAX_STEP_PER_TIME_SLOT), 0), SERVICE_AREA_SIZE) for coordinate in self.position)
+        MobileDevice.neighborIndex.update(self.deviceID, self.serviceArea, self.position)
+        # end updatePosition
+
     ''' ################################################################################################################################################################### '''
     def updateNetworkDetailHistory(self, currentTimeSlot, observationStr):
         '''
@@ -568,23 +583,9 @@ class MobileDevice(object):
         # message format: timeslot, deviceID, networkselected, bitrate, probabilitydistribution, ttl, numAssociatedDevices
         global DELAY
 
-        # discard stale data (back in time)
-        if DELAY == 0: self.networkDetailHistory = []
-        elif len(self.networkDetailHistory) == (DELAY + 1): self.networkDetailHistory = self.networkDetailHistory[1:]   # discard stale history
-
-        # if self.deviceID == 1: logging.debug("networkDetailHistory after discarding stale information..." + str(self.networkDetailHistory))
+        # create an entry for the current time slot; the entry of the oldest time slot is discarded once the history is full
+        self.networkDetailHistory.append(currentTimeSlot)
 
-        # create an entry for the current time slot
-        self.networkDetailHistory.append({})
-
-        for networkID in self.availableNetwork:
-            self.networkDetailHistory[-1].update({networkID: {}})
-            self.networkDetailHistory[-1][networkID].update({'aggregate_bit_rate': 0})
-            self.networkDetailHistory[-1][networkID].update({'associated_device_list': set()})
-            self.networkDetailHistory[-1][networkID].update({'probability_list': []})
-            self.networkDetailHistory[-1][networkID].update({'num_associated_device': 0})
-        # print("@t=", currentTimeSlot, ", appending ne welement for device:", self.deviceID)
-        # if self.deviceID == 1: print("observationStr:", observationStr)
         # update details based on observation made or feedback received (depending on which of the 2 is passed as argument to the function) during the current time slot
         if observationStr != "":
             observationList = observationStr.split(";")
@@ -595,39 +596,20 @@ class MobileDevice(object):
                 probabilityDistribution = observation[6]; numAssociatedDevice = int(observation[4]); timeSlot = int(observation[0])
 
                 if networkSelected in self.availableNetwork:    # if someone from another area comes and is forwarding details about its previous networks...
-                    if self.timeLastHeard[self.availableNetwork.index(networkSelected)] < timeSlot:
-                        self.timeLastHeard[self.availableNetwork.index(networkSelected)] = timeSlot
-                        self.numDevicePerNetwork[self.availableNetwork.index(networkSelected)] = numAssociatedDevice
-
-                    if currentTimeSlot <= DELAY: networkDetailHistoryIndex = len(self.networkDetailHistory) - 1 - (currentTimeSlot - timeSlot)
-                    else: networkDetailHistoryIndex = DELAY - (currentTimeSlot - timeSlot)
-                    try:
-                        deviceAssociated = self.networkDetailHistory[networkDetailHistoryIndex][networkSelected]['associated_device_list']
-                    except:
-                        print("ERROR! device:", self.deviceID, ", accessing index ", networkDetailHistoryIndex, ", in ", self.networkDetailHistory); input()
-                    if deviceID not in deviceAssociated:    # I don't already have this device's observation for that network
-                        tmpDeviceAssociated = list(deviceAssociated)
-                        if deviceID == self.deviceID:
-                            self.networkDetailHistory[networkDetailHistoryIndex][networkSelected].update({'aggregate_bit_rate': bitRate})
-                        elif self.deviceID not in deviceAssociated:
-                            # if I selected the network, I know for sure the quality of the network and do not have to estimate based on what others are saying
-                            aggregateBitRate = self.networkDetailHistory[networkDetailHistoryIndex][networkSelected]['aggregate_bit_rate']
-                            aggregateBitRate += bitRate
-                            self.networkDetailHistory[networkDetailHistoryIndex][networkSelected].update({'aggregate_bit_rate': aggregateBitRate})
-                        deviceAssociated.add(deviceID)
-                        self.networkDetailHistory[networkDetailHistoryIndex][networkSelected].update({'associated_device_list': deviceAssociated})
+                    networkIndex = self.networkIndex[networkSelected]
+                    if self.timeLastHeard[networkIndex] < timeSlot:
+                        self.timeLastHeard.update(networkIndex, timeSlot)
+                        self.numDevicePerNetwork[networkIndex] = numAssociatedDevice
+
+                    row = self.networkDetailHistory.getRow(timeSlot)
+                    if row == -1: print("ERROR! device:", self.deviceID, ", time slot ", timeSlot, " not in ", self.networkDetailHistory); continue
+                    # record the observation, unless I already have this device's observation for that network
+                    if self.networkDetailHistory.addObservation(row, networkSelected, deviceID, bitRate, numAssociatedDevice, self.deviceID):
                         probabilityDistribution = probabilityDistribution.split("_"); probabilityDistribution = [float(prob) for prob in probabilityDistribution]
                         networkList = networkList.split("_"); networkList = [int(net) for net in networkList]
                         for networkID in self.availableNetwork:
-                            try:
-                                if networkID in networkList:
-                                    self.networkDetailHistory[networkDetailHistoryIndex][networkID]['probability_list'].append(probabilityDistribution[networkList.index(networkID)])
-                            except:
-                                print("exception caught: device:", self.deviceID, ", networkDetailHistory:", self.networkDetailHistory, ", networkDetailHistoryIndex:",
-                                      networkDetailHistoryIndex, ", networkID:", networkID, ", probabilityDistribution: ", probabilityDistribution,
-                                        ", self.availableNetwork.index(networkID):", self.availableNetwork.index(networkID))
-                                input()
-                        self.networkDetailHistory[networkDetailHistoryIndex][networkSelected].update({'num_associated_device': numAssociatedDevice})
+                            if networkID in networkList:
+                                self.networkDetailHistory.addProbability(row, networkID, probabilityDistribution[networkList.index(networkID)])
         # end updateNetworkDetailHistory
 
     ''' ################################################################################################################################################################### '''
@@ -639,7 +621,7 @@ class MobileDevice(object):
         args:        self, env
         return:      None
         '''
-        global NUM_TIME_SLOT, SETTING, ETA, networkList
+        global NUM_TIME_SLOT, SETTING, ETA, networkRegistry
 
         # initialization
         variant = "exponential"                                     # standard "exponential" or "linear" variant of the algorithm
@@ -651,11 +633,13 @@ class MobileDevice(object):
                 yield env.timeout(10)
 
                 # initialization of variables
+                networkRegistry.advanceTimeSlot(t)                  # capacity of each network in this time slot, if replayed from a trace
                 self.log = []                                       # solely for the purpose of saving the data in the csv file
                 prevWeight = deepcopy(self.weight)                  # make a copy of the weights since it will be required to save in cvs file later in the current iteration
 
                 # update probability distribution and select a wireless network
                 totalWeight = sum(self.weight); self.probability = list((weight / totalWeight) for weight in self.weight)          # update probability
+                MobileDevice.updateStabilization(self, t)   # to log stabilization - for scalability test
                 prevNetworkSelected = self.currentNetwork
                 self.currentNetwork = np.random.choice(self.availableNetwork, p=self.probability)       # select a wireless network
 
@@ -675,9 +659,8 @@ class MobileDevice(object):
                 scaledGainPerNetwork = [0] * len(self.availableNetwork)
                 scaledGainPerNetwork[self.availableNetwork.index(self.currentNetwork)] = scaledGain
                 for i in range(len(self.availableNetwork)):
-                    networkIndex = getListIndex(networkList, self.availableNetwork[i])
-                    if (self.currentNetwork != networkList[networkIndex].networkID):                               # already set for current network
-                        scaledGainPerNetwork[i] = (networkList[networkIndex].dataRate / (networkList[networkIndex].getNumAssociatedDevice() + 1)) / self.maxGain
+                    if (self.currentNetwork != self.availableNetwork[i]):                               # already set for current network
+                        scaledGainPerNetwork[i] = networkRegistry.getGainIfJoined(self.availableNetwork[i]) / self.maxGain
 
                 # compute loss
                 scaledLossPerNetwork = list((max(scaledGainPerNetwork) - bandwidth) for bandwidth in scaledGainPerNetwork)
@@ -734,13 +717,12 @@ class MobileDevice(object):
         args:        self
         returns:     amount of bandwidth observed by the device
         '''
-        global networkList, TIME_SLOT_DURATION
+        global networkRegistry, TIME_SLOT_DURATION
 
-        networkIndex = getListIndex(networkList, self.currentNetwork)  # get the index in lists where details of the specific network is saved
-        self.gain = networkList[networkIndex].getPerDeviceBitRate()  # in Mbps
+        self.gain = networkRegistry.getPerDeviceBitRate(self.currentNetwork)  # in Mbps
         if self.maxGain < self.gain: self.maxGain = self.gain; #print("device:", self.deviceID, ", own observation max:", self.maxGain)
         # scaledGain = self.gain / self.maxGain  # scale gain in range [0, 1]
-        self.download = networkList[networkIndex].getPerDeviceDownload(TIME_SLOT_DURATION, self.delay)  # Mbits
+        self.download = self.gain * (TIME_SLOT_DURATION - self.delay)  # Mbits
         # return scaledGain
         # end observeGain
         ''' scale gain in range [0, 1]; scaling in range [0, GAIN_SCALE] is performed after calling exp in updateWeight to avoid overflow from exp... '''
@@ -752,10 +734,9 @@ class MobileDevice(object):
         arg:         self, ID of network to join
         returns:     None
         '''
-        global networkList
+        global networkRegistry
 
-        networkIndex = getListIndex(networkList, networkSelected)
-        networkList[networkIndex].associateDevice(self.deviceID)
+        networkRegistry.associateDevice(networkSelected, self.deviceID)
         # end joinNetwork
 
     ''' ################################################################################################################################################################### '''
@@ -765,160 +746,119 @@ class MobileDevice(object):
         arg:         self, ID of network to leave
         returns:   None
         '''
-        global networkList
+        global networkRegistry
 
-        networkIndex = getListIndex(networkList, prevNetworkSelected)
-        networkList[networkIndex].disassociateDevice(self.deviceID)
+        networkRegistry.disassociateDevice(prevNetworkSelected, self.deviceID)
         # end leaveNetwork
 
     ''' ################################################################################################################################################################### '''
     def updateSetting(self, t):
         '''
-        description: identifies whether a device is still in the service area and performing a network selection, based on current setting considered; the settings considered
-                     are: (1) setting 1 - all devices are always in the service area; all devices have access to the same set of networks, (2) setting 2 - 9 devices leave the
-                     service area at the end of t = 600; all devices have access to the same set of networks, (3) setting 3 - 16 devices leave the service area at the end of
-                     t = 600; all devices have access to the same set of networks, (4) setting 4 - 9 devices join the service area at the beginning of t = 401 and leave the
-                     service area at the end of t = 800; all devices have access to the same set of networks
+        description: identifies whether a device is still in the service area and performing a network selection, based on the timeline of the setting considered (see
+                     buildScenario in scenario.py); the events of the device in the current time slot (joining, leaving or moving to another service area) are applied
+                     on the first call in the time slot
         args:        self, current time slot t
         returns:     True or False denoting whether the device is still in the service area
         '''
-        global SETTING, NUM_TIME_SLOT, DELAY, CONVERGED_PROBABILITY, OUTPUT_DIR
-
-        if SETTING == 2 and t == (NUM_TIME_SLOT // 2) + 1: self.numDevicePerServiceArea.update({1:NUM_MOBILE_DEVICE/2})
-        elif SETTING == 3:
-            if t == 1: self.numDevicePerServiceArea.update({1:NUM_MOBILE_DEVICE//2})
-            elif t == (NUM_TIME_SLOT // 3) + 1: self.numDevicePerServiceArea.update({1:NUM_MOBILE_DEVICE})
-            elif t == (2 * NUM_TIME_SLOT // 3) + 1: self.numDevicePerServiceArea.update({1:NUM_MOBILE_DEVICE//2})
-        elif SETTING == 4:
-            if t == 1: self.numDevicePerServiceArea.update({1:10}); self.numDevicePerServiceArea.update({2:5}); self.numDevicePerServiceArea.update({3:5})
-            elif t == (NUM_TIME_SLOT // 3) + 1:
-                self.numDevicePerServiceArea.update({1:2}); self.numDevicePerServiceArea.update({2:13}); self.numDevicePerServiceArea.update({3:5})
-            elif t == (2 * NUM_TIME_SLOT // 3) + 1:
-                self.numDevicePerServiceArea.update({1: 2}); self.numDevicePerServiceArea.update({2: 5}); self.numDevicePerServiceArea.update({3:13})
-        # print(colored("@t=" + str(t) + ", #devices per service area:" + str(self.numDevicePerServiceArea), "green"))
-
-        if SETTING == 2 and self.deviceID >= 11 and t > NUM_TIME_SLOT // 2:
-            # setting 2 - 10 devices leave the service area at the end of t = 600; all devices have access to the same set of networks
-            if t == ((NUM_TIME_SLOT // 2) + 1):
-                prevNetwork, self.currentNetwork = self.currentNetwork, -1
-                MobileDevice.leaveNetwork(self, prevNetwork); print("@t = ", t, "device", self.deviceID, "leaves the service area")
-            return False
-        elif SETTING == 3 and self.deviceID >= 11 and (t <= (NUM_TIME_SLOT // 3) or t > (2 * (NUM_TIME_SLOT // 3))):
-            # setting 3 - 10 devices join the service area at the beginning of t = 401 and leave the service area at the end of t = 800;
-            # all devices have access to the same set of networks
-            if t == ((2 * (NUM_TIME_SLOT // 3)) + 1):
-                prevNetwork, self.currentNetwork = self.currentNetwork, -1
-                MobileDevice.leaveNetwork(self, prevNetwork); print("@t = ", t, "device", self.deviceID, "leaves the service area")
-            return False
-        elif SETTING == 3 and self.deviceID >= 11 and t == ((NUM_TIME_SLOT // 3) + 1):
+        global SCENARIO, OUTPUT_DIR
+
+        if t != self.settingTimeSlot:
+            self.settingTimeSlot = t
+            SCENARIO.advanceTimeSlot(t)
+            outputDir = ORIGINAL_OUTPUT_DIR + SCENARIO.outputSubDirectory
+            if outputDir != OUTPUT_DIR: RUN_WRITER.close(); OUTPUT_DIR = outputDir  # new phase; the files of the previous phase are complete
+            for event in SCENARIO.getEvent(t, self.deviceID): MobileDevice.applyEvent(self, event, t)
+            # print(colored("@t=" + str(t) + ", #devices in service area:" + str(SCENARIO.getNumDevice(self.serviceArea)), "green"))
+        return SCENARIO.isActive(self.deviceID)
+        # end updateSetting
+
+    ''' ################################################################################################################################################################### '''
+    def applyEvent(self, event, t):
+        '''
+        description: applies an event of the timeline to the device: (1) join - the device starts with an empty history padded up to the previous time slot, (2) leave -
+                     the device leaves the network it is associated to, (3) move - the device enters another service area, where other networks may be available
+        args:        self, event (see Scenario), current time slot t
+        returns:     None
+        '''
+        global DELAY, MAX_TIME_UNHEARD_ACCEPTABLE
+
+        if event['type'] == "leave":
+            prevNetwork, self.currentNetwork = self.currentNetwork, -1
+            MobileDevice.leaveNetwork(self, prevNetwork); print("@t = ", t, "device", self.deviceID, "leaves the service area")
+        elif event['type'] == "join":
             print("@t = ", t, "device", self.deviceID, "joins the service area")
-            for i in range(DELAY):
-                newElement = {}
-                for i in range(len(self.availableNetwork)):
-                    newElement.update({i + 1: {}})
-                    newElement[i + 1].update({'aggregate_bit_rate': 0})
-                    newElement[i + 1].update({'associated_device_list': set()})
-                    newElement[i + 1].update({'probability_list': []})
-                    newElement[i + 1].update({'num_associated_device': 0})
-                self.networkDetailHistory.append(newElement)
+            self.serviceArea = event['service_area']
+            self.networkDetailHistory.pad(DELAY, t - 1)
             for i in range(len(self.availableNetwork)):
-                self.recentGainHistoryPerNetwork.update({i+1: []})
-                for j in range(DELAY): self.recentGainHistoryPerNetwork[i+1].append(-1)
-                self.timeLastHeard[i] = t - 1
-
+                self.recentGainHistoryPerNetwork.update({self.availableNetwork[i]: GainHistory(MAX_TIME_UNHEARD_ACCEPTABLE, [-1] * DELAY)})
+                self.timeLastHeard.update(i, t - 1)
             # print("@t = ", t, ", device", self.deviceID, "joins the service area, with detail history", self.networkDetailHistory); input()
-        elif SETTING == 4 and t == 1:
-            # first phase
-            OUTPUT_DIR = ORIGINAL_OUTPUT_DIR + "PHASE_1/"
-            if self.deviceID >= 1 and self.deviceID <= 8: self.serviceArea = 1; self.transmitProbability = 1/10
-            elif self.deviceID >= 9 and self.deviceID <= 10: self.serviceArea = 1; self.transmitProbability = 1/10
-            elif self.deviceID >= 11 and self.deviceID <= 15: self.serviceArea = 2; self.transmitProbability = 1/5
-            elif self.deviceID >= 16 and self.deviceID <= 20: self.serviceArea = 3; self.transmitProbability = 1/5
-            print("@t = ", t, ", device ", self.deviceID, ", service area ", self.serviceArea, ", p_t ", self.transmitProbability)
-
-        elif SETTING == 4 and t == (NUM_TIME_SLOT // 3) + 1:
-            # second phase
-            OUTPUT_DIR = ORIGINAL_OUTPUT_DIR + "PHASE_2/"
-            if self.deviceID >= 1 and self.deviceID <= 8:
-                prevAvailableNetwork = deepcopy(self.availableNetwork)
-                networks = [networkList[0]] + networkList[2:]
-                self.availableNetwork = [networks[i].networkID for i in range(len(networks))]
+        elif event['type'] == "move":
+            if event['network'] is not None and event['network'] != self.availableNetwork:
+                prevAvailableNetwork, self.availableNetwork = self.availableNetwork, list(event['network'])
                 self.maxGain = max([NETWORK_BANDWIDTH[i - 1] for i in self.availableNetwork])
-                self.serviceArea = 2; self.transmitProbability = 1/13
-
                 MobileDevice.updateChangeServiceArea(self, prevAvailableNetwork, t)
-
-            elif self.deviceID >= 9 and self.deviceID <= 10: self.serviceArea = 1; self.transmitProbability = 1/2
-            elif self.deviceID >= 11 and self.deviceID <= 15: self.serviceArea = 2; self.transmitProbability = 1/13
-            elif self.deviceID >= 16 and self.deviceID <= 20: self.serviceArea = 3; self.transmitProbability = 1/5
+            self.serviceArea = event['service_area']; self.transmitProbability = 1 / SCENARIO.getNumDevice(self.serviceArea)
             print("@t = ", t, ", device ", self.deviceID, ", service area ", self.serviceArea, ", p_t ", self.transmitProbability)
+        # end applyEvent
 
-        elif SETTING == 4 and t == (2*NUM_TIME_SLOT // 3) + 1:
-            # third phase
-            OUTPUT_DIR = ORIGINAL_OUTPUT_DIR + "PHASE_3/"
-            if self.deviceID >= 1 and self.deviceID <= 8:
-                prevAvailableNetwork = deepcopy(self.availableNetwork); prevWeight = deepcopy(self.weight)
-                networks = [networkList[0]] + networkList[3:]
-                self.availableNetwork = [networks[i].networkID for i in range(len(networks))]
-                self.maxGain = max([NETWORK_BANDWIDTH[i - 1] for i in self.availableNetwork])
-                self.serviceArea = 3; self.transmitProbability = 1/13
-
-                MobileDevice.updateChangeServiceArea(self, prevAvailableNetwork, t)
-
-            elif self.deviceID >= 9 and self.deviceID <= 10: self.serviceArea = 1; self.transmitProbability = 1/2
-            elif self.deviceID >= 11 and self.deviceID <= 15: self.serviceArea = 2; self.transmitProbability = 1/5
-            elif self.deviceID >= 16 and self.deviceID <= 20: self.serviceArea = 3; self.transmitProbability = 1/13
-            print("@t = ", t, ", device ", self.deviceID, ", service area ", self.serviceArea, ", p_t ", self.transmitProbability)
-        return True  # for setting 1 and all other settings where the above conditions evaluate to False
-        # end updateSetting
     ''' ################################################################################################################################################################### '''
     def updateChangeServiceArea(self, prevAvailableNetwork, t):
-        prevWeight = deepcopy(self.weight); self.weight = [1] * len(self.availableNetwork)
-        prevNetworkDetailHistory = deepcopy(self.networkDetailHistory); prevTimeLastHeard = deepcopy(self.timeLastHeard);
-        prevRecentGainHistoryPerNetwork = deepcopy(self.recentGainHistoryPerNetwork); prevNumDevicePerNetwork = deepcopy(self.numDevicePerNetwork)
+        '''
+        description: carries the state of the device over to the networks available in its new service area; the state of a network that was also available in the
+                     previous service area is kept (its weight only if the device had converged to a network still available), a newly discovered network starts afresh
+        args:        self, list of networks previously available, current time slot t
+        returns:     None
+        '''
+        prevWeight, prevTimeLastHeard, prevRecentGainHistoryPerNetwork, prevNumDevicePerNetwork = self.weight, self.timeLastHeard, self.recentGainHistoryPerNetwork, self.numDevicePerNetwork
+        prevNetworkIndex = {networkID: i for i, networkID in enumerate(prevAvailableNetwork)}
+        prevIndex = [prevNetworkIndex.get(networkID, -1) for networkID in self.availableNetwork]   # index of each network in the previous lists; -1 if newly discovered
+        keepWeight = max(self.probability) >= CONVERGED_PROBABILITY and prevAvailableNetwork[self.probability.index(max(self.probability))] in self.availableNetwork
 
         # print("@t = ", t, ", device ", self.deviceID, " called updateChangeServiceArea...")
-        self.networkDetailHistory = [{}] * (len(prevNetworkDetailHistory)); self.timeLastHeard = [t-1] * len(self.availableNetwork); self.numDevicePerNetwork = [-1] * len(self.availableNetwork)
-        self.recentGainHistoryPerNetwork = {}
-        for i in range(len(self.availableNetwork)):
-            networkID = self.availableNetwork[i]
-            if networkID in prevAvailableNetwork:                       # network was also available earlier
-                networkIndex = prevAvailableNetwork.index(networkID)    # get its index in the previous list of networks
-
-                if max(self.probability) >= CONVERGED_PROBABILITY and prevAvailableNetwork[self.probability.index(max(self.probability))] in self.availableNetwork:
-                    self.weight[i] = prevWeight[networkIndex]
-                else: print(colored("t = " + str(t) + ", device " + str(self.deviceID) + ", resets its weight " + str(self.weight), "cyan"))
-                if ALGORITHM == "CollaborativeEWA":
-                    self.timeLastHeard[i] = prevTimeLastHeard[networkIndex]
-                    self.recentGainHistoryPerNetwork.update({networkID:prevRecentGainHistoryPerNetwork[networkID]})
-                    self.numDevicePerNetwork[i] = prevNumDevicePerNetwork[networkIndex]
-            else:
-                if ALGORITHM == "CollaborativeEWA":
-                    # network newly discovered
-                    self.recentGainHistoryPerNetwork.update({networkID: []})
-                    for j in range(DELAY): self.recentGainHistoryPerNetwork[networkID].append(-1)
-
-        # networkDetailHistory; if self.availableNetwork[i] in prevAvailableNetwork:  # if network was previously available, save its data else default...
+        self.networkIndex = {networkID: i for i, networkID in enumerate(self.availableNetwork)}
+        self.weight = [prevWeight[j] if j != -1 and keepWeight else 1 for j in prevIndex]
+        if not keepWeight:
+            for j in prevIndex:
+                if j != -1: print(colored("t = " + str(t) + ", device " + str(self.deviceID) + ", resets its weight " + str(self.weight), "cyan"))
         if ALGORITHM == "CollaborativeEWA":
-            for i in range(len(prevNetworkDetailHistory)):
-                singleNetworkDetailHistory = prevNetworkDetailHistory[i]
-                # print("singleNetworkDetailHistory:", singleNetworkDetailHistory)
-                for j in range(len(self.availableNetwork)):
-                    if self.availableNetwork[j] in prevAvailableNetwork:
-                        self.networkDetailHistory[i].update({self.availableNetwork[j]: singleNetworkDetailHistory[self.availableNetwork[j]]})
-                    else:
-                        self.networkDetailHistory[i].update({self.availableNetwork[j]:{}})
-                        self.networkDetailHistory[i][self.availableNetwork[j]].update({'aggregate_bit_rate': 0})
-                        self.networkDetailHistory[i][self.availableNetwork[j]].update({'associated_device_list': set()})
-                        self.networkDetailHistory[i][self.availableNetwork[j]].update({'probability_list': []})
-                        self.networkDetailHistory[i][self.availableNetwork[j]].update({'num_associated_device': 0})
+            self.timeLastHeard = TimeLastHeard([prevTimeLastHeard[j] if j != -1 else t - 1 for j in prevIndex])
+            self.numDevicePerNetwork = [prevNumDevicePerNetwork[j] if j != -1 else -1 for j in prevIndex]
+            self.recentGainHistoryPerNetwork = {networkID: prevRecentGainHistoryPerNetwork[networkID] if j != -1 else GainHistory(MAX_TIME_UNHEARD_ACCEPTABLE, [-1] * DELAY)
+                                                for networkID, j in zip(self.availableNetwork, prevIndex)}     # a newly discovered network starts with DELAY unknown gains
+        else:
+            self.timeLastHeard = TimeLastHeard([t - 1] * len(self.availableNetwork)); self.numDevicePerNetwork = [-1] * len(self.availableNetwork)
+            self.recentGainHistoryPerNetwork = {}
+
+        # networkDetailHistory; if network was previously available, keep its data else default...
+        self.networkDetailHistory = self.networkDetailHistory.remap(self.availableNetwork)
 
         # print("@t=",t, ", device", self.deviceID, ", prev prob:", self.probability, ", weight", self.weight, ", time last heard:", self.timeLastHeard,
         #       ", recent gain history:", self.recentGainHistoryPerNetwork, ", #device per net:", self.numDevicePerNetwork, ", network detail history:", self.networkDetailHistory)
-        # print("@t=",t, ", device", self.deviceID, ", time last heard:", self.timeLastHeard, ", recent gain history:", self.recentGainHistoryPerNetwork, ", #device per net:", self.numDevicePerNetwork)
 
         self.probability = [0] * len(self.availableNetwork)
-       # end updateChangeServiceArea
+        # end updateChangeServiceArea
+
+    ''' ################################################################################################################################################################### '''
+    def isTraced(self, t):
+        '''
+        description: determines whether the traces of the device (network detail history, D, gain, loss and probability histories...) are saved in a time slot, i.e. in
+                     the debug output tier, every TRACE_EVERY time slots and for the devices in TRACE_DEVICE only
+        args:        self, time slot t
+        returns:     True or False
+        '''
+        return OUTPUT_TIER == "debug" and (t - 1) % TRACE_EVERY == 0 and (TRACE_DEVICE is None or self.deviceID in TRACE_DEVICE)
+        # end isTraced
+
+    ''' ################################################################################################################################################################### '''
+    def getSummary(self):
+        '''
+        description: summarizes the run of the device
+        args:        self
+        returns:     [deviceID, number of network switches, data downloaded (MB), network the device stabilized to (-1 if none), time slot at which it stabilized (-1 if none)]
+        '''
+        return [self.deviceID, self.numNetworkSwitch, self.totalDownload, self.stabilizedNetwork, self.stabilizationTime]
+        # end getSummary
 
     ''' ################################################################################################################################################################### '''
     def saveDeviceDetail(self, t, prevWeight, learningRate, estimatedGain = -1):
@@ -930,25 +870,31 @@ class MobileDevice(object):
                      which the device shares and receives data, the value of the variable that controls the uniform part of the probability distribution
         returns:     None
         '''
-        global networkList, ALGORITHM
+        global networkRegistry, ALGORITHM
 
+        if self.lastNetworkSaved != -1 and self.lastNetworkSaved != self.currentNetwork: self.numNetworkSwitch += 1
+        self.lastNetworkSaved = self.currentNetwork; self.totalDownload += self.download / 8
+        if CAMPAIGN_CUBE is not None: CAMPAIGN_CUBE.saveDeviceDetail(t, self.deviceID, self.currentNetwork, self.gain)
+        if OUTPUT_TIER == "summary": return
+        if COLUMNAR_WRITER is not None:
+            COLUMNAR_WRITER.saveDeviceDetail(t, self.deviceID, self.availableNetwork, prevWeight, self.probability, self.currentNetwork, self.delay, self.download / 8, self.gain)
+            return
         filename = OUTPUT_DIR + "device" + str(self.deviceID) + ".csv"
         # currentNetworkIndex = getListIndex(networkList, self.currentNetwork)
         currentNetworkIndex = self.availableNetwork.index(self.currentNetwork)
 
         # build list of data values to be saved to csv file
-        if SAVE_MINIMAL_DETAIL == True:
+        if SAVE_MINIMAL_DETAIL == True or OUTPUT_TIER == "core":
             data = [RUN_NUM, t]
             for index in range(len(prevWeight)): data.append(prevWeight[index])  # weight used in this time slot to calculate the probability distribution
             for index in range(len(self.probability)): data.append(self.probability[index])
             data += [self.currentNetwork, self.delay, self.download / 8, self.gain]  # save download in MB; gain is bit rate - Mbps
             for netID in self.availableNetwork:    # append achievable download if connected to each of the other networks; each expert's gain
-                networkIndex = getListIndex(networkList, netID)
-                if netID == self.currentNetwork:
-                    possibleDownload = (networkList[networkIndex].dataRate / networkList[networkIndex].getNumAssociatedDevice()) * TIME_SLOT_DURATION
-                else: possibleDownload = (networkList[networkIndex].dataRate / (networkList[networkIndex].getNumAssociatedDevice() + 1)) * TIME_SLOT_DURATION
+                if netID == self.currentNetwork: possibleDownload = networkRegistry.getPerDeviceBitRate(netID) * TIME_SLOT_DURATION
+                else: possibleDownload = networkRegistry.getGainIfJoined(netID) * TIME_SLOT_DURATION
                 data.append(possibleDownload / 8)       # in MB
-            if ALGORITHM == "SmartEXP3":
+            if not MobileDevice.isTraced(self, t): pass                             # core metrics only
+            elif ALGORITHM == "SmartEXP3":
                 data.append(self.coinFlip)
                 data.append(self.chooseGreedily)
                 data.append(self.switchBack)
@@ -956,18 +902,16 @@ class MobileDevice(object):
                 data.append(self.resetBlockLength)
             elif ALGORITHM == "CollaborativeEWA" or ALGORITHM == "CollaborativeEXP3":
                 data.append(self.networkDetailHistory)
-            data += self.log
+            if MobileDevice.isTraced(self, t): data += self.log
                 # data.append(self.log)
         else:
             data = [RUN_NUM, t, self.deviceID, learningRate]
             for index in range(len(prevWeight)): data.append(prevWeight[index])  # weight used in this time slot to calculate the probability distribution
             for index in range(len(self.probability)): data.append(self.probability[index])
-            data += [self.currentNetwork, networkList[currentNetworkIndex].getNumAssociatedDevice(), self.delay, self.download / 8, self.gain, self.gain/self.maxGain, estimatedGain]
+            data += [self.currentNetwork, networkRegistry.getNumAssociatedDevice(self.currentNetwork), self.delay, self.download / 8, self.gain, self.gain/self.maxGain, estimatedGain]
             for netID in self.availableNetwork:  # append achievable download if connected to each of the other networks; each expert's gain
-                networkIndex = getListIndex(networkList, netID)
-                if netID == self.currentNetwork:
-                    possibleDownload = (networkList[networkIndex].dataRate / networkList[networkIndex].getNumAssociatedDevice()) * TIME_SLOT_DURATION
-                else: possibleDownload = (networkList[networkIndex].dataRate / (networkList[networkIndex].getNumAssociatedDevice() + 1)) * TIME_SLOT_DURATION
+                if netID == self.currentNetwork: possibleDownload = networkRegistry.getPerDeviceBitRate(netID) * TIME_SLOT_DURATION
+                else: possibleDownload = networkRegistry.getGainIfJoined(netID) * TIME_SLOT_DURATION
                 data.append(possibleDownload / 8)       # in MB
             data.append(self.coinFlip)
             data.append(self.chooseGreedily)
@@ -982,11 +926,7 @@ class MobileDevice(object):
             data.append(str(self.totalBitRatePerNetwork))
             data.append(str(self.numTimeSlotNetworkSelected))
 
-        # open the csv file, write the data to it and close it
-        myfile = open(filename, "a")
-        out = csv.writer(myfile, delimiter=',', quoting=csv.QUOTE_ALL)
-        out.writerow(data)
-        myfile.close()
+        RUN_WRITER.writeRow(filename, data)     # buffered; written to the csv file in blocks
         # end saveDeviceDetail
 
     ''' ################################################################################################################################################################### '''
@@ -996,16 +936,14 @@ class MobileDevice(object):
         args:        self, iteration t
         returns:     None
         '''
+        if CAMPAIGN_CUBE is not None: CAMPAIGN_CUBE.saveNetworkDetail(t, networkRegistry.getLoad())
+        if COLUMNAR_WRITER is not None: COLUMNAR_WRITER.saveNetworkDetail(t, networkRegistry.getLoad()); return
         filename = OUTPUT_DIR + "network.csv"
 
         # build list of data values to be saved to csv file
         data = [RUN_NUM, t, self.deviceID]
-        for i in range(NUM_NETWORK): data.append(networkList[i].getNumAssociatedDevice())
-        for i in range(NUM_NETWORK): data.append(networkList[i].getAssociatedDevice())
-        # open the csv file, write the data to it and close it
-        myfile = open(filename, "a")
-        out = csv.writer(myfile, delimiter=',', quoting=csv.QUOTE_ALL)
-        out.writerow(data)
-        myfile.close()
+        data += networkRegistry.getLoad()
+        for i in range(NUM_NETWORK): data.append(encodeBitset(networkList[i].getAssociatedDevice()))
+        RUN_WRITER.writeRow(filename, data)     # buffered; written to the csv file in blocks
         # end saveNetworkDetail
 # end MobileDevice class
\ No newline at end of file
@@ -0,0 +1,83 @@
+'''
+@description:   Defines a uniform grid that indexes the position of mobile devices in each service area, so that a device can find the devices within its BLE radio
+                range without scanning every device in the service area
+'''
+
+from math import floor
+
+''' ____________________________________________________________________ NeighborIndex class definition ___________________________________________________________________ '''
+class NeighborIndex(object):
+    ''' uniform grid over the position of devices; one grid per service area, with cells whose side is equal to the radio range '''
+
+    def __init__(self, radioRange):
+        self.radioRange = radioRange                # BLE radio range (in metres); also the side of a grid cell
+        self.cell = {}                              # devices in each cell, keyed by (serviceArea, cellX, cellY)
+        self.location = {}                          # (serviceArea, x, y) of each device, keyed by deviceID
+        self.cellOfDevice = {}                      # key of the cell in which each device currently is
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def getCellKey(self, serviceArea, position):
+        '''
+        description: computes the key of the cell containing a given position in a service area
+        args:        self, service area, position (x, y) in metres
+        returns:     key of the cell, i.e. (serviceArea, cellX, cellY)
+        '''
+        return (serviceArea, floor(position[0] / self.radioRange), floor(position[1] / self.radioRange))
+        # end getCellKey
+
+    ''' ################################################################################################################################################################### '''
+    def update(self, deviceID, serviceArea, position):
+        '''
+        description: records the current position of a device; the device is moved to another cell only if it crossed a cell boundary or changed service area
+        args:        self, ID of the device, service area in which the device is, position (x, y) of the device in metres
+        returns:     None
+        '''
+        cellKey = NeighborIndex.getCellKey(self, serviceArea, position)
+        prevCellKey = self.cellOfDevice.get(deviceID)
+        if prevCellKey != cellKey:
+            if prevCellKey is not None:
+                self.cell[prevCellKey].discard(deviceID)
+                if len(self.cell[prevCellKey]) == 0: del self.cell[prevCellKey]
+            if cellKey not in self.cell: self.cell.update({cellKey: set()})
+            self.cell[cellKey].add(deviceID)
+            self.cellOfDevice.update({deviceID: cellKey})
+        self.location.update({deviceID: (serviceArea, position[0], position[1])})
+        # end update
+
+    ''' ################################################################################################################################################################### '''
+    def remove(self, deviceID):
+        '''
+        description: removes a device from the index, e.g. when it leaves the service area
+        args:        self, ID of the device
+        returns:     None
+        '''
+        if deviceID in self.cellOfDevice:
+            cellKey = self.cellOfDevice.pop(deviceID)
+            self.cell[cellKey].discard(deviceID)
+            if len(self.cell[cellKey]) == 0: del self.cell[cellKey]
+            del self.location[deviceID]
+        # end remove
+
+    ''' ################################################################################################################################################################### '''
+    def neighbors(self, deviceID):
+        '''
+        description: finds the devices within radio range of a given device, in the same service area; only the 3 x 3 cells around the device's cell are searched
+        args:        self, ID of the device
+        returns:     list of IDs of devices within radio range (excluding the device itself)
+        '''
+        if deviceID not in self.location: return []
+
+        serviceArea, x, y = self.location[deviceID]
+        _, cellX, cellY = self.cellOfDevice[deviceID]
+        squaredRange = self.radioRange ** 2
+        neighborList = []
+        for i in range(cellX - 1, cellX + 2):
+            for j in range(cellY - 1, cellY + 2):
+                for neighborID in self.cell.get((serviceArea, i, j), ()):
+                    if neighborID == deviceID: continue
+                    _, neighborX, neighborY = self.location[neighborID]
+                    if (neighborX - x) ** 2 + (neighborY - y) ** 2 <= squaredRange: neighborList.append(neighborID)
+        return neighborList
+        # end neighbors
+# end class NeighborIndex
@@ -2,6 +2,8 @@
 @description:   Defines a class that models a wireless network
 '''
 
+from utility_method import popcount
+
 ''' _______________________________________________________________________ Network class definition ______________________________________________________________________ '''
 class Network(object):
     ''' class to represent network objects '''
@@ -13,7 +15,7 @@ class Network(object):
         self.dataRate = dataRate                    # date rate of network (in Mbps)
         # self.numDevice = 0                          # number of devices currently associated with the network;
                                                     # NO NEED FOR THIS SINCE WE HAVE THE SET OF DEVICES, BUT I ADDED THE SET AT A LATER STAGE DURING IMPLEMENTATION
-        self.associatedDevice = set()               # set of associated devices
+        self.associatedDevice = 0                   # set of associated devices, as a bitset (bit i set if device i is associated)
         # end __init__
 
     ''' ################################################################################################################################################################### '''
@@ -24,7 +26,7 @@ class Network(object):
         returns:     None
         '''
         # self.numDevice = self.numDevice + 1
-        self.associatedDevice.add(deviceID)
+        self.associatedDevice |= 1 << deviceID
         # end associateDevice
 
     ''' ################################################################################################################################################################### '''
@@ -35,7 +37,8 @@ class Network(object):
         returns:     None
         '''
         # self.numDevice = self.numDevice - 1
-        self.associatedDevice.remove(deviceID)
+        if not (self.associatedDevice >> deviceID) & 1: raise KeyError(deviceID)
+        self.associatedDevice &= ~(1 << deviceID)
         # end disassociateDevice
 
     ''' ################################################################################################################################################################### '''
@@ -45,7 +48,7 @@ class Network(object):
         args:        self
         returns:     bit rate observed by a mobile device of the network (in Mbps)
         '''
-        return self.dataRate / len(self.associatedDevice) #self.numDevice
+        return self.dataRate / popcount(self.associatedDevice) #self.numDevice
 
     ''' ################################################################################################################################################################### '''
     def getPerDeviceDownload(self, timeSlotDuration, delay=0):
@@ -55,7 +58,7 @@ class Network(object):
         returns:     total download of a device during one time slot (in Mbits), considering switching cost
         '''
         # return (self.dataRate / self.numDevice) * (timeSlotDuration - delay)
-        return (self.dataRate / len(self.associatedDevice)) * (timeSlotDuration - delay)
+        return (self.dataRate / popcount(self.associatedDevice)) * (timeSlotDuration - delay)
 
     ''' ################################################################################################################################################################### '''
     def getNumAssociatedDevice(self):
@@ -64,14 +67,149 @@ class Network(object):
         args:        self
         return:      count of associated device
         '''
-        return len(self.associatedDevice)
+        return popcount(self.associatedDevice)
 
     ''' ################################################################################################################################################################### '''
     def getAssociatedDevice(self):
         '''
         description: returns the set of devices associated to the network
         args:        self
-        return:      set of associated device
+        return:      bitset of associated devices (bit i set if device i is associated)
         '''
         return self.associatedDevice
-# end class Network
\ No newline at end of file
+# end class Network
+
+''' ___________________________________________________________________ NetworkRegistry class definition ___________________________________________________________________ '''
+class NetworkRegistry(object):
+    ''' wraps the list of networks in the service area(s): finds a network from its ID in constant time, and keeps the number of devices associated to each network
+        and the bit rate a device would observe from each network up to date as devices join and leave, so that devices read them instead of querying each network;
+        optionally replays the capacity of each network per time slot from a trace '''
+
+    def __init__(self, networkList, capacityTrace=None):
+        self.networkList = networkList                                              # Network objects, in the order of their IDs
+        self.capacityTrace = capacityTrace                                          # data rate (Mbps) of each network per time slot, one row per time slot (None if constant)
+        self.timeSlot = 0                                                           # time slot whose data rates are in use
+        self.index = {network.networkID: i for i, network in enumerate(networkList)}   # index of each network in networkList, keyed by networkID
+        self.load = [network.getNumAssociatedDevice() for network in networkList]   # number of devices associated to each network
+        self.remoteLoad = [0] * len(networkList)                                    # part of the load due to devices simulated in other processes (sharded run)
+        self.gainIfJoined = [0.0] * len(networkList)                                # bit rate a device joining each network would observe, i.e. dataRate / (load + 1)
+        for i in range(len(networkList)): NetworkRegistry.updateGain(self, i)
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def updateGain(self, networkIndex):
+        '''
+        description: recomputes the bit rate a device joining a network would observe, after its load or data rate changed
+        args:        self, index of the network
+        returns:     None
+        '''
+        self.gainIfJoined[networkIndex] = self.networkList[networkIndex].dataRate / (self.load[networkIndex] + 1)
+        # end updateGain
+
+    ''' ################################################################################################################################################################### '''
+    def advanceTimeSlot(self, t):
+        '''
+        description: sets the data rate of each network to its capacity in a time slot, as read from the trace; only the row of that time slot is read from the
+                     (memory-mapped) trace, and only once however many devices call this method in the time slot
+        args:        self, time slot
+        returns:     None
+        '''
+        if self.capacityTrace is None or t == self.timeSlot: return
+        self.timeSlot = t
+        dataRate = self.capacityTrace[t - 1]
+        for i in range(len(self.networkList)):
+            self.networkList[i].dataRate = float(dataRate[i])
+            NetworkRegistry.updateGain(self, i)
+        # end advanceTimeSlot
+
+    ''' ################################################################################################################################################################### '''
+    def setRemoteLoad(self, remoteLoad):
+        '''
+        description: sets the number of devices associated to each network that are simulated in other processes (see sharded_simulation.py), so that the load and
+                     gain of a network visible in several service areas account for all its clients
+        args:        self, list of counts, in the order of the networks
+        returns:     None
+        '''
+        for i in range(len(self.networkList)):
+            if remoteLoad[i] == self.remoteLoad[i]: continue
+            self.load[i] += remoteLoad[i] - self.remoteLoad[i]; self.remoteLoad[i] = remoteLoad[i]
+            NetworkRegistry.updateGain(self, i)
+        # end setRemoteLoad
+
+    ''' ################################################################################################################################################################### '''
+    def getNetwork(self, networkID):
+        '''
+        description: returns the network with a given ID
+        args:        self, ID of the network
+        returns:     Network object
+        '''
+        return self.networkList[self.index[networkID]]
+        # end getNetwork
+
+    ''' ################################################################################################################################################################### '''
+    def associateDevice(self, networkID, deviceID):
+        '''
+        description: associates a device to a network and updates the load and gain of the network
+        args:        self, ID of the network, ID of the device
+        returns:     None
+        '''
+        networkIndex = self.index[networkID]
+        self.networkList[networkIndex].associateDevice(deviceID)
+        self.load[networkIndex] += 1
+        NetworkRegistry.updateGain(self, networkIndex)
+        # end associateDevice
+
+    ''' ################################################################################################################################################################### '''
+    def disassociateDevice(self, networkID, deviceID):
+        '''
+        description: disassociates a device from a network and updates the load and gain of the network
+        args:        self, ID of the network, ID of the device
+        returns:     None
+        '''
+        networkIndex = self.index[networkID]
+        self.networkList[networkIndex].disassociateDevice(deviceID)
+        self.load[networkIndex] -= 1
+        NetworkRegistry.updateGain(self, networkIndex)
+        # end disassociateDevice
+
+    ''' ################################################################################################################################################################### '''
+    def getNumAssociatedDevice(self, networkID):
+        '''
+        description: returns the number of devices associated to a network
+        args:        self, ID of the network
+        returns:     count of associated devices
+        '''
+        return self.load[self.index[networkID]]
+        # end getNumAssociatedDevice
+
+    ''' ################################################################################################################################################################### '''
+    def getPerDeviceBitRate(self, networkID):
+        '''
+        description: computes the bit rate observed by each device associated to a network, assuming the network bandwidth is equally shared among its clients
+        args:        self, ID of the network
+        returns:     bit rate in Mbps
+        '''
+        networkIndex = self.index[networkID]
+        return self.networkList[networkIndex].dataRate / self.load[networkIndex]
+        # end getPerDeviceBitRate
+
+    ''' ################################################################################################################################################################### '''
+    def getGainIfJoined(self, networkID):
+        '''
+        description: returns the bit rate a device would observe if it joined a network it is not associated to
+        args:        self, ID of the network
+        returns:     bit rate in Mbps
+        '''
+        return self.gainIfJoined[self.index[networkID]]
+        # end getGainIfJoined
+
+    ''' ################################################################################################################################################################### '''
+    def getLoad(self):
+        '''
+        description: returns the number of devices associated to each network, in the order of the networks
+        args:        self
+        returns:     list of counts (not to be modified)
+        '''
+        return self.load
+        # end getLoad
+# end class NetworkRegistry
@@ -0,0 +1,297 @@
+'''
+@description:   Defines a fixed-size ring of NumPy arrays that stores what a device observed or heard about each of its available networks over the past DELAY + 1 time
+                slots; the row of a time slot is found by modular arithmetic, hence nothing is allocated as time slots go by. The ring also maintains the estimated loss
+                of each network incrementally: only the time slots about which something new was learnt are re-evaluated, and the contribution of the time slot leaving
+                the window is removed from the running sums
+'''
+
+import numpy as np
+from utility_method import encodeBitset
+
+''' ________________________________________________________________ NetworkDetailHistory class definition ________________________________________________________________ '''
+class NetworkDetailHistory(object):
+    ''' (DELAY + 1) x K ring of network details, K being the number of networks available to the device; row (t % (DELAY + 1)) holds the details of time slot t '''
+
+    def __init__(self, availableNetwork, delay, numDevice):
+        self.availableNetwork = list(availableNetwork)                              # networkIDs of the available networks, in the order of the columns
+        self.networkIndex = {networkID: i for i, networkID in enumerate(self.availableNetwork)}   # column of each network
+        self.delay = delay
+        self.numDevice = numDevice
+        self.capacity = delay + 1                                                   # number of rows of the ring
+        self.length = 0                                                             # number of time slots currently in the history (at most capacity)
+        self.currentTimeSlot = 0                                                    # most recent time slot in the history
+
+        numNetwork = len(self.availableNetwork)
+        self.timeSlot = np.full(self.capacity, -1, dtype=int)                      # time slot whose details are stored in each row
+        self.aggregateBitRate = np.zeros((self.capacity, numNetwork))              # sum of bit rates shared by devices associated to the network
+        self.associatedDevice = np.zeros((self.capacity, numNetwork, numDevice // 64 + 1), dtype=np.uint64)  # devices known to be associated to the network, as
+                                                                                    # a bitset of 64-bit words (bit deviceID % 64 of word deviceID // 64)
+        self.numObservation = np.zeros((self.capacity, numNetwork), dtype=int)     # number of devices known to be associated to the network
+        self.numAssociatedDevice = np.zeros((self.capacity, numNetwork), dtype=int) # number of devices associated to the network, as reported by them
+        self.logProbabilityComplement = np.zeros((self.capacity, numNetwork))      # sum of log(1 - probability) over the probabilities of selecting the network received
+
+        # for the incremental loss estimate
+        self.gain = np.full((self.capacity, numNetwork), -1.0)                     # gain observed or estimated in each time slot (see computeGain), as last evaluated
+        self.lossKnown = np.zeros((self.capacity, numNetwork), dtype=bool)         # whether the loss of the network in the time slot is used in the estimate
+        self.lossContribution = np.zeros((self.capacity, numNetwork))              # (max gain - gain) / hearing probability, where the loss is used; 0 otherwise
+        self.lossSum = np.zeros(numNetwork)                                         # sum of the contributions over the time slots in the history
+        self.numLossContribution = np.zeros(numNetwork, dtype=int)                  # number of time slots in the history with a nonzero contribution
+        self.updatedRow = set()                                                     # rows about which something was learnt since the last evaluation
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def clearRow(self, row):
+        '''
+        description: discards all details stored in a row
+        args:        self, index of the row
+        returns:     None
+        '''
+        self.aggregateBitRate[row] = 0
+        self.associatedDevice[row] = 0
+        self.numObservation[row] = 0
+        self.numAssociatedDevice[row] = 0
+        self.logProbabilityComplement[row] = 0
+        self.updatedRow.add(row)
+        # end clearRow
+
+    ''' ################################################################################################################################################################### '''
+    def append(self, timeSlot):
+        '''
+        description: creates an empty entry for a new time slot, overwriting the entry of the oldest time slot once the history is full
+        args:        self, the new time slot
+        returns:     None
+        '''
+        row = timeSlot % self.capacity
+        # the time slot in the row leaves the window; remove its contribution to the loss estimate
+        self.lossSum -= self.lossContribution[row]; self.numLossContribution -= (self.lossContribution[row] != 0)
+        self.lossContribution[row] = 0; self.lossKnown[row] = False; self.gain[row] = -1
+        NetworkDetailHistory.clearRow(self, row)
+        self.timeSlot[row] = timeSlot
+        self.currentTimeSlot = timeSlot
+        self.length = min(self.length + 1, self.capacity)
+        # end append
+
+    ''' ################################################################################################################################################################### '''
+    def pad(self, numTimeSlot, lastTimeSlot):
+        '''
+        description: adds empty entries for a number of time slots ending at lastTimeSlot, e.g. for the time slots before a device joins the service area
+        args:        self, number of time slots to add, the last of these time slots
+        returns:     None
+        '''
+        for timeSlot in range(lastTimeSlot - numTimeSlot + 1, lastTimeSlot + 1): NetworkDetailHistory.append(self, timeSlot)
+        # end pad
+
+    ''' ################################################################################################################################################################### '''
+    def clear(self):
+        '''
+        description: discards the details of all time slots, keeping the time slots in the history
+        args:        self
+        returns:     None
+        '''
+        for row in range(self.capacity): NetworkDetailHistory.clearRow(self, row)
+        # end clear
+
+    ''' ################################################################################################################################################################### '''
+    def getRow(self, timeSlot):
+        '''
+        description: returns the row in which the details of a time slot are stored
+        args:        self, time slot
+        returns:     index of the row, or -1 if the time slot is not in the history
+        '''
+        if timeSlot > self.currentTimeSlot or timeSlot <= self.currentTimeSlot - self.length: return -1
+        return timeSlot % self.capacity
+        # end getRow
+
+    ''' ################################################################################################################################################################### '''
+    def getWindowRows(self):
+        '''
+        description: returns the rows of the time slots in the history, from the oldest to the most recent one
+        args:        self
+        returns:     array of row indices
+        '''
+        return np.arange(self.currentTimeSlot - self.length + 1, self.currentTimeSlot + 1) % self.capacity
+        # end getWindowRows
+
+    ''' ################################################################################################################################################################### '''
+    def isAssociated(self, row, networkIndex, deviceID):
+        '''
+        description: checks whether a device is known to have been associated to a network in a time slot
+        args:        self, row of the time slot, column of the network, ID of the device
+        returns:     True or False
+        '''
+        return bool((int(self.associatedDevice[row, networkIndex, deviceID >> 6]) >> (deviceID & 63)) & 1)
+        # end isAssociated
+
+    ''' ################################################################################################################################################################### '''
+    def getAssociatedDevice(self, row, networkIndex):
+        '''
+        description: returns the devices known to have been associated to a network in a time slot
+        args:        self, row of the time slot, column of the network
+        returns:     bitset (Python int) in which bit i is set if device i was associated
+        '''
+        return int.from_bytes(self.associatedDevice[row, networkIndex].astype('<u8').tobytes(), 'little')
+        # end getAssociatedDevice
+
+    ''' ################################################################################################################################################################### '''
+    def addObservation(self, row, networkID, deviceID, bitRate, numAssociatedDevice, ownDeviceID):
+        '''
+        description: records the bit rate a device observed from the network it selected in a time slot, unless the observation of that device is already known; the
+                     aggregate bit rate is not updated with what others observed if the device itself was associated to the network, as it knows the network quality
+        args:        self, row of the time slot, network selected, device that made the observation, bit rate observed, number of devices associated to the network, ID of
+                     the device owning the history
+        returns:     True if the observation is new, False otherwise
+        '''
+        networkIndex = self.networkIndex[networkID]
+        if NetworkDetailHistory.isAssociated(self, row, networkIndex, deviceID): return False
+
+        if deviceID == ownDeviceID: self.aggregateBitRate[row, networkIndex] = bitRate
+        elif not NetworkDetailHistory.isAssociated(self, row, networkIndex, ownDeviceID): self.aggregateBitRate[row, networkIndex] += bitRate
+        self.associatedDevice[row, networkIndex, deviceID >> 6] |= np.uint64(1 << (deviceID & 63))
+        self.numObservation[row, networkIndex] += 1
+        self.numAssociatedDevice[row, networkIndex] = numAssociatedDevice
+        self.updatedRow.add(row)
+        return True
+        # end addObservation
+
+    ''' ################################################################################################################################################################### '''
+    def addProbability(self, row, networkID, probability):
+        '''
+        description: records the probability with which a device selected a network in a time slot
+        args:        self, row of the time slot, ID of the network, probability
+        returns:     None
+        '''
+        with np.errstate(divide='ignore'):      # a probability of 1 gives -inf, i.e. a complement of 0, which expm1 turns back into a probability of 1
+            self.logProbabilityComplement[row, self.networkIndex[networkID]] += np.log1p(-probability)
+        self.updatedRow.add(row)
+        # end addProbability
+
+    ''' ################################################################################################################################################################### '''
+    def computeGain(self, row, ownDeviceID):
+        '''
+        description: computes the gain (bit rate) the device observed or could have observed from each network in a time slot; the gain from a network the device was not
+                     associated to is estimated as the average bit rate of devices associated to it, shared among one more device
+        args:        self, row of the time slot, ID of the device owning the history
+        returns:     array of gains, one per network; -1 if nothing is known about the network
+        '''
+        aggregateBitRate = self.aggregateBitRate[row]; numObservation = self.numObservation[row]; numAssociatedDevice = self.numAssociatedDevice[row]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            estimatedGain = ((aggregateBitRate / numObservation) * numAssociatedDevice) / (numAssociatedDevice + 1)
+        ownAssociation = (self.associatedDevice[row, :, ownDeviceID >> 6] >> np.uint64(ownDeviceID & 63)) & np.uint64(1)
+        gain = np.where(ownAssociation == 1, aggregateBitRate, estimatedGain)
+        return np.where(numObservation == 0, -1.0, gain)
+        # end computeGain
+
+    ''' ################################################################################################################################################################### '''
+    def updateLossEstimate(self, ownDeviceID):
+        '''
+        description: re-evaluates the time slots about which something was learnt since the last call: their gains, hearing probabilities and contributions to the
+                     estimated loss (the loss of a network in a time slot is used only if its gain is known and the gain of at least one other network is known)
+        args:        self, ID of the device owning the history
+        returns:     list of (time slot, gain of each network) for the time slots re-evaluated, the most recent first
+        '''
+        numNetwork = len(self.availableNetwork)
+        windowRows = set(NetworkDetailHistory.getWindowRows(self).tolist())
+        updatedTimeSlot = []
+        for row in sorted(self.updatedRow & windowRows, key=lambda row: -self.timeSlot[row]):
+            gain = NetworkDetailHistory.computeGain(self, row, ownDeviceID)
+            probability = -np.expm1(self.logProbabilityComplement[row])
+            lossKnown = (gain != -1) & (np.count_nonzero(gain == -1) != numNetwork - 1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                lossContribution = np.where(lossKnown, (gain.max() - gain) / probability, 0)
+
+            self.lossSum += lossContribution - self.lossContribution[row]
+            self.numLossContribution += (lossContribution != 0).astype(int) - (self.lossContribution[row] != 0)
+            self.gain[row] = gain; self.lossKnown[row] = lossKnown; self.lossContribution[row] = lossContribution
+            updatedTimeSlot.append((int(self.timeSlot[row]), gain))
+        self.updatedRow = set()
+        self.lossSum[self.numLossContribution == 0] = 0        # no rounding error left over once no time slot contributes
+        return updatedTimeSlot
+        # end updateLossEstimate
+
+    ''' ################################################################################################################################################################### '''
+    def getEstimatedLoss(self, maxGain):
+        '''
+        description: estimates the loss of each network as the average over the time slots in the history of (scaled loss / hearing probability), where the scaled loss
+                     is the difference between the highest gain in the time slot and the gain of the network, divided by the maximum gain
+        args:        self, maximum gain (used for scaling)
+        returns:     array of estimated losses, one per network
+        '''
+        return np.maximum(self.lossSum, 0) / (self.length * maxGain)
+        # end getEstimatedLoss
+
+    ''' ################################################################################################################################################################### '''
+    def getGain(self):
+        '''
+        description: returns the gain of each network in each time slot of the history, as evaluated by the last call to updateLossEstimate
+        args:        self
+        returns:     array of gains, one row per time slot (oldest first) and one column per network; -1 if nothing is known about the network
+        '''
+        return self.gain[NetworkDetailHistory.getWindowRows(self)]
+        # end getGain
+
+    ''' ################################################################################################################################################################### '''
+    def getLossKnown(self):
+        '''
+        description: returns whether the loss of each network in each time slot of the history is used in the estimate
+        args:        self
+        returns:     boolean array, one row per time slot (oldest first) and one column per network
+        '''
+        return self.lossKnown[NetworkDetailHistory.getWindowRows(self)]
+        # end getLossKnown
+
+    ''' ################################################################################################################################################################### '''
+    def getHearingProbability(self):
+        '''
+        description: computes the probability of hearing about each network in each time slot of the history, i.e. 1 - prod(1 - p) over the probabilities received
+        args:        self
+        returns:     array of probabilities, one row per time slot (oldest first) and one column per network
+        '''
+        return 0.0 - np.expm1(self.logProbabilityComplement[NetworkDetailHistory.getWindowRows(self)])
+        # end getHearingProbability
+
+    ''' ################################################################################################################################################################### '''
+    def remap(self, newAvailableNetwork):
+        '''
+        description: builds the history for a new set of available networks (e.g. after moving to another service area); the details of networks that remain available
+                     are kept and networks newly available start with no detail
+        args:        self, networkIDs of the new set of available networks
+        returns:     the new history
+        '''
+        history = NetworkDetailHistory(newAvailableNetwork, self.delay, self.numDevice)
+        history.length = self.length; history.currentTimeSlot = self.currentTimeSlot; history.timeSlot[:] = self.timeSlot
+
+        newIndex = [i for i, networkID in enumerate(history.availableNetwork) if networkID in self.networkIndex]    # columns kept, in the new history
+        prevIndex = [self.networkIndex[history.availableNetwork[i]] for i in newIndex]                           # and in this history
+        for attribute in ['aggregateBitRate', 'associatedDevice', 'numObservation', 'numAssociatedDevice', 'logProbabilityComplement']:
+            getattr(history, attribute)[:, newIndex] = getattr(self, attribute)[:, prevIndex]
+        history.updatedRow = set(range(self.capacity))    # the loss estimate is rebuilt for the new set of networks
+        return history
+        # end remap
+
+    ''' ################################################################################################################################################################### '''
+    def toList(self):
+        '''
+        description: builds a list (oldest time slot first) of the details of each network, e.g. for logging
+        args:        self
+        returns:     list of dictionaries {networkID: details}
+        '''
+        hearingProbability = NetworkDetailHistory.getHearingProbability(self).tolist()
+        networkDetailList = []
+        for i, row in enumerate(NetworkDetailHistory.getWindowRows(self)):
+            networkDetail = {}
+            for networkIndex, networkID in enumerate(self.availableNetwork):
+                networkDetail.update({networkID: {'aggregate_bit_rate': float(self.aggregateBitRate[row, networkIndex]),
+                                                  'associated_device_list': encodeBitset(NetworkDetailHistory.getAssociatedDevice(self, row, networkIndex)),
+                                                  'hearing_probability': hearingProbability[i][networkIndex],
+                                                  'num_associated_device': int(self.numAssociatedDevice[row, networkIndex])}})
+            networkDetailList.append(networkDetail)
+        return networkDetailList
+        # end toList
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return str(NetworkDetailHistory.toList(self))
+# end class NetworkDetailHistory
@@ -0,0 +1,187 @@
+'''
+@description:   Defines a writer that keeps the output files of a run open and buffers the rows saved to them in memory, so that device and network details are written
+                to disk in large blocks instead of opening, appending one row to and closing a file for every device in every time slot. The blocks are handed over to a
+                background thread through a bounded queue, so that formatting them as csv and writing them to disk overlaps with the simulation; when the queue is full,
+                the simulation waits for the thread (back-pressure), which bounds the memory used whatever the speed of the disk. The files can be written as gzip or lzma
+                streams, or all of them appended to a single run store (see run_store.py); readers open them with openRunFile, which finds the plain or compressed file,
+                or the file in the run store, and decompresses it as it is read
+'''
+
+import csv
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+import numpy as np
+from run_store import findRunStore, readStoreFile
+
+''' ______________________________________________________________________________ constants ______________________________________________________________________________ '''
+FLUSH_INTERVAL = 2000                               # default number of rows buffered before they are written to the files
+MAX_OPEN_FILE = 256                                 # files kept open at most; beyond that, all files are closed and reopened when next written to
+MAX_QUEUED_BATCH = 4                                # default number of blocks of rows waiting for the background thread at most
+IMMUTABLE_TYPE = (str, int, float, type(None), np.generic)     # values formatted by the background thread; others are converted to text when the row is saved
+COMPRESSION = {'gz': gzip, 'xz': lzma}              # compressed formats, {file extension: module}; a compressed file is named after the plain file plus the extension
+
+''' ___________________________________________________________________ open plain or compressed files ____________________________________________________________________ '''
+def openRunFile(path, mode="r", compression=None):
+    '''
+    description: opens an output file of a run in text mode; for reading, the plain file or, if there is none, the compressed file (path + ".gz" or ".xz") is opened and
+                 decompressed as it is read, or else the file is read from the run store of the run (only its records, one at a time); for writing or appending, the
+                 file is compressed if a compression is given (appending adds a stream to the compressed file, which is read back as one)
+    args:        path of the plain file, mode ("r", "w" or "a"), compression (extension in COMPRESSION, or None for a plain file)
+    returns:     file object
+    '''
+    if mode == "r":
+        if not os.path.exists(path):
+            for extension, module in COMPRESSION.items():
+                if os.path.exists(path + "." + extension): return module.open(path + "." + extension, "rt", newline='')
+            runStore = findRunStore(path)
+            if runStore is not None: return readStoreFile(*runStore)
+        return open(path, newline='')
+    if compression is None: return open(path, mode)
+    return COMPRESSION[compression].open(path + "." + compression, mode + "t")
+    # end openRunFile
+
+''' ################################################################################################################################################################### '''
+def runFileExists(path):
+    '''
+    description: checks whether an output file of a run exists, plain, compressed or in the run store of the run
+    args:        path of the plain file
+    returns:     True or False
+    '''
+    return os.path.exists(path) or any(os.path.exists(path + "." + extension) for extension in COMPRESSION) or findRunStore(path) is not None
+    # end runFileExists
+
+''' _____________________________________________________________________ RunWriter class definition ______________________________________________________________________ '''
+class RunWriter(object):
+    ''' csv rows buffered in blocks; a block is written once flushInterval rows are buffered and when the files are closed, i.e. at the end of a phase and of the run,
+        by a background thread started when the first block is handed over and stopped when the files are closed (e.g. before processes are forked) '''
+
+    def __init__(self, flushInterval=FLUSH_INTERVAL, maxQueuedBatch=MAX_QUEUED_BATCH, compression=None, store=None):
+        self.flushInterval = flushInterval          # number of rows buffered before they are written to the files (1 or less writes every row immediately)
+        self.maxQueuedBatch = maxQueuedBatch        # blocks waiting for the background thread at most (0 or less writes them in the calling thread)
+        self.compression = compression              # extension in COMPRESSION of the compressed files written, or None for plain files
+        self.store = store                          # run store the blocks are appended to instead of the files (see run_store.py), or None
+        self.file = {}                              # open files, {path: file}; only used by the thread writing the blocks
+        self.batch = []                             # rows not handed over yet, in the order saved, [(path, row)]
+        self.queue = None                           # blocks handed over to the background thread; None when the thread is not running
+        self.thread = None
+        self.error = None                           # exception raised in the background thread, raised again in the calling thread
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def writeRow(self, path, row):
+        '''
+        description: appends a row to a csv file (all values quoted, as done elsewhere); the row is only buffered until the next flush. Values that may still change
+                     (e.g. the network detail history of a device) are converted to text now, as the csv writer would do, so that the row written is the row saved
+        args:        self, path of the file, list of values
+        returns:     None
+        '''
+        self.batch.append((path, [value if isinstance(value, IMMUTABLE_TYPE) else str(value) for value in row]))
+        if len(self.batch) >= self.flushInterval: RunWriter.flush(self)
+        # end writeRow
+
+    ''' ################################################################################################################################################################### '''
+    def flush(self):
+        '''
+        description: hands the buffered rows over to the background thread, waiting while maxQueuedBatch blocks are already queued, or writes them if there is no
+                     background thread
+        args:        self
+        returns:     None
+        '''
+        RunWriter.checkError(self)
+        if self.batch == []: return
+        batch = self.batch; self.batch = []
+        if self.maxQueuedBatch <= 0: RunWriter.writeBatch(self, batch); return
+        if self.thread is None:
+            self.queue = queue.Queue(maxsize=self.maxQueuedBatch)
+            self.thread = threading.Thread(target=RunWriter.writeQueuedBatch, args=(self,), daemon=True); self.thread.start()
+        self.queue.put(batch)
+        # end flush
+
+    ''' ################################################################################################################################################################### '''
+    def writeBatch(self, batch):
+        '''
+        description: formats a block of rows as csv and writes it to the files, one write per file, opening the files not open yet (in append mode, compressed if the
+                     writer compresses), or appends it to the run store, one record per file
+        args:        self, list of (path, row)
+        returns:     None
+        '''
+        text = {}                                   # {path: (text buffer, csv writer on the text buffer)}
+        for path, row in batch:
+            if path not in text:
+                buffer = io.StringIO()
+                text.update({path: (buffer, csv.writer(buffer, delimiter=',', quoting=csv.QUOTE_ALL))})
+            text[path][1].writerow(row)
+        if self.store is not None:
+            for path, (buffer, _) in text.items(): self.store.append(path, buffer.getvalue())
+            return
+        for path, (buffer, _) in text.items():
+            if path not in self.file:
+                if len(self.file) >= MAX_OPEN_FILE: RunWriter.closeFile(self)
+                self.file.update({path: openRunFile(path, "a", self.compression)})
+            self.file[path].write(buffer.getvalue())
+        for openFile in self.file.values(): openFile.flush()
+        # end writeBatch
+
+    ''' ################################################################################################################################################################### '''
+    def writeQueuedBatch(self):
+        '''
+        description: body of the background thread; writes the blocks in the order they were queued until None is queued, and then closes the files. After an error,
+                     the remaining blocks are dropped so that the calling thread never waits forever, and the error is raised again in the calling thread
+        args:        self
+        returns:     None
+        '''
+        while True:
+            batch = self.queue.get()
+            if batch is None: break
+            if self.error is not None: continue
+            try: RunWriter.writeBatch(self, batch)
+            except BaseException as error: self.error = error
+        try: RunWriter.closeFile(self)
+        except BaseException as error:
+            if self.error is None: self.error = error
+        # end writeQueuedBatch
+
+    ''' ################################################################################################################################################################### '''
+    def checkError(self):
+        '''
+        description: raises again, in the calling thread, an exception raised while writing in the background thread
+        args:        self
+        returns:     None
+        '''
+        if self.error is not None:
+            error = self.error; self.error = None
+            raise error
+        # end checkError
+
+    ''' ################################################################################################################################################################### '''
+    def closeFile(self):
+        '''
+        description: closes the files currently open; they are reopened when rows are next written to them
+        args:        self
+        returns:     None
+        '''
+        for openFile in self.file.values(): openFile.close()
+        self.file = {}
+        # end closeFile
+
+    ''' ################################################################################################################################################################### '''
+    def close(self):
+        '''
+        description: writes the buffered rows, waits until the background thread wrote every block and stops it, and closes all files, e.g. at the end of a phase or
+                     of the run; the writer can still be used afterwards
+        args:        self
+        returns:     None
+        '''
+        RunWriter.flush(self)
+        if self.thread is not None:
+            self.queue.put(None); self.thread.join()
+            self.thread = None; self.queue = None
+        RunWriter.closeFile(self)
+        RunWriter.checkError(self)
+        # end close
+# end class RunWriter
+''' _____________________________________________________________________________ end of file _____________________________________________________________________________ '''
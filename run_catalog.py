@@ -0,0 +1,100 @@
+'''
+@description:   Defines a catalog of the runs simulated: a SQLite database in which each run registers its configuration, seed, wall time and summary metrics (fraction
+                of time slots at Nash equilibrium, stabilization time, number of network switches, cumulative gain), and the summary of each of its devices, so that
+                the runs of different experiments are found and compared with SQL queries instead of reading the files of every run, e.g.
+                    python3 run_catalog.py -db catalog.sqlite -q "SELECT setting, eta, AVG(fraction_at_ne) FROM run GROUP BY setting, eta"
+'''
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+''' ______________________________________________________________________________ constants ______________________________________________________________________________ '''
+CATALOG_FILE = "catalog.sqlite"                     # default name of the catalog, in the root directory of the campaign (parent of the run directories)
+TIMEOUT = 60                                        # seconds waited for runs registering at the same time
+RUN_COLUMN = [("run_dir", "TEXT"), ("run_index", "INTEGER"), ("algorithm", "TEXT"), ("setting", "INTEGER"), ("num_device", "INTEGER"), ("num_network", "INTEGER"),
+              ("num_time_slot", "INTEGER"), ("num_sub_time_slot", "INTEGER"), ("network_bandwidth", "TEXT"), ("delay", "INTEGER"), ("eta", "REAL"), ("gamma", "REAL"),
+              ("p_t", "REAL"), ("p_l", "REAL"), ("max_time_unheard_acceptable", "INTEGER"), ("nash_equilibrium", "TEXT"), ("seed", "INTEGER"), ("start_time", "TEXT"),
+              ("wall_time", "REAL"), ("fraction_at_ne", "REAL"), ("num_stabilized_device", "INTEGER"), ("stabilization_time", "INTEGER"),
+              ("num_network_switch", "INTEGER"), ("cumulative_gain", "REAL"), ("configuration", "TEXT")]  # columns of the table of runs, besides its key
+DEVICE_COLUMN = [("run_id", "INTEGER"), ("device", "INTEGER"), ("num_network_switch", "INTEGER"), ("cumulative_gain", "REAL"), ("stabilized_network", "INTEGER"),
+                 ("stabilization_time", "INTEGER")]   # columns of the table of device summaries
+
+''' ________________________________________________________________________ write to the catalog _________________________________________________________________________ '''
+def openCatalog(catalogPath):
+    '''
+    description: opens the catalog, creating its tables if they do not exist
+    args:        path of the catalog
+    returns:     sqlite3 connection
+    '''
+    connection = sqlite3.connect(catalogPath, timeout=TIMEOUT)
+    connection.execute("CREATE TABLE IF NOT EXISTS run (id INTEGER PRIMARY KEY AUTOINCREMENT, " + ", ".join(name + " " + columnType for name, columnType in RUN_COLUMN) + ")")
+    connection.execute("CREATE TABLE IF NOT EXISTS device (" + ", ".join(name + " " + columnType for name, columnType in DEVICE_COLUMN)
+                       + ", PRIMARY KEY (run_id, device), FOREIGN KEY (run_id) REFERENCES run (id))")
+    connection.execute("CREATE INDEX IF NOT EXISTS run_setting ON run (setting, algorithm)")
+    return connection
+    # end openCatalog
+
+''' ################################################################################################################################################################### '''
+def registerRun(catalogPath, configuration, seed, startTime, wallTime, summaryList, distanceToNE=None):
+    '''
+    description: registers a run in the catalog, with the summary of each of its devices
+    args:        path of the catalog, configuration of the run (arguments of wns_delayed_feedback.py, {name: value}), seed of the random number generators (None if not
+                 seeded), start time (seconds since the epoch), wall time (s), summary of each device (see MobileDevice.getSummary), distance to Nash equilibrium per time
+                 slot (list of [distance]; None if not computed, e.g. in setting 4)
+    returns:     ID of the run in the catalog
+    '''
+    stabilizationTimeList = [stabilizationTime for _, _, _, stabilizedNetwork, stabilizationTime in summaryList if stabilizedNetwork != -1]
+    row = {'run_dir': os.path.abspath(configuration['directory']), 'run_index': int(configuration['run_index']), 'algorithm': configuration['algorithm_name'],
+           'setting': int(configuration['setting']), 'num_device': int(configuration['num_device']), 'num_network': int(configuration['num_network']),
+           'num_time_slot': int(configuration['num_time_slot']), 'num_sub_time_slot': int(configuration['num_sub_time_slot']),
+           'network_bandwidth': configuration['network_bandwidth'], 'delay': int(configuration['delay']), 'eta': float(configuration['eta']),
+           'gamma': float(configuration['gamma']), 'p_t': float(configuration['transmit_probability']), 'p_l': float(configuration['listen_probability']),
+           'max_time_unheard_acceptable': int(configuration['max_time_unheard_acceptable']), 'nash_equilibrium': configuration['nash_equilibrium_state_list'],
+           'seed': seed, 'start_time': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(startTime)), 'wall_time': wallTime,
+           'fraction_at_ne': sum(1 for distance in distanceToNE if distance[0] == 0) / len(distanceToNE) if distanceToNE else None,
+           'num_stabilized_device': len(stabilizationTimeList),
+           'stabilization_time': max(stabilizationTimeList) if len(stabilizationTimeList) == len(summaryList) and summaryList else None,    # all devices stable
+           'num_network_switch': sum(numNetworkSwitch for _, numNetworkSwitch, _, _, _ in summaryList),
+           'cumulative_gain': sum(download for _, _, download, _, _ in summaryList), 'configuration': json.dumps(configuration, sort_keys=True)}
+    connection = openCatalog(catalogPath)
+    try:
+        with connection:                                                            # one transaction
+            cursor = connection.execute("INSERT INTO run (" + ", ".join(name for name, _ in RUN_COLUMN) + ") VALUES (" + ", ".join("?" * len(RUN_COLUMN)) + ")",
+                                        [row[name] for name, _ in RUN_COLUMN])
+            runID = cursor.lastrowid
+            connection.executemany("INSERT INTO device VALUES (" + ", ".join("?" * len(DEVICE_COLUMN)) + ")", [[runID] + list(summary) for summary in summaryList])
+    finally: connection.close()
+    return runID
+    # end registerRun
+
+''' __________________________________________________________________________ query the catalog __________________________________________________________________________ '''
+def queryCatalog(catalogPath, query, parameter=()):
+    '''
+    description: runs an SQL query on the catalog
+    args:        path of the catalog, query, values of its parameters
+    returns:     (list of column names, list of rows)
+    '''
+    connection = openCatalog(catalogPath)
+    try:
+        cursor = connection.execute(query, parameter)
+        return [column[0] for column in cursor.description or []], cursor.fetchall()
+    finally: connection.close()
+    # end queryCatalog
+
+''' ################################################################################################################################################################### '''
+def main():
+    parser = argparse.ArgumentParser(description='Queries the catalog of runs.')
+    parser.add_argument('-db', dest="catalog", required=True, help='path of the catalog')
+    parser.add_argument('-q', dest="query", required=False, default="SELECT id, run_dir, algorithm, setting, eta, p_t, delay, seed, wall_time, fraction_at_ne FROM run",
+                        help='SQL query (default: list the runs)')
+    args = parser.parse_args()
+    header, rowList = queryCatalog(args.catalog, args.query)
+    print(",".join(header))
+    for row in rowList: print(",".join("" if value is None else str(value) for value in row))
+    # end main
+
+if __name__ == "__main__": main()
+''' _____________________________________________________________________________ end of file _____________________________________________________________________________ '''
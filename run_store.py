@@ -0,0 +1,193 @@
+'''
+@description:   Defines a run store: a single append-only file per run holding the content of all device and network csv files of the run (of all phases), instead of one
+                file per device and phase. Each block of rows written is appended as a record tagged with the path of the csv file it belongs to (relative to the run
+                directory, e.g. "PHASE_1/device3.csv"); an index of the records of each csv file is appended when the run ends, so that a reader only reads the records
+                of the file it asks for. Records are appended with a single write to a file opened in append mode, so that processes forked by the run (see
+                sharded_simulation.py) append to the same store; a store whose index is missing (e.g. the run was interrupted) is read by scanning the record headers
+'''
+
+import gzip
+import io
+import json
+import lzma
+import os
+import struct
+
+''' ______________________________________________________________________________ constants ______________________________________________________________________________ '''
+STORE_FILE = "run.store"                            # name of the run store in the run directory
+MAGIC = b"RUNSTORE"                                 # beginning of a run store, followed by the compression of the records (2 bytes, blank if none)
+RECORD_HEADER = struct.Struct("<HI")                # length of the path, length of the content; the index is a record with an empty path
+INDEX_POSITION = struct.Struct("<Q")                # last bytes of a store whose index was appended: offset of the index record
+CODEC = {b"  ": (lambda data: data, lambda data: data), b"gz": (gzip.compress, gzip.decompress), b"xz": (lzma.compress, lzma.decompress)}
+
+''' ______________________________________________________________________ RunStore class definition ______________________________________________________________________ '''
+class RunStore(object):
+    ''' run store being written; created (truncated) when the run starts and closed, i.e. its index appended, when the run ends '''
+
+    def __init__(self, runDir, compression=None):
+        self.directory = runDir                     # run directory; the csv files are identified by their path relative to it
+        self.path = runDir + STORE_FILE
+        self.codec = compression.encode() if compression is not None else b"  "     # compression of the content of each record ("gz", "xz" or none)
+        with open(self.path, "wb") as storeFile: storeFile.write(MAGIC + self.codec)
+        self.descriptor = os.open(self.path, os.O_WRONLY | os.O_APPEND)             # inherited by forked processes; appends never overlap
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def append(self, path, text):
+        '''
+        description: appends a block of text (rows of a csv file) to the store
+        args:        self, path of the csv file, text
+        returns:     None
+        '''
+        key = os.path.relpath(path, self.directory).encode()
+        content = CODEC[self.codec][0](text.encode())
+        os.write(self.descriptor, RECORD_HEADER.pack(len(key), len(content)) + key + content)
+        # end append
+
+    ''' ################################################################################################################################################################### '''
+    def openFile(self, path):
+        '''
+        description: opens a csv file of the store for writing (e.g. to write its header); the text written is appended to the store when the file is closed
+        args:        self, path of the csv file
+        returns:     file object
+        '''
+        return StoreFile(self, path)
+        # end openFile
+
+    ''' ################################################################################################################################################################### '''
+    def close(self):
+        '''
+        description: appends the index of the records of each csv file, once all processes appended their records, and closes the store
+        args:        self
+        returns:     None
+        '''
+        os.close(self.descriptor)
+        index = scanRecord(self.path)
+        with open(self.path, "ab") as storeFile:
+            indexPosition = storeFile.tell()
+            content = json.dumps(index).encode()
+            storeFile.write(RECORD_HEADER.pack(0, len(content)) + content + INDEX_POSITION.pack(indexPosition))
+        # end close
+# end class RunStore
+
+''' _____________________________________________________________________ StoreFile class definition ______________________________________________________________________ '''
+class StoreFile(io.StringIO):
+    ''' text written to a csv file of a run store, appended to the store as one record when closed '''
+
+    def __init__(self, store, path):
+        io.StringIO.__init__(self)
+        self.store = store; self.filePath = path
+        # end __init__
+
+    def close(self):
+        if not self.closed: self.store.append(self.filePath, self.getvalue())
+        io.StringIO.close(self)
+        # end close
+# end class StoreFile
+
+''' _________________________________________________________________ StoreRecordReader class definition __________________________________________________________________ '''
+class StoreRecordReader(io.RawIOBase):
+    ''' content of a csv file of a run store, read as a stream: one record is read and decompressed at a time, when the previous one has been consumed '''
+
+    def __init__(self, storePath, key):
+        io.RawIOBase.__init__(self)
+        self.storeFile = open(storePath, "rb")
+        self.decompress = CODEC[self.storeFile.read(len(MAGIC) + 2)[len(MAGIC):]][1]
+        self.recordList = iter(readIndex(storePath)[key])   # [offset, length] of the records of the file not read yet
+        self.buffer = b""; self.position = 0                # content of the record being read, and how much of it was read
+        # end __init__
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self.position == len(self.buffer):
+            record = next(self.recordList, None)
+            if record is None: return 0                     # end of the file
+            self.storeFile.seek(record[0])
+            self.buffer = self.decompress(self.storeFile.read(record[1])); self.position = 0
+        length = min(len(buffer), len(self.buffer) - self.position)
+        buffer[:length] = self.buffer[self.position:self.position + length]
+        self.position += length
+        return length
+        # end readinto
+
+    def close(self):
+        if not self.closed: self.storeFile.close()
+        io.RawIOBase.close(self)
+        # end close
+# end class StoreRecordReader
+
+''' __________________________________________________________________________ read a run store ___________________________________________________________________________ '''
+def scanRecord(storePath):
+    '''
+    description: lists the records of a run store by reading their headers only (the content of each record is skipped)
+    args:        path of the run store
+    returns:     {path of the csv file: list of [offset, length] of the content of its records, in the order appended}
+    '''
+    index = {}
+    with open(storePath, "rb") as storeFile:
+        storeFile.seek(len(MAGIC) + 2)
+        while True:
+            header = storeFile.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size: break
+            keyLength, contentLength = RECORD_HEADER.unpack(header)
+            if keyLength == 0: break                                    # index; nothing is appended after it
+            key = storeFile.read(keyLength).decode()
+            index.setdefault(key, []).append([storeFile.tell(), contentLength])
+            storeFile.seek(contentLength, os.SEEK_CUR)
+    return index
+    # end scanRecord
+
+''' ################################################################################################################################################################### '''
+storeIndex = {}                                     # index of the run stores read, {path: ((modification time, size), index)}
+
+def readIndex(storePath):
+    '''
+    description: reads the index appended to a run store, or builds it by scanning the record headers if there is none; kept until the store changes
+    args:        path of the run store
+    returns:     index (see scanRecord)
+    '''
+    status = os.stat(storePath); version = (status.st_mtime_ns, status.st_size)
+    if storePath in storeIndex and storeIndex[storePath][0] == version: return storeIndex[storePath][1]
+    index = None
+    with open(storePath, "rb") as storeFile:
+        if status.st_size >= len(MAGIC) + 2 + RECORD_HEADER.size + INDEX_POSITION.size:
+            storeFile.seek(-INDEX_POSITION.size, os.SEEK_END)
+            indexPosition = INDEX_POSITION.unpack(storeFile.read(INDEX_POSITION.size))[0]
+            if len(MAGIC) + 2 <= indexPosition <= status.st_size - RECORD_HEADER.size - INDEX_POSITION.size:
+                storeFile.seek(indexPosition)
+                keyLength, contentLength = RECORD_HEADER.unpack(storeFile.read(RECORD_HEADER.size))
+                if keyLength == 0 and indexPosition + RECORD_HEADER.size + contentLength + INDEX_POSITION.size == status.st_size:
+                    index = json.loads(storeFile.read(contentLength).decode())
+    if index is None: index = scanRecord(storePath)
+    storeIndex.update({storePath: (version, index)})
+    return index
+    # end readIndex
+
+''' ################################################################################################################################################################### '''
+def findRunStore(path):
+    '''
+    description: finds the run store holding a csv file, i.e. in the directory of the file or in its parent directory (for the files of a phase)
+    args:        path of the csv file
+    returns:     (path of the run store, path of the csv file relative to the run directory), or None if there is no run store or it does not hold the file
+    '''
+    directory = os.path.dirname(os.path.abspath(path))
+    for runDir in (directory, os.path.dirname(directory)):
+        storePath = os.path.join(runDir, STORE_FILE)
+        if os.path.exists(storePath):
+            key = os.path.relpath(os.path.abspath(path), runDir)
+            if key in readIndex(storePath): return storePath, key
+    return None
+    # end findRunStore
+
+''' ################################################################################################################################################################### '''
+def readStoreFile(storePath, key):
+    '''
+    description: opens a csv file of a run store for reading, as a stream; only the records of that file are read, one at a time
+    args:        path of the run store, path of the csv file relative to the run directory
+    returns:     file object (text)
+    '''
+    return io.TextIOWrapper(io.BufferedReader(StoreRecordReader(storePath, key)), newline='')
+    # end readStoreFile
+''' _____________________________________________________________________________ end of file _____________________________________________________________________________ '''
@@ -0,0 +1,90 @@
+'''
+@description:   Defines a streaming statistic of a vector of values (e.g. the distance to Nash equilibrium in each time slot) over runs: the number of runs, and the sum,
+                mean and sum of squared deviations of each entry, updated one run at a time (Welford) so that the runs never need to be held in memory. Statistics of
+                disjoint sets of runs, e.g. computed by different processes, are merged exactly (Chan et al.), so that the runs of a campaign can be reduced in parallel
+'''
+
+from statistics import NormalDist
+import numpy as np
+
+''' ______________________________________________________________________________ constants ______________________________________________________________________________ '''
+CONFIDENCE_LEVEL = 0.95                             # default level of the confidence intervals of the mean
+
+''' __________________________________________________________________ RunningStatistic class definition __________________________________________________________________ '''
+class RunningStatistic(object):
+    ''' sum, mean and sum of squared deviations of each entry of a vector over the runs added so far '''
+
+    def __init__(self, length):
+        self.count = 0                              # number of runs added
+        self.sum = np.zeros(length)                 # sum of the runs, added in the order of the runs
+        self.mean = np.zeros(length)
+        self.squaredDeviation = np.zeros(length)    # sum of the squared deviations from the mean (M2)
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def update(self, values):
+        '''
+        description: adds the vector of a run
+        args:        self, values of the run (as many as the length of the statistic)
+        returns:     None
+        '''
+        values = np.asarray(values, dtype=np.float64)
+        self.count += 1
+        self.sum += values
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.squaredDeviation += delta * (values - self.mean)
+        # end update
+
+    ''' ################################################################################################################################################################### '''
+    def merge(self, other):
+        '''
+        description: adds the runs of another statistic of the same length (disjoint from the runs of this one, and following them for the sum to be in run order)
+        args:        self, other statistic
+        returns:     None
+        '''
+        if other.count == 0: return
+        if self.count == 0:
+            self.count = other.count; self.sum = other.sum.copy(); self.mean = other.mean.copy(); self.squaredDeviation = other.squaredDeviation.copy()
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.squaredDeviation += other.squaredDeviation + delta ** 2 * self.count * other.count / count
+        self.sum += other.sum
+        self.count = count
+        # end merge
+
+    ''' ################################################################################################################################################################### '''
+    def variance(self):
+        '''
+        description: returns the sample variance of each entry (0 with fewer than 2 runs)
+        args:        self
+        returns:     array of variances
+        '''
+        if self.count < 2: return np.zeros(len(self.mean))
+        return self.squaredDeviation / (self.count - 1)
+        # end variance
+
+    ''' ################################################################################################################################################################### '''
+    def confidenceHalfWidth(self, level=CONFIDENCE_LEVEL):
+        '''
+        description: returns the half width of the confidence interval of the mean of each entry, with the normal approximation (z * standard deviation / sqrt(#runs))
+        args:        self, confidence level
+        returns:     array of half widths
+        '''
+        return NormalDist().inv_cdf(0.5 + level / 2) * np.sqrt(RunningStatistic.variance(self) / max(self.count, 1))
+        # end confidenceHalfWidth
+
+    ''' ################################################################################################################################################################### '''
+    def confidenceInterval(self, level=CONFIDENCE_LEVEL):
+        '''
+        description: returns the confidence interval of the mean of each entry, with the normal approximation (mean +/- z * standard deviation / sqrt(#runs))
+        args:        self, confidence level
+        returns:     (array of lower bounds, array of upper bounds)
+        '''
+        halfWidth = RunningStatistic.confidenceHalfWidth(self, level)
+        return self.mean - halfWidth, self.mean + halfWidth
+        # end confidenceInterval
+# end class RunningStatistic
+''' _____________________________________________________________________________ end of file _____________________________________________________________________________ '''
@@ -0,0 +1,128 @@
+'''
+@description:   Defines the scenarios simulated as timelines of events (a device joins, leaves or moves to another service area at the beginning of a time slot). The
+                timeline is compiled into a table of events per time slot, and a membership index keeps the devices present in each service area, so that the cost
+                of a time slot is proportional to the number of events in it rather than to the number of devices
+'''
+
+''' ______________________________________________________________________ Scenario class definition ______________________________________________________________________ '''
+class Scenario(object):
+    ''' timeline of events; an event is a dictionary {'time_slot', 'type' ("join", "leave" or "move"), 'device', 'service_area', 'network'}, where 'network' is the list
+        of networks available to the device in its new service area (None if unchanged) '''
+
+    def __init__(self, initialServiceArea, initialNetwork, eventList, phaseList=None):
+        self.initialNetwork = initialNetwork                # networks available to each device at the beginning, {deviceID: list of networkIDs}
+        self.serviceArea = dict(initialServiceArea)         # service area in which each device currently is, {deviceID: service area}; None if not in any
+        self.membership = {}                                # devices currently in each service area, {service area: set of deviceIDs}
+        for deviceID, serviceArea in self.serviceArea.items():
+            if serviceArea is not None: self.membership.setdefault(serviceArea, set()).add(deviceID)
+
+        # compile the timeline into a table of events per time slot and device
+        self.eventTable = {}                                # {time slot: {deviceID: list of events}}
+        for event in eventList: self.eventTable.setdefault(event['time_slot'], {}).setdefault(event['device'], []).append(event)
+        if phaseList is None: phaseList = []
+        self.phaseTable = dict(phaseList)                   # sub-directory in which output files are saved from a given time slot, {time slot: sub-directory}
+        self.outputSubDirectory = ""                        # sub-directory in which output files are currently saved
+        self.timeSlot = 0                                   # time slot whose events were applied last
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def advanceTimeSlot(self, t):
+        '''
+        description: applies the events of a time slot to the membership index; only done once however many devices call this method in the time slot, so that
+                     all devices see the membership of the whole time slot
+        args:        self, time slot
+        returns:     None
+        '''
+        if t == self.timeSlot: return
+        self.timeSlot = t
+        for deviceEventList in self.eventTable.get(t, {}).values():
+            for event in deviceEventList:
+                deviceID = event['device']; prevServiceArea = self.serviceArea.get(deviceID)
+                if prevServiceArea is not None: self.membership[prevServiceArea].discard(deviceID)
+                serviceArea = None if event['type'] == "leave" else event['service_area']
+                if serviceArea is not None: self.membership.setdefault(serviceArea, set()).add(deviceID)
+                self.serviceArea.update({deviceID: serviceArea})
+        if t in self.phaseTable: self.outputSubDirectory = self.phaseTable[t]
+        # end advanceTimeSlot
+
+    ''' ################################################################################################################################################################### '''
+    def getEvent(self, t, deviceID):
+        '''
+        description: returns the events concerning a device in a time slot
+        args:        self, time slot, ID of the device
+        returns:     list of events (empty if none)
+        '''
+        return self.eventTable.get(t, {}).get(deviceID, [])
+        # end getEvent
+
+    ''' ################################################################################################################################################################### '''
+    def isActive(self, deviceID):
+        '''
+        description: checks whether a device is currently in some service area
+        args:        self, ID of the device
+        returns:     True or False
+        '''
+        return self.serviceArea.get(deviceID) is not None
+        # end isActive
+
+    ''' ################################################################################################################################################################### '''
+    def getServiceAreaList(self):
+        '''
+        description: lists the service areas in which devices are at some point of the timeline
+        args:        self
+        returns:     sorted list of service areas
+        '''
+        serviceAreaList = set(serviceArea for serviceArea in self.serviceArea.values() if serviceArea is not None)
+        for deviceEventTable in self.eventTable.values():
+            for deviceEventList in deviceEventTable.values():
+                serviceAreaList.update(event['service_area'] for event in deviceEventList if event['type'] != "leave")
+        return sorted(serviceAreaList)
+        # end getServiceAreaList
+
+    ''' ################################################################################################################################################################### '''
+    def getNumDevice(self, serviceArea):
+        '''
+        description: returns the number of devices currently in a service area
+        args:        self, service area
+        returns:     number of devices
+        '''
+        return len(self.membership.get(serviceArea, ()))
+        # end getNumDevice
+# end class Scenario
+
+''' _____________________________________________________________________ timelines of the settings simulated ____________________________________________________________________ '''
+def buildScenario(setting, numDevice, numNetwork, numTimeSlot):
+    '''
+    description: builds the timeline of a setting: (1) setting 1 - all devices are always in the service area, (2) setting 2 - devices 11 onwards leave the service
+                 area at the beginning of t = numTimeSlot/2 + 1, (3) setting 3 - devices 11 onwards join the service area at the beginning of t = numTimeSlot/3 + 1 and
+                 leave it at the beginning of t = 2*numTimeSlot/3 + 1, (4) setting 4 - three service areas with networks [1, 2, 3], [1, 3, 4, 5] and [1, 4, 5]; devices 1
+                 to 8 move from area 1 to area 2 and then to area 3 at the beginning of each phase (a third of the time slots), devices 9-10, 11-15 and 16-20 stay in areas
+                 1, 2 and 3 respectively
+    args:        setting, number of devices, number of networks, number of time slots
+    returns:     Scenario object
+    '''
+    allNetwork = list(range(1, numNetwork + 1))
+    initialServiceArea = {deviceID: 1 for deviceID in range(1, numDevice + 1)}
+    initialNetwork = {deviceID: allNetwork for deviceID in range(1, numDevice + 1)}
+    eventList = []; phaseList = []
+
+    if setting == 2:
+        eventList += [{'time_slot': numTimeSlot // 2 + 1, 'type': "leave", 'device': deviceID} for deviceID in range(11, numDevice + 1)]
+    elif setting == 3:
+        for deviceID in range(11, numDevice + 1):
+            initialServiceArea.update({deviceID: None})
+            eventList.append({'time_slot': numTimeSlot // 3 + 1, 'type': "join", 'device': deviceID, 'service_area': 1, 'network': None})
+            eventList.append({'time_slot': 2 * (numTimeSlot // 3) + 1, 'type': "leave", 'device': deviceID})
+    elif setting == 4:
+        networkPerServiceArea = {1: [1, 2, 3], 2: [1, 3, 4, 5], 3: [1, 4, 5]}
+        phaseStart = [1, numTimeSlot // 3 + 1, 2 * numTimeSlot // 3 + 1]
+        for phase in range(3):
+            phaseList.append((phaseStart[phase], "PHASE_" + str(phase + 1) + "/"))
+            for deviceID in range(1, numDevice + 1):
+                if deviceID <= 8: serviceArea = phase + 1; network = networkPerServiceArea[serviceArea] if phase > 0 else None    # mobile devices
+                else: serviceArea = 1 if deviceID <= 10 else (2 if deviceID <= 15 else 3); network = None
+                eventList.append({'time_slot': phaseStart[phase], 'type': "move", 'device': deviceID, 'service_area': serviceArea, 'network': network})
+                if phase == 0: initialNetwork.update({deviceID: networkPerServiceArea[serviceArea]})
+
+    return Scenario(initialServiceArea, initialNetwork, eventList, phaseList)
+    # end buildScenario
@@ -0,0 +1,207 @@
+'''
+@description:   Runs the service areas in separate processes (shards), each simulating the devices currently in its service areas with its own simpy environment, so that
+                a scenario with many service areas uses all cores. Shards only interact through the networks visible in several service areas (e.g. network 1 in setting 4)
+                and through devices moving between service areas, hence they are synchronized at time slot boundaries: once every device joined its network for the time
+                slot, each shard publishes the devices it associated to each network in shared memory and reads the load due to the other shards before any gain is
+                observed; at the end of a time slot, a device moving to a service area of another shard at the beginning of the next time slot is handed over (its state is
+                pickled and its collaborative EWA loop restarted in the other shard). The coordinating process saves the network details of each time slot
+@assumptions:   (1) devices in different service areas do not hear each other, (2) a device joins or leaves a network only before the gain of the time slot is observed
+                (within the first TIME_UNIT_BEFORE_GAIN_OBSERVED time units of the time slot), (3) CollaborativeEWA only, (4) processes are forked (POSIX), (5) each shard
+                draws from its own random number generator, seeded from the generator of the coordinating process, hence a sharded run follows the same model as a single
+                process run but not the same sample path
+'''
+
+import multiprocessing
+import pickle
+import random
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+import simpy
+import global_setting
+from mobile_device import MobileDevice
+from utility_method import encodeBitset
+
+''' ______________________________________________________________________________ constants ______________________________________________________________________________ '''
+TIME_UNIT_PER_SUB_TIME_SLOT = 60                    # simulated time units a device spends in each iteration (sub-time slot) of its collaborative EWA loop
+TIME_UNIT_BEFORE_GAIN_OBSERVED = 15                 # time units into a time slot by which every device joined its network, before any gain is observed
+WORD_SIZE = 64                                      # number of devices per word of the shared bitsets
+WORD_MASK = (1 << WORD_SIZE) - 1
+NUM_MOBILE_DEVICE = global_setting.constants['num_mobile_device']
+NUM_TIME_SLOT = global_setting.constants['num_time_slot']
+NUM_SUB_TIME_SLOT = global_setting.constants['num_sub_time_slot']
+RUN_NUM = global_setting.constants['run_num']
+networkList = global_setting.constants['network_list']
+networkRegistry = global_setting.constants['network_registry']
+SCENARIO = global_setting.constants['scenario']
+RUN_WRITER = global_setting.constants['run_writer']
+COLUMNAR_WRITER = global_setting.constants['columnar_writer']
+CAMPAIGN_CUBE = global_setting.constants['campaign_cube']
+
+''' ___________________________________________________________________ assignment of devices to shards ___________________________________________________________________ '''
+def getShard(shardOfServiceArea, deviceID, t, currentShard):
+    '''
+    description: finds the shard simulating a device in a time slot, i.e. the shard of the service area the device joins or moves to at the beginning of the time slot, if
+                 any, else the shard currently simulating it (a device not in any service area stays in the shard where it was)
+    args:        shard of each service area {service area: shard}, ID of the device, time slot, shard currently simulating the device
+    returns:     index of the shard
+    '''
+    for event in SCENARIO.getEvent(t, deviceID):
+        if event['type'] != "leave": currentShard = shardOfServiceArea[event['service_area']]
+    return currentShard
+    # end getShard
+
+''' ____________________________________________________________________________ shard process ____________________________________________________________________________ '''
+def publishAssociation(shardID, sharedLoad, sharedAssociatedDevice):
+    '''
+    description: writes the number of devices of a shard associated to each network, and their IDs, to shared memory
+    args:        index of the shard, shared array of loads (#shards x #networks), shared array of bitsets (#shards x #networks x #words)
+    returns:     None
+    '''
+    for i, network in enumerate(networkList):
+        sharedLoad[shardID, i] = network.getNumAssociatedDevice()
+        associatedDevice = network.getAssociatedDevice()
+        for word in range(sharedAssociatedDevice.shape[2]): sharedAssociatedDevice[shardID, i, word] = (associatedDevice >> (WORD_SIZE * word)) & WORD_MASK
+    # end publishAssociation
+
+''' ################################################################################################################################################################### '''
+def handOver(shardID, device, shardOfServiceArea, inbox, t):
+    '''
+    description: hands the devices moving to a service area of another shard at the beginning of the next time slot over to that shard; each device leaves its network
+                 in this shard, and its collaborative EWA loop stops at the next time slot
+    args:        index of the shard, devices simulated by the shard {deviceID: device}, shard of each service area, inbox (queue) of each shard, current time slot
+    returns:     None
+    '''
+    outgoing = {shard: [] for shard in range(len(inbox)) if shard != shardID}   # one (possibly empty) list per shard, so that each shard knows how many to wait for
+    for deviceID in sorted(device):
+        shard = getShard(shardOfServiceArea, deviceID, t + 1, shardID)
+        if shard == shardID: continue
+        emigrant = device.pop(deviceID)
+        outgoing[shard].append(pickle.dumps(emigrant))
+        emigrant.handedOver = True
+        if emigrant.currentNetwork != -1: networkRegistry.disassociateDevice(emigrant.currentNetwork, deviceID)
+        if MobileDevice.neighborIndex is not None: MobileDevice.neighborIndex.remove(deviceID)
+    for shard, emigrantList in outgoing.items(): inbox[shard].put(emigrantList)
+    # end handOver
+
+''' ################################################################################################################################################################### '''
+def takeOver(shardID, device, inbox, env, t):
+    '''
+    description: receives the devices handed over by the other shards, associates each of them to its network in this shard and restarts its collaborative EWA loop
+                 at the next time slot
+    args:        index of the shard, devices simulated by the shard {deviceID: device}, inbox (queue) of each shard, simpy environment of the shard, current time slot
+    returns:     None
+    '''
+    immigrantList = []
+    for _ in range(len(inbox) - 1): immigrantList += [pickle.loads(data) for data in inbox[shardID].get()]
+    for immigrant in sorted(immigrantList, key=lambda immigrant: immigrant.deviceID):
+        device.update({immigrant.deviceID: immigrant})
+        if immigrant.currentNetwork != -1: networkRegistry.associateDevice(immigrant.currentNetwork, immigrant.deviceID)
+        env.process(immigrant.collaborativeEWA(env, t + 1))
+    # end takeOver
+
+''' ################################################################################################################################################################### '''
+def runShard(shardID, deviceList, shardOfServiceArea, sharedLoad, sharedAssociatedDevice, barrier, inbox, resultQueue, seed):
+    '''
+    description: simulates the devices of a shard one time slot at a time; the load each network has in the other shards is read from shared memory once all shards
+                 published theirs, and devices are handed over between shards at the end of each time slot
+    args:        index of the shard, devices initially simulated by the shard, shard of each service area, shared array of loads, shared array of bitsets, barrier shared
+                 by the shards and the coordinating process, inbox (queue) of each shard, queue to return the results, seed of the random number generators
+    returns:     None
+    '''
+    try:
+        np.random.seed(seed); random.seed(seed)
+        MobileDevice.networkDetailByDevice = False              # saved by the coordinating process
+        env = simpy.Environment()
+        device = {}
+        for mobileDevice in deviceList: device.update({mobileDevice.deviceID: mobileDevice}); env.process(mobileDevice.collaborativeEWA(env))
+
+        for t in range(1, NUM_TIME_SLOT + 1):
+            startTime = (t - 1) * NUM_SUB_TIME_SLOT * TIME_UNIT_PER_SUB_TIME_SLOT
+            env.run(until=startTime + TIME_UNIT_BEFORE_GAIN_OBSERVED)
+            publishAssociation(shardID, sharedLoad, sharedAssociatedDevice)
+            barrier.wait()                                      # all shards published their load
+            networkRegistry.setRemoteLoad((sharedLoad.sum(axis=0) - sharedLoad[shardID]).tolist())
+            env.run(until=startTime + NUM_SUB_TIME_SLOT * TIME_UNIT_PER_SUB_TIME_SLOT)
+            if t < NUM_TIME_SLOT: handOver(shardID, device, shardOfServiceArea, inbox, t)
+            barrier.wait()                                      # the coordinating process saved the network details
+            if t < NUM_TIME_SLOT: takeOver(shardID, device, inbox, env, t)
+        env.run()
+        RUN_WRITER.close()                                      # rows of this shard's devices
+        if COLUMNAR_WRITER is not None: COLUMNAR_WRITER.flush()     # the arrays are memory-mapped files shared with the coordinating process
+        if CAMPAIGN_CUBE is not None: CAMPAIGN_CUBE.flush()
+        resultQueue.put((shardID, MobileDevice.resetTimeSlotPerDevice, [mobileDevice.getSummary() for mobileDevice in device.values()]))
+    except BaseException:
+        barrier.abort()                                         # do not leave the other processes waiting
+        raise
+    # end runShard
+
+''' _________________________________________________________________ run the shards and coordinate them __________________________________________________________________ '''
+def saveNetworkDetail(outputDir, t, load, associatedDevice):
+    '''
+    description: saves details pertaining to each wireless network, as saved by device 1 in a single process run
+    args:        output directory, time slot, number of devices associated to each network, bitset words of the devices associated to each network (#networks x #words)
+    returns:     None
+    '''
+    if CAMPAIGN_CUBE is not None: CAMPAIGN_CUBE.saveNetworkDetail(t, load)
+    if COLUMNAR_WRITER is not None: COLUMNAR_WRITER.saveNetworkDetail(t, load); return
+    data = [RUN_NUM, t, 1] + [int(numDevice) for numDevice in load]
+    for words in associatedDevice: data.append(encodeBitset(sum(int(word) << (WORD_SIZE * i) for i, word in enumerate(words))))
+    RUN_WRITER.writeRow(outputDir + "network.csv", data)
+    # end saveNetworkDetail
+
+''' ################################################################################################################################################################### '''
+def runSharded(mobileDeviceList, numShard, outputDir):
+    '''
+    description: splits the service areas into groups (round robin), simulates each group in its own process and saves the network details of each time slot, once all
+                 shards published the devices associated to each network
+    args:        list of mobile devices, number of shards (at most the number of service areas), output directory
+    returns:     summary of the run of each device (see MobileDevice.getSummary), sorted by deviceID
+    '''
+    serviceAreaList = SCENARIO.getServiceAreaList()
+    numShard = max(1, min(numShard, len(serviceAreaList)))
+    shardOfServiceArea = {serviceArea: i % numShard for i, serviceArea in enumerate(serviceAreaList)}
+    deviceListPerShard = [[] for _ in range(numShard)]
+    for mobileDevice in mobileDeviceList:
+        initialShard = shardOfServiceArea.get(SCENARIO.serviceArea[mobileDevice.deviceID], 0)
+        deviceListPerShard[getShard(shardOfServiceArea, mobileDevice.deviceID, 1, initialShard)].append(mobileDevice)
+
+    numWord = NUM_MOBILE_DEVICE // WORD_SIZE + 1
+    loadSize = numShard * len(networkList) * np.dtype(np.int64).itemsize
+    sharedMemory = shared_memory.SharedMemory(create=True, size=loadSize + numShard * len(networkList) * numWord * np.dtype(np.uint64).itemsize)
+    sharedLoad = np.ndarray((numShard, len(networkList)), dtype=np.int64, buffer=sharedMemory.buf)
+    sharedAssociatedDevice = np.ndarray((numShard, len(networkList), numWord), dtype=np.uint64, buffer=sharedMemory.buf, offset=loadSize)
+    sharedLoad[:] = 0; sharedAssociatedDevice[:] = 0
+
+    context = multiprocessing.get_context("fork")                  # shards inherit the constants, networks and scenario set up by the main script
+    barrier = context.Barrier(numShard + 1)
+    inbox = [context.Queue() for _ in range(numShard)]
+    resultQueue = context.Queue()
+    seedList = np.random.randint(0, 2 ** 31, size=numShard)
+    processList = [context.Process(target=runShard, args=(shardID, deviceListPerShard[shardID], shardOfServiceArea, sharedLoad, sharedAssociatedDevice, barrier, inbox,
+                                                          resultQueue, int(seedList[shardID]))) for shardID in range(numShard)]
+    print("----- " + str(numShard) + " shard(s), service areas per shard: "
+          + str([[serviceArea for serviceArea in serviceAreaList if shardOfServiceArea[serviceArea] == shardID] for shardID in range(numShard)]) + " -----")
+    RUN_WRITER.close()                                              # nothing buffered is inherited by the shards
+    for process in processList: process.start()
+    try:
+        for t in range(1, NUM_TIME_SLOT + 1):
+            barrier.wait()                                          # all shards published the devices associated to each network
+            outputSubDirectory = SCENARIO.outputSubDirectory; SCENARIO.advanceTimeSlot(t)
+            if SCENARIO.outputSubDirectory != outputSubDirectory: RUN_WRITER.close()     # new phase
+            saveNetworkDetail(outputDir + SCENARIO.outputSubDirectory, t, sharedLoad.sum(axis=0), np.bitwise_or.reduce(sharedAssociatedDevice, axis=0))
+            barrier.wait()
+        summaryList = []
+        for _ in range(numShard):
+            _, resetTimeSlotPerDevice, shardSummaryList = resultQueue.get()
+            MobileDevice.resetTimeSlotPerDevice.update(resetTimeSlotPerDevice); summaryList += shardSummaryList
+    except threading.BrokenBarrierError:
+        for process in processList: process.terminate()
+        raise RuntimeError("a shard process failed, see its traceback above")
+    finally:
+        for process in processList: process.join()
+        del sharedLoad, sharedAssociatedDevice
+        sharedMemory.close(); sharedMemory.unlink()
+    return sorted(summaryList)
+    # end runSharded
+''' _____________________________________________________________________________ end of file _____________________________________________________________________________ '''
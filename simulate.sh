@@ -22,6 +22,7 @@ saveMinimal=1
 stableProbability=0.75
 consecutiveStableSlot=10
 rollingAvgWindow=10
+numParallelRun=$(nproc)
 echo "transmit with probability $transmitProbability"
 
 rootDir="/home/anuja/Seagate/simulation_final/mobility_setting/$algorithmName"
@@ -37,21 +38,8 @@ while [  $runIndex -lt $((numRun+1)) ]; do
 done
 if [ $setting -eq 4 ]
 then
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 1 -ne "5,5,7,2,1" -u "1,2,3,4,5,6,7,8" -b $networkDataRate
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 1 -ne "5,5,7,2,1" -u "9,10" -b $networkDataRate
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 1 -ne "5,5,7,2,1" -u "11,12,13,14,15" -b $networkDataRate
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 1 -ne "5,5,7,2,1" -u "16,17,18,19,20" -b $networkDataRate
-
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 2 -ne "6,2,9,2,1" -u "1,2,3,4,5,6,7,8" -b $networkDataRate
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 2 -ne "6,2,9,2,1" -u "9,10" -b $networkDataRate
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 2 -ne "6,2,9,2,1" -u "11,12,13,14,15" -b $networkDataRate
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 2 -ne "6,2,9,2,1" -u "16,17,18,19,20" -b $networkDataRate
-
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 3 -ne "8,2,5,3,2" -u "1,2,3,4,5,6,7,8" -b $networkDataRate
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 3 -ne "8,2,5,3,2" -u "9,10" -b $networkDataRate
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 3 -ne "8,2,5,3,2" -u "11,12,13,14,15" -b $networkDataRate
-    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr 1 -p 3 -ne "8,2,5,3,2" -u "16,17,18,19,20" -b $networkDataRate
+    python3 computeDistanceToNE_mobility.py -n $numMobileDevice -k $numNetwork -dir "$rootDir/" -t 400 -r $numRun -pr $numParallelRun -p 1,2,3 -ne "5,5,7,2,1;6,2,9,2,1;8,2,5,3,2" -u "1,2,3,4,5,6,7,8;9,10;11,12,13,14,15;16,17,18,19,20" -b $networkDataRate
 else
     python3 combineDistanceToNashEquilibrium.py -r $numRun -t $numTimeSlot -d "$rootDir/" -w $rollingAvgWindow
-    python3 stability.py -d "$rootDir/" -r $numRun -t $numTimeSlot -n numMobileDevice -k $numNetwork -p $stableProbability -c $consecutiveStableSlot -ne $nashEquilibrium
+    python3 stability.py -d "$rootDir/" -r $numRun -t $numTimeSlot -n $numMobileDevice -k $numNetwork -p $stableProbability -c $consecutiveStableSlot -ne $nashEquilibrium
 fi
@@ -3,8 +3,14 @@
 '''
 import csv
 import argparse
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from numpy import median
 from utility_method import saveToTxt, saveToCSV
+from columnar_output import hasColumnarOutput, loadColumn
+from output_writer import openRunFile
 
 parser = argparse.ArgumentParser(description='Exctracts details regarding stability of the algorithm.')
 parser.add_argument('-d', dest="root_dir", required=True, help='root directory where data of all runs are stored')
@@ -15,6 +21,7 @@ parser.add_argument('-k', dest="num_network", required=True, help='number of wir
 parser.add_argument('-p', dest="stable_probability", required=True, help='probability at which the algorithm is considered stable')
 parser.add_argument('-c', dest="consecutive_stable_slot", required=True, help='minimum number of consecutive slots the algorithm must stay in the same state till the end of the run to be considered stable')
 parser.add_argument('-ne', dest='nash_equilibrium_state_list', required=True, help='list of Nash equilibrium states for the setting')
+parser.add_argument('-j', dest="num_process", required=False, default=os.cpu_count(), help='number of processes analysing the runs (1 to analyse them in this process)')
 
 args = parser.parse_args()
 rootDir = args.root_dir
@@ -24,48 +31,66 @@ numDevice = int(args.num_device)
 numNetwork = int(args.num_network)
 stableProbability = float(args.stable_probability)
 consecutiveStableSlot = int(args.consecutive_stable_slot)
+numProcess = int(args.num_process)
 NEstate = args.nash_equilibrium_state_list.split(";"); NEstateList = []
 for state in NEstate: state = state.split("_"); state = [int(x) for x in state]; NEstateList.append(state)
 
 ''' _________________________________________ extract stability status, number of network switch and cumulative gain of a device _________________________________________ '''
-def extractStabilityStatus(deviceCSVfile, numNetwork, stableProbability, numTimeSlot, consecutiveStableSlot):
+def readDeviceCSVfile(deviceCSVfile, numNetwork):
     '''
-    description: extract details regarding stability of one device
-    args:        CSV file containing run details of a specific device, number of networks, minimum probability of a network for the algorithm to be considered stable,
+    description: reads the details of a device needed to extract its stability status from its csv file; the rows are split by the csv reader and the columns needed
+                 are converted to numbers at once
+    args:        CSV file containing run details of a specific device, number of networks
+    return:      (time slots, probability of each network per time slot (#time slots x #networks), network selected per time slot, data downloaded per time slot)
+    '''
+    with openRunFile(deviceCSVfile) as deviceCSVfile:                # plain or compressed
+        fileReader = csv.reader(deviceCSVfile)
+        next(fileReader)                                    # header
+        column = np.array([row[1:5 + 2 * numNetwork] for row in fileReader], dtype=str).reshape(-1, 4 + 2 * numNetwork)    # time slot ... data downloaded
+    return column[:, 0].astype(np.int64), column[:, 1 + numNetwork:1 + 2 * numNetwork].astype(np.float64), column[:, 1 + 2 * numNetwork].astype(np.int64), \
+           column[:, 3 + 2 * numNetwork].astype(np.float64)
+    # end readDeviceCSVfile
+
+def readDeviceColumnar(probability, network, download, deviceID):
+    '''
+    description: reads the details of a device needed to extract its stability status from the arrays of a run saved in the columnar format (see columnar_output.py)
+    args:        arrays of probabilities, networks selected and data downloaded of the run, ID of the device
+    return:      (time slots, probability of each network per time slot, network selected per time slot, data downloaded per time slot), for the time slots in which the
+                 device is in the service area
+    '''
+    present = np.flatnonzero(network[:, deviceID - 1] != -1)
+    return present + 1, np.asarray(probability[present, deviceID - 1], dtype=np.float64), np.asarray(network[present, deviceID - 1], dtype=np.int64), \
+           np.asarray(download[present, deviceID - 1], dtype=np.float64)
+    # end readDeviceColumnar
+
+def extractStabilityStatus(deviceDetail, numNetwork, stableProbability, numTimeSlot, consecutiveStableSlot):
+    '''
+    description: extract details regarding stability of one device. The device is stable from the first time slot of the last streak of time slots in which its highest
+                 probability is at least stableProbability, for the same network, until the end of the run; the streak is found by scanning back from the last time slot
+                 to the first one that breaks it
+    args:        details of a specific device (see readDeviceCSVfile), number of networks, minimum probability of a network for the algorithm to be considered stable,
                  number of time slots, minimum number of consecutive time slots the device must be favoring a particular network at the end of the run for it to be considered
                  stable at that network
     return:      time slot at which the device made its decision to stick to a particular network, the network it selects with sufficiently high probability till the end of
                  execution, the number of times the device switched network, cumulative gain of each device
     '''
+    timeSlot, probability, network, gain = deviceDetail
+    if len(timeSlot) == 0: return -1, -1, 0, 0
+
+    # stability
     stabilizationTimeSlot = -1
     preferredNetworkID = -1
-    prevNetwork = -1; numNetworkSwitch = 0; cumulativeGain = 0
-    # consecutiveStableSlot = 0  # must stay in that state for at least that number of slots at the end to be sure the algorithm stabilized...
+    lastPreferredNetworkID = int(probability[-1].argmax()) + 1
+    if probability[-1, lastPreferredNetworkID - 1] >= stableProbability:
+        stable = (probability.max(axis=1) >= stableProbability) & (probability.argmax(axis=1) == lastPreferredNetworkID - 1)
+        numStableSlot = int(stable[::-1].argmin()) if not stable.all() else len(stable)       # time slots from the end to the first one breaking the streak
+        stabilizationTimeSlot = int(timeSlot[len(stable) - numStableSlot]); preferredNetworkID = lastPreferredNetworkID
 
-    with open(deviceCSVfile, newline='') as deviceCSVfile:
-        fileReader = csv.reader(deviceCSVfile)
-        count = 0
-        for row in fileReader:
-            if count != 0:
-                # stability
-                probability = row[2 + numNetwork:2 + 2*numNetwork]; probability = [float(x) for x in probability]
-                maxProbability = max(probability)
-                currentPrefferedNetworkID = probability.index(maxProbability) + 1
-                if maxProbability < stableProbability and stabilizationTimeSlot != -1:
-                    stabilizationTimeSlot = -1; preferredNetworkID = -1
-                elif maxProbability >= stableProbability and (stabilizationTimeSlot == -1 or preferredNetworkID != currentPrefferedNetworkID):
-                    stabilizationTimeSlot = int(row[1]); preferredNetworkID = currentPrefferedNetworkID
-
-                # network switch
-                currentNetwork = int(row[2 + 2 * numNetwork])
-                if prevNetwork != -1 and prevNetwork != currentNetwork: numNetworkSwitch += 1
-                prevNetwork = currentNetwork
-
-                # cumulative gain
-                gain = float(row[4 + 2 * numNetwork])
-                cumulativeGain += gain
-            count += 1
-    deviceCSVfile.close()
+    # network switch (none counted after a time slot without network)
+    numNetworkSwitch = int(np.count_nonzero((network[1:] != network[:-1]) & (network[:-1] != -1)))
+
+    # cumulative gain, summed in the order of the time slots
+    cumulativeGain = float(np.cumsum(gain)[-1])
 
     # if we don't see it stay in a state for at least 'consecutiveStableSlot' time slots, we cannot be sure if the algorithm has stabilized
     if stabilizationTimeSlot > numTimeSlot - consecutiveStableSlot: stabilizationTimeSlot = -1; preferredNetworkID = -1
@@ -103,8 +128,12 @@ def isStable(rootDir, numNetwork, stableProbability, numTimeSlot, consecutiveSta
     '''
     stabilizationTimeSlotPerDevice = []; preferredNetworkPerDevice = []; stableState = [-1] * numNetwork; numNetworkSwitchPerDevice = []; cumulativeGainPerDevice = []
 
+    columnar = hasColumnarOutput(rootDir)
+    if columnar: probability, network, download = loadColumn(rootDir, "probability"), loadColumn(rootDir, "network"), loadColumn(rootDir, "download")
     for deviceID in range(1, numDevice + 1):
-        stabilizationTimeSlot, preferredNetwork, numNetworkSwitch, cumulativeGain = extractStabilityStatus(rootDir + "device" + str(deviceID) + ".csv", numNetwork, stableProbability, numTimeSlot, consecutiveStableSlot)
+        if columnar: deviceDetail = readDeviceColumnar(probability, network, download, deviceID)
+        else: deviceDetail = readDeviceCSVfile(rootDir + "device" + str(deviceID) + ".csv", numNetwork)
+        stabilizationTimeSlot, preferredNetwork, numNetworkSwitch, cumulativeGain = extractStabilityStatus(deviceDetail, numNetwork, stableProbability, numTimeSlot, consecutiveStableSlot)
         # print(deviceID, stabilizationTimeSlot, preferredNetwork)
         stabilizationTimeSlotPerDevice.append(stabilizationTimeSlot)
         preferredNetworkPerDevice.append(preferredNetwork)
@@ -126,7 +155,7 @@ def isStable(rootDir, numNetwork, stableProbability, numTimeSlot, consecutiveSta
 
 ''' ____________________________________________________________________________ main program ____________________________________________________________________________ '''
 def main():
-    global rootDir, numRun, numTimeSlot, numDevice, numNetwork, stableProbability, consecutiveStableSlot, NEstateList
+    global rootDir, numRun, numTimeSlot, numDevice, numNetwork, stableProbability, consecutiveStableSlot, NEstateList, numProcess
 
     stabilizationTimeSlotPerRun = []
     stableStatePerRun = []
@@ -134,13 +163,15 @@ def main():
     cumulativeGainPerDevicePerRun = []
     numDeviceSwitchNetworkForNEPerRun = []
 
-    for runIndex in range(1, numRun + 1):
-        stabilizationTimeSlot, stableState, numNetworkSwitchPerDevice, cumulativeGainPerDevice, numDeviceSwitchNetworkForNE = \
-            isStable(rootDir + "run" + str(runIndex) + "/", numNetwork, stableProbability, numTimeSlot, consecutiveStableSlot, NEstateList)
-        stabilizationTimeSlotPerRun.append(stabilizationTimeSlot); stableStatePerRun.append(stableState)
-        numNetworkSwitchPerDevicePerRun += numNetworkSwitchPerDevice
-        numDeviceSwitchNetworkForNEPerRun.append(numDeviceSwitchNetworkForNE)
-        cumulativeGainPerDevicePerRun += cumulativeGainPerDevice
+    runDirList = [rootDir + "run" + str(runIndex) + "/" for runIndex in range(1, numRun + 1)]
+    parameterList = [[parameter] * numRun for parameter in (numNetwork, stableProbability, numTimeSlot, consecutiveStableSlot, NEstateList)]
+    with ProcessPoolExecutor(max_workers=numProcess) if numProcess > 1 else nullcontext() as executor:     # runs analysed in parallel; results in the order of the runs
+        mapRun = executor.map if executor is not None else map
+        for stabilizationTimeSlot, stableState, numNetworkSwitchPerDevice, cumulativeGainPerDevice, numDeviceSwitchNetworkForNE in mapRun(isStable, runDirList, *parameterList):
+            stabilizationTimeSlotPerRun.append(stabilizationTimeSlot); stableStatePerRun.append(stableState)
+            numNetworkSwitchPerDevicePerRun += numNetworkSwitchPerDevice
+            numDeviceSwitchNetworkForNEPerRun.append(numDeviceSwitchNetworkForNE)
+            cumulativeGainPerDevicePerRun += cumulativeGainPerDevice
 
     # process number of times each stable state reached
     numStableRun = numRun - stabilizationTimeSlotPerRun.count(-1)
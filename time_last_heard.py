@@ -0,0 +1,103 @@
+'''
+@description:   Defines an indexed min-heap holding the time slot each available network was last heard of, so that the networks not heard of for a while are found
+                without scanning every network
+'''
+
+''' ____________________________________________________________________ TimeLastHeard class definition ____________________________________________________________________ '''
+class TimeLastHeard(object):
+    ''' time slot each network was last heard of (-1 if never), indexed by the position of the network in the list of available networks '''
+
+    def __init__(self, timeSlotList):
+        self.timeSlot = list(timeSlotList)                      # time slot each network was last heard of
+        self.heap = list(range(len(self.timeSlot)))             # indices of the networks, as a binary min-heap on the time slot last heard
+        self.position = list(range(len(self.timeSlot)))         # position of each network in the heap
+        for i in reversed(range(len(self.heap) // 2)): TimeLastHeard.siftDown(self, i)
+        # end __init__
+
+    ''' ################################################################################################################################################################### '''
+    def swap(self, i, j):
+        '''
+        description: swaps two entries of the heap
+        args:        self, positions of the two entries in the heap
+        returns:     None
+        '''
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.position[self.heap[i]] = i; self.position[self.heap[j]] = j
+        # end swap
+
+    ''' ################################################################################################################################################################### '''
+    def siftUp(self, i):
+        '''
+        description: moves an entry up the heap until its parent was heard of earlier
+        args:        self, position of the entry in the heap
+        returns:     None
+        '''
+        while i > 0:
+            parent = (i - 1) // 2
+            if self.timeSlot[self.heap[parent]] <= self.timeSlot[self.heap[i]]: break
+            TimeLastHeard.swap(self, i, parent); i = parent
+        # end siftUp
+
+    ''' ################################################################################################################################################################### '''
+    def siftDown(self, i):
+        '''
+        description: moves an entry down the heap until its children were heard of later
+        args:        self, position of the entry in the heap
+        returns:     None
+        '''
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self.heap) and self.timeSlot[self.heap[child]] < self.timeSlot[self.heap[smallest]]: smallest = child
+            if smallest == i: break
+            TimeLastHeard.swap(self, i, smallest); i = smallest
+        # end siftDown
+
+    ''' ################################################################################################################################################################### '''
+    def update(self, networkIndex, timeSlot):
+        '''
+        description: sets the time slot a network was last heard of
+        args:        self, index of the network, time slot
+        returns:     None
+        '''
+        prevTimeSlot = self.timeSlot[networkIndex]
+        self.timeSlot[networkIndex] = timeSlot
+        if timeSlot > prevTimeSlot: TimeLastHeard.siftDown(self, self.position[networkIndex])
+        elif timeSlot < prevTimeSlot: TimeLastHeard.siftUp(self, self.position[networkIndex])
+        # end update
+
+    ''' ################################################################################################################################################################### '''
+    def min(self):
+        '''
+        description: returns the earliest time slot in which one of the networks was last heard of
+        args:        self
+        returns:     time slot (-1 if some network was never heard of)
+        '''
+        return self.timeSlot[self.heap[0]]
+        # end min
+
+    ''' ################################################################################################################################################################### '''
+    def getUnheard(self, timeSlot):
+        '''
+        description: finds the networks last heard of before a given time slot; only the part of the heap holding such networks is visited
+        args:        self, time slot
+        returns:     list of indices of the networks, in ascending order
+        '''
+        unheardNetworkIndex = []; toVisit = [0] if len(self.heap) > 0 else []
+        while toVisit:
+            i = toVisit.pop()
+            if self.timeSlot[self.heap[i]] >= timeSlot: continue
+            unheardNetworkIndex.append(self.heap[i])
+            toVisit.extend(child for child in (2 * i + 1, 2 * i + 2) if child < len(self.heap))
+        return sorted(unheardNetworkIndex)
+        # end getUnheard
+
+    def __getitem__(self, networkIndex):
+        return self.timeSlot[networkIndex]
+
+    def __len__(self):
+        return len(self.timeSlot)
+
+    def __repr__(self):
+        return str(self.timeSlot)
+# end class TimeLastHeard
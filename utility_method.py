@@ -8,6 +8,9 @@ from itertools import permutations, product
 # import matplotlib.pyplot as plt
 import numpy as np
 from os import mkdir, chmod, umask
+from columnar_output import hasColumnarOutput, loadColumn
+from output_writer import openRunFile, runFileExists
+from distance_table import DistanceTable
 
 
 ''' _______________________________________________________________________ test for Nash equilibrium _____________________________________________________________________ '''
@@ -143,75 +146,145 @@ def decrementTTL(observationStr):
     return updatedObservationStr
     # end decrementTTL
 
-''' _________________________________________________________ computes distance to Nash equilibrium per time slot ________________________________________________________ '''
-def computeDistanceToNashEquilibrium(numNetwork, networkCSVfile, networkBandwidth, originalNElist, setting, numTimeSlot):
+''' _____________________________________________________ bitset of device IDs (bit i set if device i is in the set) _____________________________________________________ '''
+def bitsetToDeviceList(bitset):
     '''
-    description: computes the distance to NE per time slot and returns it as a list
-    args:
-    return:      list of distance to NE per time slot
+    description: lists the device IDs in a bitset
+    args:        bitset (Python int)
+    return:      list of device IDs, in ascending order
+    '''
+    deviceIDs = []
+    while bitset:
+        lowestBit = bitset & -bitset
+        deviceIDs.append(lowestBit.bit_length() - 1)
+        bitset ^= lowestBit
+    return deviceIDs
+    # end bitsetToDeviceList
+
+def popcount(bitset):
     '''
-    distanceToNE = []  # to store distance to NE per time steps (for individual runs)
+    description: counts the devices in a bitset
+    args:        bitset (Python int)
+    return:      number of bits set
+    '''
+    return bin(bitset).count("1")
+    # end popcount
 
-    # networkCSVfile = dir + "run_" + str(j + 1) + "/network.csv"
-    with open(networkCSVfile, newline='') as networkCSVfile:
+def encodeBitset(bitset):
+    '''
+    description: encodes a bitset compactly for output files, e.g. devices {1, 2, 5} are written as "0x26"
+    args:        bitset (Python int)
+    return:      hexadecimal string
+    '''
+    return hex(bitset)
+    # end encodeBitset
+
+def decodeDeviceSet(text):
+    '''
+    description: parses a set of devices read from an output file, either as a hexadecimal bitset or as the text of a Python set written by earlier versions
+                 (e.g. "set()" or "{1, 2, 5}")
+    args:        text read from the file
+    return:      list of device IDs, in ascending order for a bitset and in the order written for a set
+    '''
+    if text.startswith("0x"): return bitsetToDeviceList(int(text, 16))
+    if text == "set()": return []
+    return [int(ID) for ID in text[1:-1].split(",")]
+    # end decodeDeviceSet
+
+def readNetworkLoad(networkCSVfile, numNetwork):
+    '''
+    description: reads the number of devices associated to each network per time slot, from the network csv file (plain or compressed) or, if the run was saved in
+                 the columnar format (see columnar_output.py), from the array of loads in the same directory
+    args:        path of the network csv file, number of networks
+    return:      generator of (time slot, list of number of devices per network)
+    '''
+    runDir = os.path.dirname(networkCSVfile) + "/"
+    if not runFileExists(networkCSVfile) and hasColumnarOutput(runDir):
+        load = loadColumn(runDir, "load")
+        for t in range(load.shape[0]): yield t + 1, [int(numDevice) for numDevice in load[t]]
+        return
+    with openRunFile(networkCSVfile) as networkCSVfile:            # plain or compressed
         networkReader = csv.reader(networkCSVfile)
-        count = 0
+        next(networkReader)                                 # header
+        for rowNetwork in networkReader: yield int(rowNetwork[1]), [int(rowNetwork[3 + i]) for i in range(numNetwork)]
+    # end readNetworkLoad
 
-        for rowNetwork in networkReader:  # compute total gain of user and that of each expert
-            if count != 0:
-                runNum = int(rowNetwork[0])
-                iterationNum = int(rowNetwork[1])
-
-                NElist = getNElist(originalNElist, iterationNum, setting, numTimeSlot)
-
-                numUserPerNet = []
-                for i in range(numNetwork): numUserPerNet.append(int(rowNetwork[3 + i]))  # construct list with number of users per network
-
-                # compute the distance from the current state to NE
-                if numUserPerNet in NElist:  # current state is one of the NE state
-                    distance = 0
-                else:  # current state is not any of the NE state
-                    distance = 0
-
-                    ### compute sum of all additional bandwidth obtainable by the users by moving to NE state
-                    # select the NE state to be considered based on the number of users to move from/to each network to reach each of the NE states
-                    countNumUsersToMove = []  # number of users to move to reach each NE state
-                    for NEstate in NElist:
-                        numUserDiff = list(numUserAtNE - numUserAtPresent for numUserAtNE, numUserAtPresent in zip(NEstate, numUserPerNet))
-                        countNumUsersToMove.append(sum(x for x in numUserDiff if x > 0))
-
-                    minNumUsersToMove = min(countNumUsersToMove)
-                    NEindex = countNumUsersToMove.index(minNumUsersToMove)
-                    NE = NElist[NEindex]
-
-                    numUserDiff = list(numUserAtNE - numUserAtPresent for numUserAtNE, numUserAtPresent in zip(NE, numUserPerNet))
-
-                    index = 0
-                    while index < len(numUserDiff):
-                        if numUserDiff[index] < 0:  # user need to move from the network
-                            for n in range(len(numUserDiff)):
-                                if numUserDiff[n] > 0:
-                                    numUsersToBeMoved = min(numUserDiff[n], abs(
-                                        numUserDiff[index]))  # no of users that can be moved to this network
-                                    currentGain = networkBandwidth[index] / numUserPerNet[index]; #print("currentGain:", currentGain)
-                                    tmpDistance = (((networkBandwidth[n] / NE[n]) - currentGain)) * 100 / currentGain; #print("tmpDistance:", tmpDistance)
-                                    if tmpDistance > distance: distance = tmpDistance
-                                    numUserDiff[index] += numUsersToBeMoved
-                                    numUserDiff[n] -= numUsersToBeMoved
-                                if numUserDiff[index] == 0:
-                                    if NE[index] != 0:
-                                        currentGain = networkBandwidth[index] / numUserPerNet[index]
-                                        tmpDistance = ((networkBandwidth[index] / NE[
-                                            index] - currentGain)) * 100 / currentGain
-                                        if tmpDistance > distance: distance = tmpDistance
-                                    break
-                        index += 1
-                distanceToNE.append([distance])
-            count += 1
-    networkCSVfile.close()
-    return distanceToNE
+''' _________________________________________________________ computes distance to Nash equilibrium per time slot ________________________________________________________ '''
+def computeDistanceToNashEquilibrium(numNetwork, networkCSVfile, networkBandwidth, originalNElist, setting, numTimeSlot, tableDir=None):
+    '''
+    description: computes the distance to NE per time slot and returns it as a list; the number of devices per network in all time slots is loaded as one (#time slots x
+                 #networks) matrix. With a table directory, the distance of each state is looked up in the distance table of the bandwidth and NE states of the time slot
+                 (see distance_table.py), only the states not in the table being computed; otherwise it is computed for all time slots (see computeDistanceArray)
+    args:        number of networks, path of the network csv file, bandwidth of each network, list of NE states, setting, number of time slots, directory of the distance
+                 tables (None to compute every time slot)
+    return:      list of distance to NE per time slot
+    '''
+    timeSlot = []; load = []
+    for iterationNum, numUserPerNet in readNetworkLoad(networkCSVfile, numNetwork): timeSlot.append(iterationNum); load.append(numUserPerNet)
+    if timeSlot == []: return []
+    timeSlot = np.array(timeSlot); load = np.array(load, dtype=np.int64)                      # (#time slots), (#time slots x #networks)
+    bandwidth = np.array(networkBandwidth[:numNetwork], dtype=np.float64)
+    NEarray = getNEarray(originalNElist, timeSlot, setting, numTimeSlot)                       # (#time slots x #NE states x #networks)
+
+    if tableDir is None: distance = computeDistanceArray(load, NEarray, bandwidth)
+    else:
+        distance = np.zeros(len(timeSlot))
+        NElistPerTimeSlot, NElistIndex = np.unique(NEarray.reshape(len(timeSlot), -1), axis=0, return_inverse=True)    # NE states differ between phases
+        for i, NElist in enumerate(NElistPerTimeSlot):
+            NElist = NElist.reshape(-1, numNetwork); phase = NElistIndex.reshape(-1) == i
+            distanceTable = DistanceTable(tableDir, ("network load", bandwidth.tolist(), NElist.tolist()))
+            distance[phase] = distanceTable.lookup(load[phase], lambda stateArray, _: computeDistanceArray(stateArray, np.broadcast_to(NElist, (len(stateArray),) + NElist.shape), bandwidth))
+            distanceTable.save()
+    return [[value if value > 0 else 0] for value in distance.tolist()]                  # 0 (int) when no device can gain, as saved so far
     # end computeDistanceToNashEquilibrium
 
+''' ################################################################################################################################################################### '''
+def computeDistanceArray(load, NEarray, bandwidth):
+    '''
+    description: computes the distance to NE of states, all at once. For each state not at NE, the NE state requiring the fewest devices to move is selected (the first
+                 one if several), and devices are moved greedily from the networks with too many devices, in the order of the networks, to those with too few, in the order
+                 of the networks (i.e. the north-west corner rule); the distance is the largest percentage gain a moved device can get, from moving to its new network or,
+                 once its network has as many devices as at NE, from staying (0 if no device can gain)
+    args:        number of devices per network in each state (#states x #networks), NE states of each state (#states x #NE states x #networks), bandwidth of each network
+    return:      array of distances, one per state
+    '''
+    load = np.asarray(load, dtype=np.int64)
+    atNE = np.all(NEarray == load[:, np.newaxis, :], axis=2).any(axis=1)
+    numUsersToMove = np.maximum(NEarray - load[:, np.newaxis, :], 0).sum(axis=2)            # per NE state
+    NE = NEarray[np.arange(len(load)), numUsersToMove.argmin(axis=1)]                        # NE state selected, (#states x #networks)
+
+    # devices moved from the networks with too many devices (sources) to those with too few (sinks): a source and a sink exchange devices if their ranges of devices,
+    # counted in the order of the networks, overlap
+    numUserDiff = NE - load
+    surplus = np.maximum(-numUserDiff, 0); deficit = np.maximum(numUserDiff, 0)
+    surplusEnd = surplus.cumsum(axis=1); deficitEnd = deficit.cumsum(axis=1)
+    moved = (np.minimum(surplusEnd[:, :, np.newaxis], deficitEnd[:, np.newaxis, :]) > np.maximum((surplusEnd - surplus)[:, :, np.newaxis], (deficitEnd - deficit)[:, np.newaxis, :]))
+    moved &= (surplus > 0)[:, :, np.newaxis] & (deficit > 0)[:, np.newaxis, :]              # (#states x source network x sink network)
+    settled = (surplus > 0) & (surplusEnd <= deficitEnd[:, -1:]) & (NE != 0)                  # sources left with as many devices as at NE
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        currentGain = bandwidth / load                                                          # per device, in each source network
+        gainAtNE = bandwidth / NE                                                               # per device, in each network at NE
+        moveDistance = (gainAtNE[:, np.newaxis, :] - currentGain[:, :, np.newaxis]) * 100 / currentGain[:, :, np.newaxis]
+        stayDistance = (gainAtNE - currentGain) * 100 / currentGain
+    distance = np.maximum(np.where(moved, moveDistance, 0).max(axis=(1, 2)), np.where(settled, stayDistance, 0).max(axis=1))
+    return np.where(atNE, 0, np.maximum(distance, 0))
+    # end computeDistanceArray
+
+''' ################################################################################################################################################################### '''
+def getNEarray(originalNElist, timeSlot, setting, numTimeSlot):
+    '''
+    description: lists the NE states of each time slot (see getNElist), for all time slots at once
+    args:        list of NE states, array of time slots, setting, number of time slots
+    return:      array of shape (#time slots x #NE states x #networks); in settings 2 and 3, the only NE state of each time slot
+    '''
+    NEarray = np.array(originalNElist, dtype=np.int64)
+    if setting == 2: firstNE = timeSlot <= numTimeSlot//2
+    elif setting == 3: firstNE = (timeSlot <= numTimeSlot//3) | (timeSlot > 2*numTimeSlot//3)
+    else: return np.broadcast_to(NEarray, (len(timeSlot),) + NEarray.shape)
+    return np.where(firstNE[:, np.newaxis], NEarray[0], NEarray[1])[:, np.newaxis, :]
+    # end getNEarray
+
 def getNElist(originalNElist, iterationNum, setting, numTimeSlot):
     if setting == 1: return originalNElist
     elif setting == 2:
@@ -262,38 +335,42 @@ def getTimeTaken(startTime, endTime):
     return timeTaken, unit
 
 ''' __________________________________________ create CSV files with the right headers to store details of networks and devices __________________________________________ '''
-def createCSVfile(numDevice, numNetwork, dir, setting, save_minimal, algorithmName):
+def createCSVfile(numDevice, numNetwork, dir, setting, save_minimal, algorithmName, outputTier="debug", compression=None, store=None):
     '''
-    decsription: creates a csv file to store details of the networks per time slot, and a csv file for each device; each file will have a header
-    args:        number of devices, number of wireless networks, directory to store the files, whether to save minimal (or all) details in files, setting being considered
+    decsription: creates a csv file to store details of the networks per time slot, and a csv file for each device (none in the summary output tier); each file will
+                 have a header
+    args:        number of devices, number of wireless networks, directory to store the files, whether to save minimal (or all) details in files, setting being considered,
+                 output tier ("summary", "core" or "debug"), compression of the files (see output_writer.py; None for plain files), run store the files are written to
+                 instead (see run_store.py; None for separate files)
     return:      None
     '''
     NUM_PHASE = 3 if setting == 4 else 1
 
     for i in range(NUM_PHASE):
         phaseDir = dir + "PHASE_" + str(i + 1) if NUM_PHASE > 1 else dir
-        if not os.path.exists(phaseDir): os.makedirs(phaseDir)  # create output directory if it doesn't exist
+        if store is None and not os.path.exists(phaseDir): os.makedirs(phaseDir)  # create output directory if it doesn't exist
         # create network csv file(s)
         networkfilename = phaseDir + "/" + "network.csv"
-        createNetworkCSVfile(numNetwork, networkfilename)
+        createNetworkCSVfile(numNetwork, networkfilename, compression, store)
         # create device csv files
+        if outputTier == "summary": continue
         for device in range(1, numDevice + 1):
             devicefilename = phaseDir + "/" + "device" + str(device) + ".csv"
-            createDeviceCSVfile(numNetwork, device, devicefilename, setting, i + 1, save_minimal, algorithmName)
+            createDeviceCSVfile(numNetwork, device, devicefilename, setting, i + 1, save_minimal, algorithmName, outputTier, compression, store)
     # for i in range(numDevice): createDeviceCSVfile(numNetwork, dir + "device" + str(i + 1) + ".csv", setting, save_minimal, algorithmName)
     # end createCSVfile
 
-def createNetworkCSVfile(numNetwork, filename):
+def createNetworkCSVfile(numNetwork, filename, compression=None, store=None):
     data = ["Run no.", "Time slot", "Device ID"]
     for i in range(numNetwork): data.append("#devices in network " + str(i + 1))
     for i in range(numNetwork): data.append("devices in network " + str(i + 1))
-    myfile = open(filename, "a")
+    myfile = openRunFile(filename, "a", compression) if store is None else store.openFile(filename)
     out = csv.writer(myfile, delimiter=',', quoting=csv.QUOTE_ALL)
     out.writerow(data)
     myfile.close()
     # end createNetworkCSVfile
 
-def createDeviceCSVfile(numNetwork, deviceID, devicefilename, setting, phase, save_minimal, algorithmName):
+def createDeviceCSVfile(numNetwork, deviceID, devicefilename, setting, phase, save_minimal, algorithmName, outputTier="debug", compression=None, store=None):
     # print("creating csv file, device", deviceID, "file", devicefilename, "setting:", setting)
     if setting == 4:
         networkPerPhase = [[1, 2, 3], [1, 3, 4, 5], [1, 4, 5]]
@@ -307,10 +384,11 @@ def createDeviceCSVfile(numNetwork, deviceID, devicefilename, setting, phase, sa
     for networkID in availableNetworkList: data.append("Probability (net " + str(networkID) + ")")
     data = data + ["Current network", "Delay", "# Megabytes recv", "self.gain(Mbps)"]
     for networkID in availableNetworkList: data.append("Bandwidth in network " + str(networkID) + "(MB)")
-    if algorithmName == "CollaborativeEWA" or algorithmName == "CollaborativeEXP3":
-        data += ["Network detail history", "Action", "D", "Gain history", "Loss history", "Probability history", "Estimated loss"]
-    data += ["max gain (for scaling)"]
-    myfile = open(devicefilename, "a")
+    if outputTier == "debug":     # traces, only filled in the time slots traced
+        if algorithmName == "CollaborativeEWA" or algorithmName == "CollaborativeEXP3":
+            data += ["Network detail history", "Action", "D", "Gain history", "Loss history", "Probability history", "Estimated loss"]
+        data += ["max gain (for scaling)"]
+    myfile = openRunFile(devicefilename, "a", compression) if store is None else store.openFile(devicefilename)
     out = csv.writer(myfile, delimiter=',', quoting=csv.QUOTE_ALL)
     out.writerow(data)
     myfile.close()
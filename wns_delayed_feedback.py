@@ -10,13 +10,23 @@
 '''
 
 import simpy
-from network import Network
+from network import Network, NetworkRegistry
+from scenario import buildScenario
+from output_writer import RunWriter, FLUSH_INTERVAL, MAX_QUEUED_BATCH, COMPRESSION
+from run_store import RunStore
+from campaign_cube import CampaignCube
+from run_catalog import registerRun, CATALOG_FILE
+from distance_table import DISTANCE_TABLE_DIR
+from columnar_output import ColumnarWriter, FILE_FORMAT
+import importlib.util
 import global_setting
 import argparse
 import os
 from utility_method import createCSVfile, computeDistanceToNashEquilibrium, saveToCSV, getTimeTaken, computeNashEquilibriumState, plot, isNashEquilibrium
 import time
 import csv
+import random
+import numpy as np
 
 ''' ______________________________________________________________________________ constants ______________________________________________________________________________ '''
 global_setting.constants.update({'beta':0.1})
@@ -56,6 +66,37 @@ parser.add_argument('-pt', dest="transmit_probability", required=True, help='pro
 parser.add_argument('-pl', dest="listen_probability", required=True, help='probability with which to listen')
 parser.add_argument('-ne', dest="nash_equilibrium_state_list", required=True, help='list of Nash equilibrium states')
 parser.add_argument('-max', dest="max_time_unheard_acceptable", required=True, help='maximum time a network can be unheard of')
+parser.add_argument('-range', dest="radio_range", required=False, default=0, help='BLE radio range in metres; 0 if every device in a service area hears every other')
+parser.add_argument('-area', dest="service_area_size", required=False, default=100, help='length of the side of each (square) service area in metres')
+parser.add_argument('-speed', dest="max_step_per_time_slot", required=False, default=0, help='maximum distance (in metres, along each axis) a device moves per time slot')
+parser.add_argument('-emulate', dest="emulation_transport", required=False, default="none", choices=["none", "udp", "unix"],
+                    help='run the collaborative EWA loops in real time, exchanging datagrams over UDP multicast or Unix sockets (CollaborativeEWA only)')
+parser.add_argument('-ws', dest="wall_clock_time_slot_duration", required=False, default=None, help='wall-clock duration of a time slot in seconds when emulating')
+parser.add_argument('-trace', dest="capacity_trace", required=False, default=None,
+                    help='.npy file with the capacity (Mbps) of each network per time slot, one row per time slot; replaces the constant bandwidth given with -b')
+parser.add_argument('-shard', dest="num_shard", required=False, default=1,
+                    help='number of processes the service areas are split across, synchronized at time slot boundaries (CollaborativeEWA only)')
+parser.add_argument('-flush', dest="flush_interval", required=False, default=FLUSH_INTERVAL,
+                    help='number of rows of device and network details buffered in memory before they are written to the csv files (1 to write every row immediately)')
+parser.add_argument('-writer_queue', dest="max_queued_batch", required=False, default=MAX_QUEUED_BATCH,
+                    help='blocks of rows queued at most for the background thread writing the csv files; the simulation waits when full (0 to write in the simulation thread)')
+parser.add_argument('-format', dest="output_format", required=False, default="csv", choices=["csv"] + FILE_FORMAT,
+                    help='format of the device and network details: csv files, or arrays per quantity (see columnar_output.py) in .npy files or Parquet tables (needs pyarrow)')
+parser.add_argument('-compress', dest="compression", required=False, default="none", choices=["none"] + list(COMPRESSION),
+                    help='compression of the device and network csv files: none, gzip (.gz) or lzma (.xz); the analysis scripts read plain and compressed files alike')
+parser.add_argument('-store', dest="run_store", required=False, default=0,
+                    help='1 to append the device and network csv files of all phases to a single run store (run.store, see run_store.py) instead of one file each')
+parser.add_argument('-campaign', dest="campaign_num_run", required=False, default=0,
+                    help='number of runs of the campaign; if given, the run also fills its slice of the arrays of the campaign in ../campaign/ (see campaign_cube.py)')
+parser.add_argument('-seed', dest="seed", required=False, default=None, help='seed of the random number generators (default: not seeded)')
+parser.add_argument('-catalog', dest="catalog", required=False, default=None,
+                    help='SQLite catalog the run registers its configuration and summary in (see run_catalog.py), e.g. ../' + CATALOG_FILE + '; default: not registered')
+parser.add_argument('-table', dest="distance_table_dir", required=False, default="none",
+                    help='directory of the tables of distance to NE per state (see distance_table.py), e.g. ../' + DISTANCE_TABLE_DIR + '; default: none, every time slot computed')
+parser.add_argument('-output', dest="output_tier", required=False, default="debug", choices=["summary", "core", "debug"],
+                    help='details saved: summary of the run of each device only, core metrics per time slot, or core metrics and debug traces (sampled with -trace_every/-trace_devices)')
+parser.add_argument('-trace_every', dest="trace_every", required=False, default=1, help='debug tier: traces saved every k-th time slot only (from t = 1)')
+parser.add_argument('-trace_devices', dest="trace_devices", required=False, default=None, help='debug tier: IDs of the devices whose traces are saved, e.g. 1_2_3 (default all)')
 args = parser.parse_args()
 NUM_MOBILE_DEVICE = int(args.num_device); global_setting.constants.update({'num_mobile_device':NUM_MOBILE_DEVICE})
 NUM_NETWORK = int(args.num_network); global_setting.constants.update({'num_network':NUM_NETWORK})
@@ -74,6 +115,27 @@ global_setting.constants.update({'p_t':float(args.transmit_probability)})
 global_setting.constants.update({'p_l':float(args.listen_probability)})
 nashEquilibriumStates = args.nash_equilibrium_state_list.split(";");
 global_setting.constants.update({'max_time_unheard_acceptable':int(args.max_time_unheard_acceptable)})
+global_setting.constants.update({'radio_range':float(args.radio_range)})
+global_setting.constants.update({'service_area_size':float(args.service_area_size)})
+global_setting.constants.update({'max_step_per_time_slot':float(args.max_step_per_time_slot)})
+EMULATION_TRANSPORT = args.emulation_transport
+WALL_CLOCK_TIME_SLOT_DURATION = float(args.wall_clock_time_slot_duration) if args.wall_clock_time_slot_duration is not None else global_setting.constants['time_slot_duration']
+NUM_SHARD = int(args.num_shard)
+OUTPUT_FORMAT = args.output_format
+SEED = int(args.seed) if args.seed is not None else None
+if SEED is not None: np.random.seed(SEED); random.seed(SEED)
+DISTANCE_TABLE = args.distance_table_dir if args.distance_table_dir != "none" else None
+CATALOG = args.catalog if args.catalog != "none" else None
+COMPRESSION_FORMAT = args.compression if args.compression != "none" else None
+OUTPUT_TIER = args.output_tier; global_setting.constants.update({'output_tier':OUTPUT_TIER})
+global_setting.constants.update({'trace_every':max(1, int(args.trace_every))})
+global_setting.constants.update({'trace_device':set(int(x) for x in args.trace_devices.split("_")) if args.trace_devices is not None else None})
+if OUTPUT_FORMAT == "parquet" and importlib.util.find_spec("pyarrow") is None: parser.error("the parquet format needs pyarrow (pip3 install pyarrow)")
+CAPACITY_TRACE = None
+if args.capacity_trace is not None:
+    CAPACITY_TRACE = np.load(args.capacity_trace, mmap_mode='r')                # memory-mapped; rows are read as the simulation reaches them
+    if CAPACITY_TRACE.ndim != 2 or CAPACITY_TRACE.shape[0] < NUM_TIME_SLOT or CAPACITY_TRACE.shape[1] != NUM_NETWORK:
+        parser.error("capacity trace must have at least " + str(NUM_TIME_SLOT) + " rows and " + str(NUM_NETWORK) + " columns, got shape " + str(CAPACITY_TRACE.shape))
 nashEquilibriumStateList = []
 for state in nashEquilibriumStates: state = state.split("_"); state = [int(x) for x in state]; nashEquilibriumStateList.append(state)
 
@@ -87,34 +149,55 @@ if not os.path.exists(DIR): os.makedirs(DIR)
 
 networkList = [Network(NETWORK_BANDWIDTH[i]) for i in range(NUM_NETWORK)]        # create network objects and store in networkList
 global_setting.constants.update({'network_list':networkList})
+global_setting.constants.update({'network_registry':NetworkRegistry(networkList, CAPACITY_TRACE)})  # O(1) lookup by networkID; load and gain per network, kept up to date
+scenario = buildScenario(SETTING, NUM_MOBILE_DEVICE, NUM_NETWORK, NUM_TIME_SLOT)    # timeline of devices joining, leaving and moving between service areas
+global_setting.constants.update({'scenario':scenario})
+runStore = RunStore(DIR, COMPRESSION_FORMAT) if int(args.run_store) == 1 and OUTPUT_FORMAT == "csv" else None
+runWriter = RunWriter(int(args.flush_interval), int(args.max_queued_batch), COMPRESSION_FORMAT, runStore)     # writes the csv rows in blocks, in a background thread
+global_setting.constants.update({'run_writer':runWriter})
+columnarWriter = ColumnarWriter(DIR, NUM_TIME_SLOT, NUM_MOBILE_DEVICE, NUM_NETWORK, OUTPUT_FORMAT) if OUTPUT_FORMAT != "csv" else None
+global_setting.constants.update({'columnar_writer':columnarWriter})
+campaignCube = None                                                                 # the root directory of the campaign holds run1/ ... runN/
+if int(args.campaign_num_run) > 0:
+    try: campaignCube = CampaignCube(os.path.dirname(os.path.normpath(DIR)) + "/", int(args.campaign_num_run), NUM_TIME_SLOT, NUM_MOBILE_DEVICE, NUM_NETWORK, int(args.run_index))
+    except (ValueError, IndexError) as error: parser.error(str(error))
+global_setting.constants.update({'campaign_cube':campaignCube})
 from mobile_device import MobileDevice
 
-# create mobile device objects and store in mobileDeviceList
-if SETTING == 4:    # mobility scenario
-    mobileDeviceList = []
-    for i in range(10): mobileDeviceList.append(MobileDevice(networkList[:3]))
-    for i in range(5): mobileDeviceList.append(MobileDevice([networkList[0]] + networkList[2:]))
-    for i in range(5): mobileDeviceList.append(MobileDevice([networkList[0]] + networkList[3:]))
-else: mobileDeviceList = [MobileDevice(networkList) for i in range(NUM_MOBILE_DEVICE)]
+# create mobile device objects and store in mobileDeviceList; each device starts with the networks available in its initial service area
+mobileDeviceList = [MobileDevice([networkList[networkID - 1] for networkID in scenario.initialNetwork[i + 1]]) for i in range(NUM_MOBILE_DEVICE)]
 # mobileDeviceList = [MobileDevice(networkList) for i in range(NUM_MOBILE_DEVICE)]
 
 # create the network and device csv files
-createCSVfile(NUM_MOBILE_DEVICE, NUM_NETWORK, DIR, SETTING, SAVE_MINIMAL, ALGORITHM_NAME)
+if columnarWriter is None: createCSVfile(NUM_MOBILE_DEVICE, NUM_NETWORK, DIR, SETTING, SAVE_MINIMAL, ALGORITHM_NAME, OUTPUT_TIER, COMPRESSION_FORMAT, runStore)
 
 # print("nashEquilibriumStateList:", nashEquilibriumStateList); input()
-for i in range(NUM_MOBILE_DEVICE):
-    if ALGORITHM_NAME == "EXP3":  # each mobile device object calls the method Smart EXP3
-        proc = env.process(mobileDeviceList[i].EXP3(env))                       # each mobile device object calls the method EXP3
-    elif ALGORITHM_NAME == "SmartEXP3":                                         # each mobile device object calls the method Smart EXP3
-        proc = env.process(mobileDeviceList[i].smartEXP3(env))
-    elif ALGORITHM_NAME == "CollaborativeEWA":                            # each mobile device object calls the method for collaborative weighted average for full information
-        proc = env.process(mobileDeviceList[i].collaborativeEWA(env))
-    elif ALGORITHM_NAME == "CollaborativeEXP3":                                 # each mobile device object calls the method for collaborative EXP3
-        proc = env.process(mobileDeviceList[i].collaborativeEXP3(env))
-    elif ALGORITHM_NAME == "FullInformation":                                   # each mobile device object calls the method for weighted average for full information
-        proc = env.process(mobileDeviceList[i].fullInformation(env))
-
-env.run(until=proc)  # SIM_TIME)
+summaryList = None                                                              # summary of the run of each device; returned by the shards when sharded
+if EMULATION_TRANSPORT != "none" and ALGORITHM_NAME == "CollaborativeEWA":   # real-time emulation of the cooperative protocol over local sockets
+    from loopback_emulation import runEmulation
+    runEmulation(mobileDeviceList, EMULATION_TRANSPORT, WALL_CLOCK_TIME_SLOT_DURATION, DIR)
+elif NUM_SHARD > 1 and ALGORITHM_NAME == "CollaborativeEWA":     # service areas simulated in parallel processes
+    from sharded_simulation import runSharded
+    summaryList = runSharded(mobileDeviceList, NUM_SHARD, DIR)
+else:
+    for i in range(NUM_MOBILE_DEVICE):
+        if ALGORITHM_NAME == "EXP3":  # each mobile device object calls the method Smart EXP3
+            proc = env.process(mobileDeviceList[i].EXP3(env))                       # each mobile device object calls the method EXP3
+        elif ALGORITHM_NAME == "SmartEXP3":                                         # each mobile device object calls the method Smart EXP3
+            proc = env.process(mobileDeviceList[i].smartEXP3(env))
+        elif ALGORITHM_NAME == "CollaborativeEWA":                            # each mobile device object calls the method for collaborative weighted average for full information
+            proc = env.process(mobileDeviceList[i].collaborativeEWA(env))
+        elif ALGORITHM_NAME == "CollaborativeEXP3":                                 # each mobile device object calls the method for collaborative EXP3
+            proc = env.process(mobileDeviceList[i].collaborativeEXP3(env))
+        elif ALGORITHM_NAME == "FullInformation":                                   # each mobile device object calls the method for weighted average for full information
+            proc = env.process(mobileDeviceList[i].fullInformation(env))
+
+    env.run(until=proc)  # SIM_TIME)
+if summaryList is None: summaryList = [mobileDevice.getSummary() for mobileDevice in mobileDeviceList]
+runWriter.close()                                                                   # write the rows still buffered before the csv files are read back
+if columnarWriter is not None: columnarWriter.close()
+if campaignCube is not None: campaignCube.flush()
+if runStore is not None: runStore.close()                                          # appends the index of the records of each csv file
 
 endTime = time.time()
 timeTaken, unit = getTimeTaken(startTime, endTime)
@@ -126,17 +209,20 @@ if ALGORITHM_NAME == "CollaborativeEWA":
     header = ["deviceID", "#reset", "timeslot"]; data = []
     for networkID in range(1, NUM_MOBILE_DEVICE + 1): data.append([networkID, len(MobileDevice.resetTimeSlotPerDevice[networkID]), MobileDevice.resetTimeSlotPerDevice[networkID]])
     saveToCSV(DIR + "reset.csv", header, data)
+saveToCSV(DIR + "summary.csv", ["deviceID", "#network switches", "# Megabytes recv", "stabilized network", "stabilization time"], summaryList)
 
 # nashEquilibriumStateList = computeNashEquilibriumState(NUM_MOBILE_DEVICE, NUM_NETWORK, NETWORK_BANDWIDTH)
 # print("nashEquilibriumStates:", nashEquilibriumStates)
 # print("nashEquilibriumStateList:", nashEquilibriumStateList)
 # print(percentageNashEquilibrium(DIR + "network.csv", NUM_NETWORK, nashEquilibriumStateList), "% time spent at NE")
 if SETTING != 4:
-    distanceToNE = computeDistanceToNashEquilibrium(NUM_NETWORK, DIR + "network.csv", NETWORK_BANDWIDTH, nashEquilibriumStateList, SETTING, NUM_TIME_SLOT)
+    distanceToNE = computeDistanceToNashEquilibrium(NUM_NETWORK, DIR + "network.csv", NETWORK_BANDWIDTH, nashEquilibriumStateList, SETTING, NUM_TIME_SLOT,
+                                                    DISTANCE_TABLE)
     outputfile = DIR + "distanceToNashEquilibrium.csv"
     # saveToCSV(outputfile, ["Time_slot", "Distance_to_Nash_equilibrium"], distanceToNE)
     saveToCSV(outputfile, ["Distance_to_Nash_equilibrium"], distanceToNE)
     # print(distanceToNE.count([0])*100/NUM_TIME_SLOT, "% time spent at NE")
     # print("distance:", distanceToNE)
     # plot(outputfile, len(distanceToNE))
+if CATALOG is not None: registerRun(CATALOG, vars(args), SEED, startTime, endTime - startTime, summaryList, distanceToNE if SETTING != 4 else None)
 ''' _____________________________________________________________________________ end of file _____________________________________________________________________________ '''
\ No newline at end of file